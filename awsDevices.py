@@ -0,0 +1,63 @@
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Lectores simultáneos por disco, sumando todas las subidas en curso. En un
+# disco giratorio (HDD, muchas memorias USB) dos lectores ya lo hacen saltar
+# entre archivos; en SSD o si no se sabe el tipo se permiten más.
+ROTATIONAL_READERS = 1
+DEVICE_READERS = int(os.getenv("AWS_DEVICE_READERS", "4"))
+# Carpetas subiendo a la vez desde un mismo disco giratorio.
+ROTATIONAL_UPLOADS = 1
+
+_slots = {}
+_slots_lock = threading.Lock()
+
+
+def device_id(path):
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def is_rotational(device):
+    # Solo Linux lo expone: /sys/dev/block/<mayor>:<menor> apunta al disco o
+    # a una partición, y en ese caso queue/ está en el disco padre.
+    if device is None or not hasattr(os, "major"):
+        return None
+    block = os.path.realpath(f"/sys/dev/block/{os.major(device)}:{os.minor(device)}")
+    for directory in (block, os.path.dirname(block)):
+        try:
+            with open(os.path.join(directory, "queue", "rotational")) as handle:
+                return handle.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+def device_readers(device):
+    return ROTATIONAL_READERS if is_rotational(device) else DEVICE_READERS
+
+
+def device_upload_limit(device):
+    return ROTATIONAL_UPLOADS if is_rotational(device) else None
+
+
+@contextmanager
+def reader_slot(device):
+    with _slots_lock:
+        slot = _slots.get(device)
+        if slot is None:
+            slot = _slots[device] = threading.BoundedSemaphore(device_readers(device))
+    with slot:
+        yield
+
+
+def physical_order(files):
+    # (ruta, stat) ordenados por disco e inodo: en ext4 y NTFS el número de
+    # inodo sigue de cerca el orden de creación, y con él la posición en el
+    # disco, así que las lecturas quedan casi secuenciales.
+    return sorted(files, key=lambda item: (item[1].st_dev, item[1].st_ino))
@@ -0,0 +1,130 @@
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+
+import awsMetrics as metrics
+from awsEvents import log_error, log_event
+from awsTransfer import MiB
+
+# Candidatos separados por comas: "default" (endpoint regional), "accelerate"
+# (S3 Transfer Acceleration, tiene que estar activada en el bucket) o URLs de
+# otros endpoints (VPC, servidores cercanos...). Con uno o ninguno no se sondea.
+ENDPOINT_CANDIDATES = os.getenv("AWS_ENDPOINT_CANDIDATES", "")
+PROBE_PREFIX = ".awsapp-probe/"
+PROBE_BYTES = 2 * MiB
+PROBE_PINGS = 3
+# Los endpoints se comparan por el tiempo estimado de subir este tamaño.
+REFERENCE_BYTES = 8 * MiB
+# Se vuelve a sondear si una subida va a menos de esta fracción de la mejor
+# velocidad vista con el endpoint elegido, o cuando el sondeo caduca.
+REPROBE_RATIO = 0.5
+PROBE_MAX_AGE = 3600
+
+ProbeResult = namedtuple("ProbeResult", ["endpoint", "latency", "throughput", "error"])
+
+
+def parse_candidates(text):
+    return [item.strip() for item in text.split(",") if item.strip()]
+
+
+def probe_endpoint(
+    client, bucket, endpoint, probe_bytes=PROBE_BYTES, pings=PROBE_PINGS
+):
+    key = f"{PROBE_PREFIX}{socket.gethostname()}-{os.getpid()}-{time.time():.0f}"
+    try:
+        latencies = []
+        for _ in range(pings):
+            started = time.monotonic()
+            client.list_objects_v2(Bucket=bucket, Prefix=PROBE_PREFIX, MaxKeys=1)
+            latencies.append(time.monotonic() - started)
+        started = time.monotonic()
+        client.put_object(Bucket=bucket, Key=key, Body=os.urandom(probe_bytes))
+        elapsed = time.monotonic() - started
+    except Exception as e:
+        return ProbeResult(endpoint, None, None, metrics.error_class(e))
+    try:
+        client.delete_object(Bucket=bucket, Key=key)
+    except Exception as e:
+        log_error("No se pudo borrar el objeto de sondeo", e, key=key)
+    latency = sorted(latencies)[len(latencies) // 2]
+    # La subida incluye una ida y vuelta: se descuenta para estimar el ancho
+    # de banda.
+    throughput = probe_bytes / max(elapsed - latency, 0.001)
+    return ProbeResult(endpoint, latency, throughput, None)
+
+
+def estimated_seconds(result, size=REFERENCE_BYTES):
+    return result.latency + size / result.throughput
+
+
+class EndpointSelector:
+    def __init__(self, bucket, candidates, client_factory):
+        self.bucket = bucket
+        self.candidates = list(candidates)
+        self.client_factory = client_factory
+        self.results = []
+        self.chosen = self.candidates[0] if self.candidates else None
+        self.probed_at = None
+        self.best_speed = 0.0
+        self._stale = False
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def select(self):
+        # El sondeo va sin el candado: las subidas que llegan mientras tanto
+        # usan el endpoint actual en vez de esperar a la red.
+        with self._lock:
+            if len(self.candidates) < 2 or self._probing:
+                return self.chosen
+            expired = (
+                self.probed_at is None
+                or time.monotonic() - self.probed_at > PROBE_MAX_AGE
+            )
+            if not expired and not self._stale:
+                return self.chosen
+            self._probing = True
+        try:
+            self._probe()
+        finally:
+            with self._lock:
+                self._probing = False
+        return self.chosen
+
+    def _probe(self):
+        # Uno tras otro: en paralelo se repartirían el mismo enlace.
+        results = [
+            probe_endpoint(self.client_factory(endpoint), self.bucket, endpoint)
+            for endpoint in self.candidates
+        ]
+        usable = [result for result in results if result.error is None]
+        with self._lock:
+            if usable:
+                self.chosen = min(usable, key=estimated_seconds).endpoint
+            # La referencia de velocidad se vuelve a medir con el nuevo sondeo.
+            self.best_speed = 0.0
+            self.results = results
+            self.probed_at = time.monotonic()
+            self._stale = False
+        log_event(
+            "endpoint_probe",
+            bucket=self.bucket,
+            chosen=self.chosen,
+            results=[result._asdict() for result in results],
+        )
+
+    def observe(self, endpoint, speed):
+        # Velocidad media (bytes/s) de una subida terminada con `endpoint`.
+        with self._lock:
+            if endpoint != self.chosen or speed <= 0:
+                return
+            if speed < REPROBE_RATIO * self.best_speed:
+                self._stale = True
+                log_event(
+                    "endpoint_degraded",
+                    endpoint=endpoint,
+                    speed=round(speed),
+                    best=round(self.best_speed),
+                )
+            self.best_speed = max(self.best_speed, speed)
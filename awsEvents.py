@@ -0,0 +1,271 @@
+import glob
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from awsProfiling import SESSIONS_DIR, session_dir
+
+# Un registro JSONL por ejecución, junto a los perfiles de esa sesión.
+# AWS_EVENT_LOG=0 lo desactiva.
+EVENT_LOG_ENABLED = os.getenv("AWS_EVENT_LOG", "1") not in ("0", "false", "no")
+EVENT_LOG_NAME = "events.jsonl"
+EVENT_LOG_MAX_BYTES = 32 * 1024 * 1024
+EVENT_LOG_BACKUPS = 5
+BURST_GAP = 30
+SLOWEST_FILES = 10
+
+
+class EventLog:
+    def __init__(self, path, max_bytes=EVENT_LOG_MAX_BYTES, backups=EVENT_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._handle = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def write(self, event, **fields):
+        record = {"ts": round(time.time(), 3), "ev": event}
+        record.update(
+            (name, value) for name, value in fields.items() if value is not None
+        )
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._handle is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._handle = open(self.path, "a", encoding="utf-8")
+                self._size = self._handle.tell()
+            self._handle.write(line)
+            self._handle.flush()
+            self._size += len(line)
+            if self._size >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        # events.jsonl -> events.jsonl.1 -> ... -> events.jsonl.<backups>
+        self._handle.close()
+        self._handle = None
+        for number in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{number}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{number + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
+_event_log = None
+_event_log_lock = threading.Lock()
+
+
+def get_event_log():
+    global _event_log
+    with _event_log_lock:
+        if _event_log is None:
+            _event_log = EventLog(os.path.join(session_dir(), EVENT_LOG_NAME))
+        return _event_log
+
+
+def log_event(event, **fields):
+    if not EVENT_LOG_ENABLED:
+        return
+    try:
+        get_event_log().write(event, **fields)
+    except OSError as e:
+        print(f"No se pudo escribir el registro de eventos: {e}")
+
+
+def log_error(message, error, **fields):
+    # Errores que no detienen la operación: quedan en el registro de la sesión
+    # en vez de perderse en una consola que en el ejecutable no existe.
+    log_event(
+        "error", msg=message, err=type(error).__name__, detail=str(error), **fields
+    )
+
+
+def read_events(paths):
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Última línea a medias si la aplicación se cerró de golpe.
+                    continue
+
+
+def percentiles(values, points=(50, 90, 99)):
+    # Percentil por rango más cercano: el valor en la posición ceil(p·n/100).
+    values = sorted(values)
+    if not values:
+        return {}
+    result = {}
+    for point in points:
+        rank = -(-point * len(values) // 100)
+        result[f"p{point}"] = values[max(rank, 1) - 1]
+    return result
+
+
+def analyze(events, slowest=SLOWEST_FILES, burst_gap=BURST_GAP):
+    files = []
+    requests = defaultdict(list)
+    errors = []
+    other_errors = Counter()
+    first_ts = last_ts = None
+    total_bytes = 0
+    skipped = skipped_bytes = 0
+    for event in events:
+        ts = event.get("ts")
+        if ts is not None:
+            first_ts = ts if first_ts is None else min(first_ts, ts)
+            last_ts = ts if last_ts is None else max(last_ts, ts)
+        if event.get("ev") == "file_end" and event.get("skipped"):
+            # Ya estaba en el destino: no entra en bytes ni en velocidades.
+            skipped += 1
+            skipped_bytes += event.get("bytes") or 0
+        elif event.get("ev") == "file_end":
+            files.append(event)
+            if event.get("ok"):
+                total_bytes += event.get("bytes", 0)
+        elif event.get("ev") == "request":
+            requests[event.get("op")].append(event.get("dur", 0))
+            if not event.get("ok"):
+                errors.append(event)
+        elif event.get("ev") == "error":
+            other_errors[event.get("msg", "?")] += 1
+
+    completed = [event for event in files if event.get("ok") and event.get("dur")]
+    throughput = [event.get("bytes", 0) / event["dur"] for event in completed]
+
+    # Ráfagas: errores separados por menos de burst_gap segundos.
+    bursts = []
+    for event in sorted(errors, key=lambda event: event["ts"]):
+        if bursts and event["ts"] - bursts[-1]["end"] <= burst_gap:
+            burst = bursts[-1]
+        else:
+            burst = {"start": event["ts"], "end": event["ts"], "count": 0}
+            burst["errors"] = Counter()
+            burst["endpoints"] = Counter()
+            bursts.append(burst)
+        burst["end"] = event["ts"]
+        burst["count"] += 1
+        burst["errors"][event.get("err", "?")] += 1
+        if event.get("endpoint"):
+            burst["endpoints"][event["endpoint"]] += 1
+
+    slowest_files = sorted(completed, key=lambda event: event["dur"], reverse=True)
+    elapsed = (last_ts - first_ts) if first_ts is not None else 0
+    return {
+        "files": len(files),
+        "failed_files": sum(1 for event in files if not event.get("ok")),
+        "skipped_files": skipped,
+        "skipped_bytes": skipped_bytes,
+        "bytes": total_bytes,
+        "elapsed": elapsed,
+        "throughput": total_bytes / elapsed if elapsed > 0 else None,
+        "file_throughput": percentiles(throughput),
+        "request_seconds": {
+            operation: dict(percentiles(durations), count=len(durations))
+            for operation, durations in sorted(requests.items())
+        },
+        "slowest_files": [
+            {
+                "key": event.get("key"),
+                "bytes": event.get("bytes"),
+                "dur": event["dur"],
+            }
+            for event in slowest_files[:slowest]
+        ],
+        "error_bursts": [
+            {
+                "start": burst["start"],
+                "end": burst["end"],
+                "count": burst["count"],
+                "errors": dict(burst["errors"]),
+                "endpoints": dict(burst["endpoints"]),
+            }
+            for burst in bursts
+        ],
+        "errors": dict(other_errors.most_common()),
+    }
+
+
+def _format_rate(value):
+    return "-" if value is None else f"{value / 1024 / 1024:.1f} MiB/s"
+
+
+def format_report(report):
+    lines = [
+        f"Archivos: {report['files']} ({report['failed_files']} con error)",
+        f"Ya en el destino: {report['skipped_files']} "
+        f"({report['skipped_bytes'] / 1024 / 1024:.1f} MiB, sin contar en velocidad)",
+        f"Datos: {report['bytes'] / 1024 / 1024:.1f} MiB "
+        f"en {report['elapsed']:.0f} s ({_format_rate(report['throughput'])})",
+        "Velocidad por archivo: "
+        + ", ".join(
+            f"{name} {_format_rate(value)}"
+            for name, value in report["file_throughput"].items()
+        ),
+        "",
+        "Duración de peticiones (s):",
+    ]
+    for operation, stats in report["request_seconds"].items():
+        values = ", ".join(
+            f"{name} {value:.3f}" for name, value in stats.items() if name != "count"
+        )
+        lines.append(f"  {operation} ({stats['count']}): {values}")
+    lines += ["", "Archivos más lentos:"]
+    for event in report["slowest_files"]:
+        size = (event["bytes"] or 0) / 1024 / 1024
+        lines.append(f"  {event['dur']:8.1f} s  {size:8.1f} MiB  {event['key']}")
+    lines += ["", "Ráfagas de errores:"]
+    if not report["error_bursts"]:
+        lines.append("  ninguna")
+    for burst in report["error_bursts"]:
+        start = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(burst["start"]))
+        errors = ", ".join(
+            f"{name} x{count}" for name, count in burst["errors"].items()
+        )
+        lines.append(
+            f"  {start} ({burst['end'] - burst['start']:.0f} s): "
+            f"{burst['count']} errores: {errors}"
+        )
+    lines += ["", "Otros errores:"]
+    if not report["errors"]:
+        lines.append("  ninguno")
+    for message, count in report["errors"].items():
+        lines.append(f"  {count:6d}  {message}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Resumen del registro de eventos")
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="archivos events.jsonl (por defecto, todas las sesiones)",
+    )
+    parser.add_argument("--slowest", type=int, default=SLOWEST_FILES)
+    parser.add_argument("--burst-gap", type=float, default=BURST_GAP)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(
+        glob.glob(os.path.join(SESSIONS_DIR, "*", EVENT_LOG_NAME + "*"))
+    )
+    report = analyze(read_events(paths), args.slowest, args.burst_gap)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
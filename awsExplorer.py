@@ -0,0 +1,610 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import pyqtSignal
+
+from awsIndex import get_index
+from awsListing import (
+    aggregate_prefix,
+    invalidate_prefix,
+    list_prefix,
+    listing_cache,
+    totals_cache,
+)
+
+PREFETCH_WORKERS = 4
+PREFETCH_CHILDREN = 8
+PREFETCH_SIBLINGS = 4
+TOTALS_WORKERS = 2
+SEARCH_DELAY_MS = 300
+SEARCH_MAX_RESULTS = 10000
+SEARCH_MODES = [("Texto", "substring"), ("Glob", "glob"), ("Regex", "regex")]
+
+COLUMNS = ["Nombre", "Tamaño", "Objetos"]
+
+
+def format_size(size):
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+class S3Node:
+    def __init__(self, key, name, is_dir, parent=None):
+        self.key = key
+        self.name = name
+        self.is_dir = is_dir
+        self.parent = parent
+        self.position = 0
+        self.children = []
+        self.pages = 0
+        self.prefix_count = 0
+        self.object_count = 0
+        self.size = None
+        self.complete = not is_dir
+
+
+class S3TreeModel(QtCore.QAbstractItemModel):
+    error_occurred = pyqtSignal(str)
+    totals_ready = pyqtSignal(str)
+    totals_failed = pyqtSignal(str)
+    # (generación del modelo, prefijo, Listing o mensaje de error)
+    listing_ready = pyqtSignal(int, str, object)
+    listing_failed = pyqtSignal(int, str, str)
+
+    def __init__(self, client, bucket, parent=None):
+        super().__init__(parent)
+        self.client = client
+        self.bucket = bucket
+        self.root = S3Node("", "", True)
+        self.prefetch_pool = ThreadPoolExecutor(
+            max_workers=PREFETCH_WORKERS, thread_name_prefix="s3-prefetch"
+        )
+        self._prefetched = set()
+        self.totals_pool = ThreadPoolExecutor(
+            max_workers=TOTALS_WORKERS, thread_name_prefix="s3-totals"
+        )
+        self._totals_pending = set()
+        self._totals_failed = set()
+        self._nodes_by_key = {}
+        self._listing_pending = set()
+        self.generation = 0
+        # Tras cerrar pueden llegar señales ya encoladas: no se envía nada más
+        # a los pools, que ya no admiten tareas.
+        self.closed = False
+        self.totals_ready.connect(self.on_totals_ready)
+        self.totals_failed.connect(self.on_totals_failed)
+        self.listing_ready.connect(self.on_listing_ready)
+        self.listing_failed.connect(self.on_listing_failed)
+        style = QtWidgets.QApplication.style()
+        self.folder_icon = style.standardIcon(QtWidgets.QStyle.SP_DirIcon)
+        self.file_icon = style.standardIcon(QtWidgets.QStyle.SP_FileIcon)
+
+    def set_root(self, prefix):
+        self.beginResetModel()
+        self.root = S3Node(prefix, prefix, True)
+        self._prefetched.clear()
+        self._totals_failed.clear()
+        self._nodes_by_key = {}
+        # Los listados que sigan en curso pertenecen a la raíz anterior.
+        self._listing_pending.clear()
+        self.generation += 1
+        self.endResetModel()
+
+    def node(self, index):
+        if index.isValid():
+            return index.internalPointer()
+        return self.root
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, self.node(parent).children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        parent_node = index.internalPointer().parent
+        if parent_node is None or parent_node is self.root:
+            return QtCore.QModelIndex()
+        return self.createIndex(parent_node.position, 0, parent_node)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return len(COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        column = index.column()
+        if role == QtCore.Qt.UserRole:
+            return node.key
+        if column == 0:
+            if role == QtCore.Qt.DisplayRole:
+                return node.name
+            if role == QtCore.Qt.DecorationRole:
+                return self.folder_icon if node.is_dir else self.file_icon
+            return None
+
+        if role == QtCore.Qt.TextAlignmentRole:
+            return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        if not node.is_dir:
+            if role == QtCore.Qt.DisplayRole and column == 1:
+                return format_size(node.size)
+            return None
+
+        totals = totals_cache.get(self.bucket, node.key, None)
+        if totals is None:
+            if role != QtCore.Qt.DisplayRole:
+                return None
+            if node.key in self._totals_failed:
+                return "?"
+            self.request_totals(node.key)
+            return "..."
+
+        if role == QtCore.Qt.DisplayRole:
+            return format_size(totals.size) if column == 1 else str(totals.count)
+        if role == QtCore.Qt.ToolTipRole:
+            computed_at = time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(totals.computed_at)
+            )
+            return f"Calculado: {computed_at}"
+        return None
+
+    def request_totals(self, prefix):
+        if self.closed or prefix in self._totals_pending:
+            return
+        self._totals_pending.add(prefix)
+        self.totals_pool.submit(self._compute_totals, prefix)
+
+    def _compute_totals(self, prefix):
+        try:
+            aggregate_prefix(self.client, self.bucket, prefix)
+            self.totals_ready.emit(prefix)
+        except Exception:
+            self.totals_failed.emit(prefix)
+
+    def on_totals_failed(self, prefix):
+        self._totals_pending.discard(prefix)
+        self._totals_failed.add(prefix)
+        self.on_totals_ready(prefix)
+
+    def on_totals_ready(self, prefix):
+        self._totals_pending.discard(prefix)
+        # Un cálculo también deja en caché los totales de todas sus subcarpetas.
+        for key, node in self._nodes_by_key.items():
+            if key.startswith(prefix):
+                top_left = self.createIndex(node.position, 1, node)
+                bottom_right = self.createIndex(node.position, 2, node)
+                self.dataChanged.emit(top_left, bottom_right)
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self.node(parent)
+        return node.is_dir and (bool(node.children) or not node.complete)
+
+    def canFetchMore(self, parent):
+        return not self.node(parent).complete
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        if self.closed or node.complete or node.key in self._listing_pending:
+            return
+        # Lo ya precargado se inserta en el acto; el resto se lista en el pool
+        # y las filas llegan por listing_ready sin bloquear la interfaz.
+        listing = listing_cache.get(self.bucket, node.key, "/")
+        if listing is not None and (
+            listing.next_token is None or listing.pages > node.pages
+        ):
+            self._insert_listing(node, listing)
+            return
+        self._listing_pending.add(node.key)
+        self.prefetch_pool.submit(
+            self._fetch_listing, self.generation, node.key, node.pages + 1
+        )
+
+    def _fetch_listing(self, generation, prefix, max_pages):
+        try:
+            listing = list_prefix(self.client, self.bucket, prefix, max_pages=max_pages)
+        except Exception as e:
+            self.listing_failed.emit(generation, prefix, str(e))
+            return
+        self.listing_ready.emit(generation, prefix, listing)
+
+    def _pending_node(self, generation, prefix):
+        if self.closed or generation != self.generation:
+            return None
+        if prefix not in self._listing_pending:
+            return None
+        self._listing_pending.discard(prefix)
+        if prefix == self.root.key:
+            return self.root
+        return self._nodes_by_key.get(prefix)
+
+    def on_listing_failed(self, generation, prefix, message):
+        node = self._pending_node(generation, prefix)
+        if node is None:
+            return
+        node.complete = True
+        self.error_occurred.emit(message)
+
+    def on_listing_ready(self, generation, prefix, listing):
+        node = self._pending_node(generation, prefix)
+        if node is not None:
+            self._insert_listing(node, listing)
+
+    def _insert_listing(self, node, listing):
+        new_nodes = []
+        for folder_prefix in listing.prefixes[node.prefix_count :]:
+            folder_name = folder_prefix[len(node.key) :].strip("/")
+            new_nodes.append(S3Node(folder_prefix, folder_name, True, node))
+        for obj in listing.objects[node.object_count :]:
+            file_name = obj["Key"][len(node.key) :]
+            if file_name and "/" not in file_name:
+                file_node = S3Node(obj["Key"], file_name, False, node)
+                file_node.size = obj["Size"]
+                new_nodes.append(file_node)
+
+        node.prefix_count = len(listing.prefixes)
+        node.object_count = len(listing.objects)
+        node.pages = listing.pages
+        node.complete = listing.next_token is None
+
+        if new_nodes:
+            first = len(node.children)
+            for position, new_node in enumerate(new_nodes, first):
+                new_node.position = position
+                if new_node.is_dir:
+                    self._nodes_by_key[new_node.key] = new_node
+            if node is self.root:
+                parent = QtCore.QModelIndex()
+            else:
+                parent = self.createIndex(node.position, 0, node)
+            self.beginInsertRows(parent, first, first + len(new_nodes) - 1)
+            node.children.extend(new_nodes)
+            self.endInsertRows()
+
+        self.prefetch_around(node)
+
+    def prefetch_around(self, node):
+        # Se precarga la primera página de las subcarpetas y de las carpetas
+        # vecinas, que son las que el usuario abrirá a continuación.
+        if self.closed:
+            return
+        candidates = [child for child in node.children if child.is_dir][
+            :PREFETCH_CHILDREN
+        ]
+        if node.parent is not None:
+            siblings = [sibling for sibling in node.parent.children if sibling.is_dir]
+            position = siblings.index(node)
+            candidates += siblings[position + 1 : position + 1 + PREFETCH_SIBLINGS]
+            candidates += siblings[max(0, position - PREFETCH_SIBLINGS) : position]
+
+        for candidate in candidates:
+            if candidate.key in self._prefetched or candidate.pages:
+                continue
+            self._prefetched.add(candidate.key)
+            self.prefetch_pool.submit(self._prefetch, candidate.key)
+
+    def _prefetch(self, prefix):
+        try:
+            list_prefix(self.client, self.bucket, prefix, max_pages=1)
+        except Exception:
+            pass
+
+    def shutdown(self):
+        self.closed = True
+        self.prefetch_pool.shutdown(wait=False, cancel_futures=True)
+        self.totals_pool.shutdown(wait=False, cancel_futures=True)
+
+
+class S3FileExplorer(QtWidgets.QWidget):
+    search_results = pyqtSignal(int, list)
+    search_finished = pyqtSignal(int, str)
+    download_requested = pyqtSignal(list, str)
+
+    def __init__(self, client, bucket):
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.current_path = ""
+        self.history = [""]
+        self.history_index = 0
+        self.search_generation = 0
+        self.search_count = 0
+        self.search_pool = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="s3-search"
+        )
+        self.initUI()
+
+    def initUI(self):
+        self.setWindowTitle("Explorador de S3")
+        self.setGeometry(100, 100, 800, 600)
+
+        main_layout = QtWidgets.QVBoxLayout(self)
+
+        toolbar = QtWidgets.QHBoxLayout()
+        self.back_button = QtWidgets.QPushButton("< Atrás")
+        self.back_button.clicked.connect(self.go_back)
+        self.back_button.setEnabled(False)
+
+        self.forward_button = QtWidgets.QPushButton("Adelante >")
+        self.forward_button.clicked.connect(self.go_forward)
+        self.forward_button.setEnabled(False)
+
+        self.home_button = QtWidgets.QPushButton("Home")
+        self.home_button.clicked.connect(self.go_home)
+
+        self.refresh_button = QtWidgets.QPushButton("Refrescar")
+        self.refresh_button.clicked.connect(self.refresh)
+
+        self.download_button = QtWidgets.QPushButton("Descargar")
+        self.download_button.clicked.connect(self.download_selected)
+
+        toolbar.addWidget(self.back_button)
+        toolbar.addWidget(self.forward_button)
+        toolbar.addWidget(self.home_button)
+        toolbar.addWidget(self.refresh_button)
+        toolbar.addWidget(self.download_button)
+
+        self.path_edit = QtWidgets.QLineEdit(self)
+        self.path_edit.setText(self.current_path)
+        self.path_edit.returnPressed.connect(self.navigate_to_path)
+        toolbar.addWidget(self.path_edit)
+
+        main_layout.addLayout(toolbar)
+
+        search_bar = QtWidgets.QHBoxLayout()
+        self.search_edit = QtWidgets.QLineEdit(self)
+        self.search_edit.setPlaceholderText("Buscar en la carpeta actual...")
+        self.search_edit.textChanged.connect(self.schedule_search)
+        search_bar.addWidget(self.search_edit)
+
+        self.search_mode_combobox = QtWidgets.QComboBox(self)
+        for label, mode in SEARCH_MODES:
+            self.search_mode_combobox.addItem(label, mode)
+        self.search_mode_combobox.currentIndexChanged.connect(self.schedule_search)
+        search_bar.addWidget(self.search_mode_combobox)
+
+        main_layout.addLayout(search_bar)
+
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.start_search)
+        self.search_results.connect(self.on_search_results)
+        self.search_finished.connect(self.on_search_finished)
+
+        self.model = S3TreeModel(self.client, self.bucket, self)
+        self.model.error_occurred.connect(self.show_error)
+
+        self.tree_view = QtWidgets.QTreeView(self)
+        self.tree_view.setModel(self.model)
+        self.tree_view.setExpandsOnDoubleClick(False)
+        self.tree_view.setUniformRowHeights(True)
+        self.tree_view.doubleClicked.connect(self.on_item_double_clicked)
+        self.tree_view.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.tree_view.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.tree_view.customContextMenuRequested.connect(self.show_context_menu)
+        self.tree_view.header().setStretchLastSection(False)
+        self.tree_view.header().setSectionResizeMode(
+            0, QtWidgets.QHeaderView.Stretch
+        )
+        main_layout.addWidget(self.tree_view)
+
+        self.search_status_label = QtWidgets.QLabel(self)
+        self.search_status_label.hide()
+        main_layout.addWidget(self.search_status_label)
+
+        self.search_list = QtWidgets.QListWidget(self)
+        self.search_list.setUniformItemSizes(True)
+        self.search_list.setSelectionMode(
+            QtWidgets.QAbstractItemView.ExtendedSelection
+        )
+        self.search_list.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.search_list.customContextMenuRequested.connect(self.show_context_menu)
+        self.search_list.itemDoubleClicked.connect(self.on_search_item_double_clicked)
+        self.search_list.hide()
+        main_layout.addWidget(self.search_list)
+
+        self.setLayout(main_layout)
+        self.show()
+
+        self.go_home()
+
+    def show_error(self, message):
+        QtWidgets.QMessageBox.critical(self, "Error", message)
+
+    def navigate_to_path(self):
+        path = self.path_edit.text().strip()
+        if path != self.current_path:
+            self.load_path(path)
+            self.history.append(path)
+            self.history_index += 1
+            self.update_navigation_buttons()
+
+    def load_path(self, path="", refresh=False):
+        self.current_path = path
+        self.path_edit.setText(path)
+
+        if path and not path.endswith("/"):
+            path += "/"
+
+        if refresh:
+            invalidate_prefix(self.bucket, path)
+            get_index().expire(self.bucket, path)
+        self.model.set_root(path)
+
+    def on_item_double_clicked(self, index):
+        item_data = self.model.data(index, QtCore.Qt.UserRole)
+        if item_data.endswith("/"):
+            self.load_path(item_data)
+            self.history.append(item_data)
+            self.history_index += 1
+            self.update_navigation_buttons()
+
+    def go_back(self):
+        if self.history_index > 0:
+            self.history_index -= 1
+            self.load_path(self.history[self.history_index])
+            self.update_navigation_buttons()
+
+    def go_forward(self):
+        if self.history_index < len(self.history) - 1:
+            self.history_index += 1
+            self.load_path(self.history[self.history_index])
+            self.update_navigation_buttons()
+
+    def go_home(self):
+        self.load_path("")
+        self.history = [""]
+        self.history_index = 0
+        self.update_navigation_buttons()
+
+    def refresh(self):
+        self.load_path(self.current_path, refresh=True)
+
+    def update_navigation_buttons(self):
+        self.back_button.setEnabled(self.history_index > 0)
+        self.forward_button.setEnabled(self.history_index < len(self.history) - 1)
+
+    def selected_keys(self):
+        if self.search_list.isVisible():
+            return [
+                item.data(QtCore.Qt.UserRole)
+                for item in self.search_list.selectedItems()
+            ]
+        return [
+            self.model.data(index, QtCore.Qt.UserRole)
+            for index in self.tree_view.selectionModel().selectedRows()
+        ]
+
+    def show_context_menu(self, position):
+        if not self.selected_keys():
+            return
+        menu = QtWidgets.QMenu(self)
+        download_action = menu.addAction("Descargar...")
+        global_position = self.sender().viewport().mapToGlobal(position)
+        if menu.exec_(global_position) == download_action:
+            self.download_selected()
+
+    def download_selected(self):
+        keys = self.selected_keys()
+        if not keys:
+            QtWidgets.QMessageBox.information(
+                self, "Descargar", "Selecciona archivos o carpetas para descargar."
+            )
+            return
+        local_dir = QtWidgets.QFileDialog.getExistingDirectory(
+            self, "Selecciona la carpeta de destino"
+        )
+        if local_dir:
+            self.download_requested.emit(keys, local_dir)
+
+    def schedule_search(self):
+        self.search_timer.start()
+
+    def start_search(self):
+        self.search_generation += 1
+        self.search_count = 0
+        self.search_list.clear()
+
+        pattern = self.search_edit.text()
+        if not pattern:
+            self.search_list.hide()
+            self.search_status_label.hide()
+            self.tree_view.show()
+            return
+
+        self.tree_view.hide()
+        self.search_list.show()
+        self.search_status_label.setText("Buscando...")
+        self.search_status_label.show()
+
+        prefix = self.current_path
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        mode = self.search_mode_combobox.currentData()
+        self.search_pool.submit(
+            self._run_search, self.search_generation, pattern, mode, prefix
+        )
+
+    def _run_search(self, generation, pattern, mode, prefix):
+        def superseded():
+            return generation != self.search_generation
+
+        try:
+            index = get_index()
+            if not index.has_bucket(self.bucket):
+                self.search_finished.emit(generation, "indexing")
+            elif index.is_stale(self.bucket, prefix):
+                self.search_finished.emit(generation, "updating")
+            index.refresh_if_stale(self.client, self.bucket, prefix)
+            found = 0
+            for batch in index.search(self.bucket, pattern, mode, prefix, superseded):
+                found += len(batch)
+                self.search_results.emit(generation, batch)
+                if found >= SEARCH_MAX_RESULTS:
+                    self.search_finished.emit(generation, "limit")
+                    return
+            self.search_finished.emit(generation, "done")
+        except Exception as e:
+            self.search_finished.emit(generation, f"error:{e}")
+
+    def on_search_results(self, generation, batch):
+        if generation != self.search_generation:
+            return
+        remaining = SEARCH_MAX_RESULTS - self.search_count
+        for obj in batch[:remaining]:
+            item = QtWidgets.QListWidgetItem(obj["Key"])
+            item.setData(QtCore.Qt.UserRole, obj["Key"])
+            item.setToolTip(format_size(obj["Size"]))
+            self.search_list.addItem(item)
+        self.search_count += min(len(batch), remaining)
+        self.search_status_label.setText(f"Buscando... {self.search_count} resultados")
+
+    def on_search_finished(self, generation, status):
+        if generation != self.search_generation:
+            return
+        if status == "indexing":
+            self.search_status_label.setText(
+                "Construyendo el índice local del bucket, esto solo ocurre una vez..."
+            )
+        elif status == "updating":
+            self.search_status_label.setText("Actualizando el índice local...")
+        elif status == "limit":
+            self.search_status_label.setText(
+                f"Mostrando los primeros {self.search_count} resultados."
+            )
+        elif status.startswith("error:"):
+            self.search_status_label.setText(f"Error en la búsqueda: {status[6:]}")
+        else:
+            self.search_status_label.setText(f"{self.search_count} resultados.")
+
+    def on_search_item_double_clicked(self, item):
+        key = item.data(QtCore.Qt.UserRole)
+        folder = key if key.endswith("/") else key[: key.rfind("/") + 1]
+        self.search_edit.clear()
+        self.load_path(folder)
+        self.history.append(folder)
+        self.history_index += 1
+        self.update_navigation_buttons()
+
+    def closeEvent(self, event):
+        self.search_timer.stop()
+        self.search_generation += 1
+        self.search_pool.shutdown(wait=False, cancel_futures=True)
+        self.model.shutdown()
+        event.accept()
@@ -0,0 +1,699 @@
+import csv
+import fnmatch
+import gzip
+import importlib.util
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import unquote_plus
+
+from awsListing import FANOUT_WORKERS, Listing, iter_bucket, list_prefix
+
+INDEX_PATH = os.getenv(
+    "AWS_INDEX_PATH",
+    os.path.join(os.path.expanduser("~"), ".awsApp", "bucket_index.sqlite3"),
+)
+# Profundidad de las unidades de sincronización: "Proyecto/Vuelo/".
+INDEX_UNIT_DEPTH = 2
+INDEX_BATCH = 1000
+INDEX_SCHEMA_VERSION = 4
+# Antes de buscar se vuelve a listar lo sincronizado hace más de esto: así se
+# ven las subidas de otros equipos, que no pasan por el write-through.
+INDEX_MAX_AGE = float(os.getenv("AWS_INDEX_MAX_AGE", "3600"))
+SEARCH_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    id INTEGER PRIMARY KEY,
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified REAL,
+    seen_at REAL NOT NULL,
+    UNIQUE (bucket, key)
+);
+CREATE TABLE IF NOT EXISTS units (
+    bucket TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    synced_at REAL,
+    dirty INTEGER NOT NULL DEFAULT 0,
+    -- Sube con cada marca de sucia: un refresco solo limpia lo que él vio.
+    generation INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, prefix)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS syncs (
+    bucket TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (bucket, prefix)
+) WITHOUT ROWID;
+"""
+
+# Índice de trigramas sobre las claves (SQLite >= 3.34). Las altas y bajas se
+# propagan con triggers; los upserts conservan el id y no tocan el índice.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS keys_fts USING fts5(
+    key, content='objects', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS objects_ai AFTER INSERT ON objects BEGIN
+    INSERT INTO keys_fts (rowid, key) VALUES (new.id, new.key);
+END;
+CREATE TRIGGER IF NOT EXISTS objects_ad AFTER DELETE ON objects BEGIN
+    INSERT INTO keys_fts (keys_fts, rowid, key) VALUES ('delete', old.id, old.key);
+END;
+"""
+
+UPSERT_OBJECT = (
+    "INSERT INTO objects (bucket, key, size, etag, last_modified, seen_at) "
+    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (bucket, key) DO UPDATE SET "
+    "size = excluded.size, etag = excluded.etag, "
+    "last_modified = excluded.last_modified, seen_at = excluded.seen_at"
+)
+
+
+def prefix_upper_bound(prefix):
+    # Menor cadena mayor que todas las claves que empiezan por `prefix`.
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def unit_of(key, depth=INDEX_UNIT_DEPTH):
+    end = 0
+    for _ in range(depth):
+        end = key.find("/", end) + 1
+        if end == 0:
+            return None
+    return key[:end]
+
+
+def _row_from_object(bucket, obj, seen_at):
+    last_modified = obj.get("LastModified")
+    if last_modified is not None and not isinstance(last_modified, (int, float)):
+        last_modified = last_modified.timestamp()
+    etag = obj.get("ETag")
+    if etag:
+        etag = etag.strip('"')
+    return (bucket, obj["Key"], obj["Size"], etag, last_modified, seen_at)
+
+
+def _object_from_row(row):
+    key, size, etag, last_modified = row
+    return {"Key": key, "Size": size, "ETag": etag, "LastModified": last_modified}
+
+
+class BucketIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != INDEX_SCHEMA_VERSION:
+                # El índice es una caché: ante un esquema distinto se reconstruye.
+                self.conn.executescript(
+                    "DROP TRIGGER IF EXISTS objects_ai;"
+                    "DROP TRIGGER IF EXISTS objects_ad;"
+                    "DROP TABLE IF EXISTS keys_fts;"
+                    "DROP TABLE IF EXISTS objects;"
+                    "DROP TABLE IF EXISTS units;"
+                    "DROP TABLE IF EXISTS syncs;"
+                )
+            self.conn.executescript(SCHEMA)
+            try:
+                self.conn.executescript(SEARCH_SCHEMA)
+                self.has_trigrams = True
+            except sqlite3.OperationalError:
+                self.has_trigrams = False
+            self.conn.execute(f"PRAGMA user_version = {INDEX_SCHEMA_VERSION}")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _range_clause(self, prefix):
+        upper = prefix_upper_bound(prefix)
+        if upper is None:
+            return "bucket = ? AND key >= ?", [prefix]
+        return "bucket = ? AND key >= ? AND key < ?", [prefix, upper]
+
+    def _unit_clause(self, bucket, prefix):
+        # Unidades bajo `prefix` y, si es más profundo, la que lo contiene.
+        clause, params = self._range_clause(prefix)
+        clause = clause.replace("key", "prefix")
+        return (
+            f"(({clause}) OR (bucket = ? AND prefix = ?))",
+            [bucket] + params + [bucket, unit_of(prefix) or prefix],
+        )
+
+    # Consultas
+
+    def iter_objects(self, bucket, prefix="", start_after=None):
+        clause, params = self._range_clause(prefix)
+        cursor_key = start_after
+        while True:
+            query = f"SELECT key, size, etag, last_modified FROM objects WHERE {clause}"
+            query_params = [bucket] + params
+            if cursor_key is not None:
+                query += " AND key > ?"
+                query_params.append(cursor_key)
+            query += " ORDER BY key LIMIT ?"
+            query_params.append(INDEX_BATCH)
+            with self.lock:
+                rows = self.conn.execute(query, query_params).fetchall()
+            for row in rows:
+                yield _object_from_row(row)
+            if len(rows) < INDEX_BATCH:
+                return
+            cursor_key = rows[-1][0]
+
+    def list_prefix(self, bucket, prefix="", delimiter="/"):
+        if not delimiter:
+            return Listing((), tuple(self.iter_objects(bucket, prefix)), None, 1)
+
+        # Recorrido con saltos: cada subcarpeta cuesta una búsqueda en el índice
+        # en lugar de leer todas sus claves.
+        prefixes = []
+        objects = []
+        upper = prefix_upper_bound(prefix)
+        cursor_key, inclusive = prefix, True
+        while True:
+            query = (
+                "SELECT key, size, etag, last_modified FROM objects "
+                f"WHERE bucket = ? AND key {'>=' if inclusive else '>'} ?"
+            )
+            params = [bucket, cursor_key]
+            if upper is not None:
+                query += " AND key < ?"
+                params.append(upper)
+            query += " ORDER BY key LIMIT ?"
+            params.append(INDEX_BATCH)
+            with self.lock:
+                rows = self.conn.execute(query, params).fetchall()
+            if not rows:
+                break
+
+            jumped = False
+            for row in rows:
+                key = row[0]
+                position = key.find(delimiter, len(prefix))
+                if position == -1:
+                    objects.append(_object_from_row(row))
+                    continue
+                child_prefix = key[: position + len(delimiter)]
+                prefixes.append(child_prefix)
+                cursor_key, inclusive = prefix_upper_bound(child_prefix), True
+                jumped = True
+                break
+            if not jumped:
+                if len(rows) < INDEX_BATCH:
+                    break
+                cursor_key, inclusive = rows[-1][0], False
+        return Listing(tuple(prefixes), tuple(objects), None, 1)
+
+    def totals(self, bucket, prefix=""):
+        clause, params = self._range_clause(prefix)
+        with self.lock:
+            size, count = self.conn.execute(
+                f"SELECT COALESCE(SUM(size), 0), COUNT(*) FROM objects WHERE {clause}",
+                [bucket] + params,
+            ).fetchone()
+        return size, count
+
+    def has_bucket(self, bucket):
+        # Solo cuenta un refresco completo: el write-through también crea
+        # unidades, pero no dice nada del resto del bucket.
+        return self.synced_at(bucket) is not None
+
+    def synced_at(self, bucket, prefix=""):
+        # Último refresco completo de `prefix` o de un prefijo que lo contenga.
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MAX(synced_at) FROM syncs "
+                "WHERE bucket = ? AND substr(?, 1, length(prefix)) = prefix",
+                (bucket, prefix),
+            ).fetchone()
+        return row[0]
+
+    def is_stale(self, bucket, prefix="", max_age=INDEX_MAX_AGE):
+        synced_at = self.synced_at(bucket, prefix)
+        if synced_at is None or time.time() - synced_at > max_age:
+            return True
+        clause, params = self._unit_clause(bucket, prefix)
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT 1 FROM units WHERE dirty = 1 AND {clause} LIMIT 1", params
+            ).fetchone()
+        return row is not None
+
+    def refresh_if_stale(self, client, bucket, prefix="", max_age=INDEX_MAX_AGE):
+        # Sin refresco completo previo se indexa todo el bucket; si no, solo se
+        # vuelven a listar las unidades sucias o antiguas bajo `prefix`.
+        if not self.has_bucket(bucket):
+            return self.refresh(client, bucket)
+        if self.is_stale(bucket, prefix, max_age):
+            return self.refresh(client, bucket, prefix, max_age)
+        return None
+
+    def search(self, bucket, pattern, mode="substring", prefix="", stop=None):
+        literal, operator, verify = _search_plan(pattern, mode)
+        use_trigrams = self.has_trigrams and literal is not None
+        clause, params = self._range_clause(prefix)
+        # "+" y CROSS JOIN obligan a recorrer por id (trigramas o tabla) en vez
+        # de por el índice de claves, para poder paginar sin ordenar.
+        clause = clause.replace("bucket", "+o.bucket").replace("key", "+o.key")
+
+        if use_trigrams:
+            query = (
+                "SELECT o.id, o.key, o.size, o.etag, o.last_modified "
+                "FROM keys_fts CROSS JOIN objects o ON o.id = keys_fts.rowid "
+                f"WHERE keys_fts.key {operator} ? AND keys_fts.rowid > ? AND {clause} "
+                "ORDER BY keys_fts.rowid LIMIT ?"
+            )
+            search_param = [f"%{literal}%" if operator == "LIKE" else literal]
+        else:
+            query = (
+                "SELECT o.id, o.key, o.size, o.etag, o.last_modified FROM objects o "
+                f"WHERE o.id > ? AND {clause} ORDER BY o.id LIMIT ?"
+            )
+            search_param = []
+
+        # Los resultados salen por lotes para poder mostrarlos a medida que llegan.
+        last_id = 0
+        while stop is None or not stop():
+            with self.lock:
+                rows = self.conn.execute(
+                    query, search_param + [last_id, bucket] + params + [SEARCH_BATCH]
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            matches = [_object_from_row(row[1:]) for row in rows if verify(row[1])]
+            if matches:
+                yield matches
+            if len(rows) < SEARCH_BATCH:
+                return
+
+    def get(self, bucket, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT key, size, etag, last_modified FROM objects "
+                "WHERE bucket = ? AND key = ?",
+                (bucket, key),
+            ).fetchone()
+        return _object_from_row(row) if row else None
+
+    # Escrituras de la propia aplicación
+
+    def record_objects(self, bucket, objects):
+        seen_at = time.time()
+        rows = [_row_from_object(bucket, obj, seen_at) for obj in objects]
+        with self.lock, self.conn:
+            self._insert_rows(rows)
+            for unit in {unit_of(row[1]) for row in rows} - {None}:
+                self._mark_dirty(bucket, unit)
+
+    def record_upload(self, bucket, key, size, etag=None, last_modified=None):
+        if last_modified is None:
+            last_modified = time.time()
+        self.record_objects(
+            bucket,
+            [{"Key": key, "Size": size, "ETag": etag, "LastModified": last_modified}],
+        )
+
+    def remove_prefix(self, bucket, prefix):
+        clause, params = self._range_clause(prefix)
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM objects WHERE {clause}", [bucket] + params)
+            for table in ("units", "syncs"):
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE {clause.replace('key', 'prefix')}",
+                    [bucket] + params,
+                )
+
+    def mark_dirty(self, bucket, prefix):
+        with self.lock, self.conn:
+            self._mark_dirty(bucket, prefix)
+
+    def expire(self, bucket, prefix=""):
+        # "Refrescar" en el explorador: la próxima búsqueda vuelve a listar las
+        # unidades bajo `prefix`.
+        clause, params = self._unit_clause(bucket, prefix)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE units SET dirty = 1, generation = generation + 1 "
+                f"WHERE {clause}",
+                params,
+            )
+
+    def _mark_dirty(self, bucket, prefix):
+        unit = unit_of(prefix) or prefix
+        self.conn.execute(
+            "INSERT INTO units (bucket, prefix, synced_at, dirty, generation) "
+            "VALUES (?, ?, NULL, 1, 1) ON CONFLICT (bucket, prefix) "
+            "DO UPDATE SET dirty = 1, generation = generation + 1",
+            (bucket, unit),
+        )
+
+    # Sincronización
+
+    def _enumerate_units(self, client, bucket, prefix, depth):
+        # Recorre los niveles por encima de las unidades con listados de un nivel;
+        # los objetos sueltos de esos niveles se devuelven aparte.
+        if prefix.count("/") >= depth:
+            return [unit_of(prefix, depth)], {}
+        level = [prefix]
+        loose = {}
+        for _ in range(depth - prefix.count("/")):
+            next_level = []
+            for level_prefix in level:
+                listing = list_prefix(client, bucket, level_prefix, cache=None)
+                loose[level_prefix] = listing.objects
+                next_level.extend(listing.prefixes)
+            level = next_level
+        return level, loose
+
+    def refresh(
+        self,
+        client,
+        bucket,
+        prefix="",
+        max_age=None,
+        depth=INDEX_UNIT_DEPTH,
+        max_workers=FANOUT_WORKERS,
+    ):
+        units, loose = self._enumerate_units(client, bucket, prefix, depth)
+        clause, params = self._range_clause(prefix)
+        with self.lock:
+            known = {
+                unit: (synced_at, dirty, generation)
+                for unit, synced_at, dirty, generation in self.conn.execute(
+                    "SELECT prefix, synced_at, dirty, generation FROM units "
+                    f"WHERE {clause.replace('key', 'prefix')}",
+                    [bucket] + params,
+                )
+            }
+
+        now = time.time()
+        stale = []
+        for unit in units:
+            synced_at, dirty, _ = known.get(unit, (None, 1, 0))
+            if dirty or synced_at is None:
+                stale.append(unit)
+            elif max_age is not None and now - synced_at > max_age:
+                stale.append(unit)
+        current = set(units)
+        removed = [unit for unit in known if unit not in current]
+
+        with self.lock, self.conn:
+            for unit in removed:
+                unit_clause, unit_params = self._range_clause(unit)
+                self.conn.execute(
+                    f"DELETE FROM objects WHERE {unit_clause}", [bucket] + unit_params
+                )
+            self.conn.executemany(
+                "DELETE FROM units WHERE bucket = ? AND prefix = ?",
+                [(bucket, unit) for unit in removed],
+            )
+            for level_prefix, objects in loose.items():
+                self._replace_loose(bucket, level_prefix, objects, now)
+
+        if not stale:
+            self._record_sync(bucket, prefix, now)
+            return {"units": len(units), "relisted": 0, "removed": len(removed)}
+
+        # Las filas se reescriben por lotes marcadas con seen_at; al terminar se
+        # borran las que no aparecieron, así los lectores nunca ven una unidad vacía.
+        shards = [("range", unit, None, None) for unit in stale]
+        batch = []
+        for obj in iter_bucket(client, bucket, shards=shards, max_workers=max_workers):
+            batch.append(_row_from_object(bucket, obj, now))
+            if len(batch) >= INDEX_BATCH:
+                with self.lock, self.conn:
+                    self._insert_rows(batch)
+                batch = []
+
+        with self.lock, self.conn:
+            self._insert_rows(batch)
+            for unit in stale:
+                unit_clause, unit_params = self._range_clause(unit)
+                self.conn.execute(
+                    f"DELETE FROM objects WHERE {unit_clause} AND seen_at < ?",
+                    [bucket] + unit_params + [now],
+                )
+            # Una unidad marcada mientras se listaba sigue sucia: su generación
+            # ya no es la leída al empezar y el upsert no la toca.
+            self.conn.executemany(
+                "INSERT INTO units (bucket, prefix, synced_at, dirty) "
+                "VALUES (?, ?, ?, 0) ON CONFLICT (bucket, prefix) "
+                "DO UPDATE SET synced_at = excluded.synced_at, dirty = 0 "
+                "WHERE units.generation = ?",
+                [
+                    (bucket, unit, now, known.get(unit, (None, 1, 0))[2])
+                    for unit in stale
+                ],
+            )
+        self._record_sync(bucket, prefix, now)
+        return {"units": len(units), "relisted": len(stale), "removed": len(removed)}
+
+    def _record_sync(self, bucket, prefix, synced_at):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)",
+                (bucket, prefix, synced_at),
+            )
+
+    def _replace_loose(self, bucket, level_prefix, objects, seen_at):
+        clause, params = self._range_clause(level_prefix)
+        self.conn.execute(
+            f"DELETE FROM objects WHERE {clause} AND instr(substr(key, ?), '/') = 0",
+            [bucket] + params + [len(level_prefix) + 1],
+        )
+        self._insert_rows([_row_from_object(bucket, obj, seen_at) for obj in objects])
+
+    def _insert_rows(self, rows):
+        if rows:
+            self.conn.executemany(UPSERT_OBJECT, rows)
+
+    # S3 Inventory
+
+    def ingest_inventory(self, bucket, paths, schema, snapshot_at=None):
+        columns = [column.strip() for column in schema.split(",")]
+        if snapshot_at is None:
+            snapshot_at = time.time()
+
+        units = set()
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM objects WHERE bucket = ?", (bucket,))
+            self.conn.execute("DELETE FROM units WHERE bucket = ?", (bucket,))
+            self.conn.execute("DELETE FROM syncs WHERE bucket = ?", (bucket,))
+            for path in paths:
+                batch = []
+                for record in _read_inventory_file(path, columns):
+                    if record.get("IsLatest", "true").lower() == "false":
+                        continue
+                    if record.get("IsDeleteMarker", "false").lower() == "true":
+                        continue
+                    key = record["Key"]
+                    last_modified = record.get("LastModifiedDate")
+                    batch.append(
+                        (
+                            bucket,
+                            key,
+                            int(record.get("Size") or 0),
+                            record.get("ETag"),
+                            _parse_timestamp(last_modified),
+                            snapshot_at,
+                        )
+                    )
+                    unit = unit_of(key)
+                    if unit:
+                        units.add(unit)
+                    if len(batch) >= INDEX_BATCH:
+                        self._insert_rows(batch)
+                        batch = []
+                self._insert_rows(batch)
+            # Lo escrito después de la instantánea se detecta por write-through
+            # o al refrescar con max_age.
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO units (bucket, prefix, synced_at, dirty) "
+                "VALUES (?, ?, ?, 0)",
+                [(bucket, unit, snapshot_at) for unit in units],
+            )
+            self.conn.execute(
+                "INSERT INTO syncs VALUES (?, '', ?)", (bucket, snapshot_at)
+            )
+        return len(units)
+
+    def ingest_inventory_manifest(self, client, manifest_bucket, manifest_key, workdir):
+        manifest = json.load(
+            client.get_object(Bucket=manifest_bucket, Key=manifest_key)["Body"]
+        )
+        paths = []
+        os.makedirs(workdir, exist_ok=True)
+        destination_bucket = manifest["destinationBucket"].split(":::")[-1]
+        for entry in manifest["files"]:
+            path = os.path.join(workdir, os.path.basename(entry["key"]))
+            client.download_file(destination_bucket, entry["key"], path)
+            paths.append(path)
+        snapshot_at = int(manifest.get("creationTimestamp", time.time() * 1000)) / 1000
+        return self.ingest_inventory(
+            manifest["sourceBucket"],
+            paths,
+            manifest.get("fileSchema", "Bucket, Key, Size, LastModifiedDate, ETag"),
+            snapshot_at,
+        )
+
+
+def _longest_literal(parts):
+    longest = max(parts, key=len, default="")
+    return longest if len(longest) >= 3 else None
+
+
+def _regex_literal(pattern):
+    # Fragmento literal que toda coincidencia debe contener, para filtrar con el
+    # índice de trigramas antes de evaluar la expresión completa.
+    if "|" in pattern or "(" in pattern:
+        return None
+    parts = [""]
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        if char in "[{":
+            closing = pattern.find("]" if char == "[" else "}", position + 2)
+            if closing == -1:
+                return None
+            if char == "{":
+                parts[-1] = parts[-1][:-1]
+            parts.append("")
+            position = closing + 1
+            continue
+        if char == "\\" and position + 1 < len(pattern):
+            escaped = pattern[position + 1]
+            if escaped.isalnum():
+                parts.append("")
+            else:
+                parts[-1] += escaped
+            position += 2
+            continue
+        if char in "?*":
+            parts[-1] = parts[-1][:-1]
+            parts.append("")
+        elif char in ".^$+":
+            parts.append("")
+        else:
+            parts[-1] += char
+        position += 1
+    return _longest_literal(parts)
+
+
+def _search_plan(pattern, mode):
+    if mode == "glob":
+        regex = re.compile(fnmatch.translate(pattern), re.DOTALL)
+        parts = re.split(r"[*?\[\]]", pattern)
+        return (
+            pattern.replace("[!", "[^") if _longest_literal(parts) else None,
+            "GLOB",
+            lambda key: regex.match(key) is not None,
+        )
+    if mode == "regex":
+        regex = re.compile(pattern)
+        return (
+            _regex_literal(pattern),
+            "LIKE",
+            lambda key: regex.search(key) is not None,
+        )
+    needle = pattern.lower()
+    return (
+        pattern if len(pattern) >= 3 else None,
+        "LIKE",
+        lambda key: needle in key.lower(),
+    )
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return value.timestamp()
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _read_inventory_file(path, columns):
+    if path.endswith(".parquet"):
+        if importlib.util.find_spec("pyarrow") is None:
+            raise RuntimeError("Se requiere pyarrow para leer inventarios Parquet.")
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        names = {name.lower(): name for name in table.column_names}
+        wanted = {column: names.get(column.lower()) for column in columns}
+        for record in table.to_pylist():
+            yield {column: record[name] for column, name in wanted.items() if name}
+        return
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", newline="", encoding="utf-8") as handle:
+        for values in csv.reader(handle):
+            record = dict(zip(columns, values))
+            # Las claves del inventario CSV vienen codificadas como URL.
+            record["Key"] = unquote_plus(record["Key"])
+            yield record
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_index():
+    # El explorador y la subida lo piden desde hilos distintos.
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = BucketIndex()
+        return _default_index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import boto3
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Índice local del bucket S3")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    refresh_parser = subparsers.add_parser("refresh")
+    refresh_parser.add_argument("prefix", nargs="?", default="")
+    refresh_parser.add_argument("--max-age", type=float, default=None)
+    ingest_parser = subparsers.add_parser("ingest")
+    ingest_parser.add_argument("manifest_bucket")
+    ingest_parser.add_argument("manifest_key")
+    ingest_parser.add_argument("--workdir", default="inventory")
+    args = parser.parse_args()
+
+    client = boto3.client(
+        "s3",
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+    )
+    index = get_index()
+    if args.command == "refresh":
+        print(index.refresh(client, os.getenv("AWS_BUCKET"), args.prefix, args.max_age))
+    else:
+        units = index.ingest_inventory_manifest(
+            client, args.manifest_bucket, args.manifest_key, args.workdir
+        )
+        print(f"Inventario cargado: {units} unidades.")
@@ -0,0 +1,357 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+APP_DIR = os.path.join(os.path.expanduser("~"), ".awsApp")
+FOLDERS_CACHE_PATH = os.path.join(APP_DIR, "s3_folders.json")
+
+LISTING_TTL = 300
+LISTING_MAX_ENTRIES = 256
+TOTALS_MAX_ENTRIES = 4096
+AGGREGATE_WORKERS = 8
+FANOUT_WORKERS = 8
+FANOUT_SPLIT_DEPTH = 2
+FANOUT_QUEUE_PAGES = 16
+KEY_RANGE_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+# next_token es None cuando el listado está completo; si no, `pages` indica
+# cuántas páginas se han leído hasta ahora (listado parcial, p. ej. prefetch).
+Listing = namedtuple("Listing", ["prefixes", "objects", "next_token", "pages"])
+PrefixTotals = namedtuple("PrefixTotals", ["size", "count", "computed_at"])
+
+
+class ListingCache:
+    def __init__(self, ttl=LISTING_TTL, max_entries=LISTING_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, bucket, prefix, delimiter):
+        cache_key = (bucket, prefix, delimiter)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if (
+                entry is not None
+                and self.ttl is not None
+                and time.monotonic() - entry[0] > self.ttl
+            ):
+                del self._entries[cache_key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, bucket, prefix, delimiter, listing):
+        cache_key = (bucket, prefix, delimiter)
+        with self._lock:
+            self._entries[cache_key] = (time.monotonic(), listing)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, bucket=None, key=None):
+        # Una escritura en `key` afecta a todo listado cuyo prefijo la contenga,
+        # y borrar un prefijo afecta a todos los listados por debajo de él.
+        with self._lock:
+            if bucket is None:
+                self._entries.clear()
+                return
+            for cache_key in list(self._entries):
+                cached_bucket, cached_prefix, _ = cache_key
+                if cached_bucket != bucket:
+                    continue
+                if (
+                    key is None
+                    or key.startswith(cached_prefix)
+                    or cached_prefix.startswith(key)
+                ):
+                    del self._entries[cache_key]
+
+    def clear(self):
+        self.invalidate()
+
+
+listing_cache = ListingCache()
+# Los totales por prefijo no caducan: se reutilizan hasta que se invalidan.
+totals_cache = ListingCache(ttl=None, max_entries=TOTALS_MAX_ENTRIES)
+
+
+def invalidate_prefix(bucket, key):
+    listing_cache.invalidate(bucket, key)
+    totals_cache.invalidate(bucket, key)
+
+
+def list_prefix(
+    client,
+    bucket,
+    prefix="",
+    delimiter="/",
+    cache=listing_cache,
+    refresh=False,
+    max_pages=None,
+):
+    listing = None
+    if cache is not None and not refresh:
+        listing = cache.get(bucket, prefix, delimiter)
+        if listing is not None and (
+            listing.next_token is None
+            or (max_pages is not None and listing.pages >= max_pages)
+        ):
+            return listing
+
+    if listing is None:
+        prefixes, objects, token, pages = [], [], None, 0
+    else:
+        prefixes = list(listing.prefixes)
+        objects = list(listing.objects)
+        token, pages = listing.next_token, listing.pages
+
+    params = {"Bucket": bucket, "Prefix": prefix}
+    if delimiter:
+        params["Delimiter"] = delimiter
+
+    while True:
+        if token:
+            params["ContinuationToken"] = token
+        page = client.list_objects_v2(**params)
+        for common_prefix in page.get("CommonPrefixes", []):
+            prefixes.append(common_prefix["Prefix"])
+        objects.extend(page.get("Contents", []))
+        pages += 1
+        token = page.get("NextContinuationToken") if page.get("IsTruncated") else None
+        if token is None or (max_pages is not None and pages >= max_pages):
+            break
+
+    listing = Listing(tuple(prefixes), tuple(objects), token, pages)
+    if cache is not None:
+        cache.put(bucket, prefix, delimiter, listing)
+    return listing
+
+
+def _add_key_totals(totals, base_prefix, key, size):
+    # Acumula el objeto en cada prefijo intermedio entre base_prefix y la clave.
+    # Los marcadores de carpeta ("x/") solo crean el prefijo, no cuentan.
+    counted = not key.endswith("/")
+    end = len(base_prefix)
+    while True:
+        end = key.find("/", end) + 1
+        if end == 0:
+            break
+        entry = totals[key[:end]]
+        if counted:
+            entry[0] += size
+            entry[1] += 1
+
+
+def load_cached_folders(bucket, path=FOLDERS_CACHE_PATH):
+    # Última lista de carpetas conocida, para mostrarla sin esperar a S3.
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle).get(bucket or "", [])
+    except (OSError, ValueError):
+        return []
+
+
+def save_cached_folders(bucket, folders, path=FOLDERS_CACHE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            cached = json.load(handle)
+    except (OSError, ValueError):
+        cached = {}
+    cached[bucket or ""] = list(folders)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as handle:
+        json.dump(cached, handle)
+    os.replace(temporary_path, path)
+
+
+def aggregate_prefix(
+    client, bucket, prefix="", max_workers=AGGREGATE_WORKERS, cache=totals_cache
+):
+    totals = defaultdict(lambda: [0, 0])
+    root = totals[prefix]
+    for obj in iter_bucket(client, bucket, prefix, max_workers=max_workers):
+        if not obj["Key"].endswith("/"):
+            root[0] += obj["Size"]
+            root[1] += 1
+        _add_key_totals(totals, prefix, obj["Key"], obj["Size"])
+
+    computed_at = time.time()
+    result = {
+        subprefix: PrefixTotals(size, count, computed_at)
+        for subprefix, (size, count) in totals.items()
+    }
+    if cache is not None:
+        # El prefijo pedido se guarda el último, detrás de sus hijos: sus propios
+        # descendientes no pueden expulsarlo de la caché. Si el subárbol no cabe
+        # holgado se guardan solo el prefijo y sus hijos directos, para no
+        # expulsar los totales de los demás nodos visibles.
+        depth = prefix.count("/")
+        entries = sorted(
+            result.items(), key=lambda item: item[0].count("/"), reverse=True
+        )
+        if len(entries) > cache.max_entries // 2:
+            entries = [item for item in entries if item[0].count("/") <= depth + 1]
+        for subprefix, prefix_totals in entries:
+            cache.put(bucket, subprefix, None, prefix_totals)
+    return result
+
+
+def key_range_shards(prefix, shard_count, alphabet=KEY_RANGE_ALPHABET):
+    # Rangos (inicio, fin] que cubren todo el espacio de claves bajo `prefix`.
+    step = max(1, len(alphabet) // max(1, shard_count))
+    bounds = [prefix + char for char in alphabet[step::step]]
+    starts = [None] + bounds
+    ends = bounds + [None]
+    return [("range", prefix, start, end) for start, end in zip(starts, ends)]
+
+
+def plan_shards(
+    client,
+    bucket,
+    prefix="",
+    shard_count=FANOUT_WORKERS,
+    split_depth=FANOUT_SPLIT_DEPTH,
+    split_points=None,
+):
+    if split_points:
+        bounds = sorted(split_points)
+        starts = [None] + bounds
+        ends = bounds + [None]
+        return [("range", prefix, start, end) for start, end in zip(starts, ends)]
+
+    top = list_prefix(client, bucket, prefix, cache=None, max_pages=1)
+    if top.next_token is not None:
+        return key_range_shards(prefix, shard_count * 2)
+    if not top.prefixes:
+        return [("objects", list(top.objects))]
+
+    objects = list(top.objects)
+    prefixes = list(top.prefixes)
+    depth = 1
+    with ThreadPoolExecutor(max_workers=shard_count) as pool:
+        while len(prefixes) < shard_count * 2 and depth < split_depth:
+            expanded = []
+            children = pool.map(
+                lambda child: list_prefix(
+                    client, bucket, child, cache=None, max_pages=1
+                ),
+                prefixes,
+            )
+            for child_prefix, listing in zip(prefixes, children):
+                if listing.next_token is not None or not listing.prefixes:
+                    expanded.append(child_prefix)
+                    continue
+                objects.extend(listing.objects)
+                expanded.extend(listing.prefixes)
+            if expanded == prefixes:
+                break
+            prefixes = expanded
+            depth += 1
+
+    # Los objetos sueltos y los prefijos se ordenan juntos: como los rangos
+    # son disjuntos, concatenar los fragmentos en orden conserva el orden global.
+    segments = [(obj["Key"], obj) for obj in objects]
+    segments += [(child_prefix, None) for child_prefix in prefixes]
+    segments.sort(key=lambda segment: segment[0])
+
+    shards = []
+    for key, obj in segments:
+        if obj is None:
+            shards.append(("range", key, None, None))
+        elif shards and shards[-1][0] == "objects":
+            shards[-1][1].append(obj)
+        else:
+            shards.append(("objects", [obj]))
+    return shards
+
+
+def _put_page(out, page, stop):
+    while not stop.is_set():
+        try:
+            out.put(page, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _list_shard(client, bucket, shard, out, stop):
+    try:
+        _, prefix, start_after, end_key = shard
+        params = {"Bucket": bucket, "Prefix": prefix}
+        if start_after:
+            params["StartAfter"] = start_after
+        paginator = client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(**params):
+            if stop.is_set():
+                return
+            contents = page.get("Contents", [])
+            if end_key is not None:
+                in_range = [obj for obj in contents if obj["Key"] <= end_key]
+                if in_range and not _put_page(out, in_range, stop):
+                    return
+                if len(in_range) < len(contents):
+                    break
+            elif contents and not _put_page(out, contents, stop):
+                return
+        _put_page(out, None, stop)
+    except Exception as e:
+        _put_page(out, e, stop)
+
+
+def iter_bucket(
+    client,
+    bucket,
+    prefix="",
+    max_workers=FANOUT_WORKERS,
+    split_depth=FANOUT_SPLIT_DEPTH,
+    split_points=None,
+    shards=None,
+):
+    if shards is None:
+        shards = plan_shards(
+            client, bucket, prefix, max_workers, split_depth, split_points
+        )
+    shards = deque(shards)
+    stop = threading.Event()
+    window = deque()
+
+    # Como mucho max_workers fragmentos se listan a la vez; cada uno deja sus
+    # páginas en una cola acotada y se consumen en orden de clave.
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            while shards or window:
+                while shards and len(window) < max_workers:
+                    shard = shards.popleft()
+                    if shard[0] == "objects":
+                        window.append(shard[1])
+                        continue
+                    out = queue.Queue(maxsize=FANOUT_QUEUE_PAGES)
+                    pool.submit(_list_shard, client, bucket, shard, out, stop)
+                    window.append(out)
+
+                current = window.popleft()
+                if isinstance(current, list):
+                    yield from current
+                    continue
+                while True:
+                    page = current.get()
+                    if page is None:
+                        break
+                    if isinstance(page, Exception):
+                        raise page
+                    yield from page
+        finally:
+            stop.set()
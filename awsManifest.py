@@ -0,0 +1,373 @@
+import importlib.util
+import json
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from awsDevices import reader_slot
+from awsEvents import log_error
+from awsTransfer import list_upload_files
+
+# Manifiesto de cada carpeta: un registro por archivo con tamaño, fecha de
+# captura, GPS y cámara, para planificar el procesado sin descargar imágenes.
+# "jsonl", "parquet" (si hay pyarrow; si no, JSON Lines) o vacío/"0" para
+# no generarlo.
+MANIFEST_FORMAT = os.getenv("AWS_MANIFEST_FORMAT", "jsonl")
+MANIFEST_NAMES = {"jsonl": "_manifest.jsonl", "parquet": "_manifest.parquet"}
+MANIFEST_STEM = "_manifest"
+MANIFEST_WORKERS = 8
+METADATA_EXTENSIONS = {".jpg", ".jpeg", ".tif", ".tiff", ".dng", ".png"}
+# La cabecera se lee a trozos hasta encontrar lo necesario. En JPEG el EXIF
+# (con su miniatura) y el XMP de los drones caben en este máximo.
+HEADER_CHUNK = 16 * 1024
+MAX_HEADER_BYTES = 128 * 1024
+
+MANIFEST_COLUMNS = [
+    ("key", "string"),
+    ("size", "int64"),
+    ("mtime", "float64"),
+    ("taken", "string"),
+    ("lat", "float64"),
+    ("lon", "float64"),
+    ("alt", "float64"),
+    ("rel_alt", "float64"),
+    ("gimbal_yaw", "float64"),
+    ("gimbal_pitch", "float64"),
+    ("make", "string"),
+    ("model", "string"),
+    ("width", "int32"),
+    ("height", "int32"),
+    ("orientation", "int32"),
+]
+
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8, 11: 4, 12: 8}
+IFD0_TAGS = {
+    0x0100: "width",
+    0x0101: "height",
+    0x010F: "make",
+    0x0110: "model",
+    0x0112: "orientation",
+    0x0132: "datetime",
+    0x8769: "exif_ifd",
+    0x8825: "gps_ifd",
+}
+EXIF_TAGS = {
+    0x9003: "datetime_original",
+    0x9011: "offset_original",
+    0x9291: "subsec_original",
+    0xA002: "pixel_width",
+    0xA003: "pixel_height",
+}
+GPS_TAGS = {
+    1: "lat_ref",
+    2: "lat",
+    3: "lon_ref",
+    4: "lon",
+    5: "alt_ref",
+    6: "alt",
+}
+# Campos XMP de los drones DJI, como atributo o como elemento.
+XMP_FIELDS = {
+    b"RelativeAltitude": "rel_alt",
+    b"GimbalYawDegree": "gimbal_yaw",
+    b"GimbalPitchDegree": "gimbal_pitch",
+}
+XMP_PATTERN = re.compile(rb"drone-dji:(\w+)(?:=\"|>)([+-]?[0-9.]+)")
+EXIF_DATE = re.compile(r"(\d{4}):(\d\d):(\d\d) (\d\d):(\d\d):(\d\d)")
+
+
+class _Header:
+    # Vista perezosa del principio del archivo. Lo que queda fuera del máximo
+    # (IFD de un TIFF grande al final del archivo) se lee puntualmente.
+    def __init__(self, handle):
+        self.handle = handle
+        self.data = b""
+        self.complete = False
+
+    def get(self, offset, size):
+        end = offset + size
+        while end > len(self.data) and not self.complete:
+            if len(self.data) >= MAX_HEADER_BYTES:
+                break
+            self.handle.seek(len(self.data))
+            chunk = self.handle.read(HEADER_CHUNK)
+            self.complete = len(chunk) < HEADER_CHUNK
+            self.data += chunk
+        if end <= len(self.data):
+            return self.data[offset:end]
+        self.handle.seek(offset)
+        return self.handle.read(size)
+
+
+def _read_ifd(header, base, offset, endian, wanted):
+    values = {}
+    count_bytes = header.get(base + offset, 2)
+    if len(count_bytes) < 2:
+        return values
+    count = min(struct.unpack(endian + "H", count_bytes)[0], 1024)
+    entries = header.get(base + offset + 2, count * 12)
+    for number in range(len(entries) // 12):
+        tag, kind, items = struct.unpack(
+            endian + "HHI", entries[number * 12 : number * 12 + 8]
+        )
+        if tag not in wanted or kind not in TIFF_TYPE_SIZES:
+            continue
+        size = TIFF_TYPE_SIZES[kind] * items
+        raw = entries[number * 12 + 8 : number * 12 + 12]
+        if size > 4:
+            raw = header.get(base + struct.unpack(endian + "I", raw)[0], size)
+        if len(raw) < size:
+            # Archivo truncado: el valor apunta más allá del final.
+            continue
+        values[wanted[tag]] = _decode(raw[:size], kind, items, endian)
+    return values
+
+
+def _decode(raw, kind, items, endian):
+    if kind == 2:
+        return raw.split(b"\0", 1)[0].decode("latin-1").strip()
+    if kind in (5, 10):
+        code = "i" if kind == 10 else "I"
+        pairs = struct.unpack(f"{endian}{2 * items}{code}", raw)
+        value = tuple(
+            pairs[i] / pairs[i + 1] if pairs[i + 1] else None
+            for i in range(0, len(pairs), 2)
+        )
+    elif kind in (1, 7):
+        value = tuple(raw)
+    else:
+        code = {3: "H", 4: "I", 9: "i", 11: "f", 12: "d"}[kind]
+        value = struct.unpack(f"{endian}{items}{code}", raw)
+    return value[0] if len(value) == 1 else value
+
+
+def _parse_tiff(header, base):
+    order = header.get(base, 8)
+    if len(order) < 8:
+        return {}
+    if order[:2] == b"II":
+        endian = "<"
+    elif order[:2] == b"MM":
+        endian = ">"
+    else:
+        return {}
+    magic, ifd0 = struct.unpack(endian + "HI", order[2:8])
+    if magic != 42:
+        return {}
+    tags = _read_ifd(header, base, ifd0, endian, IFD0_TAGS)
+    if isinstance(tags.get("exif_ifd"), int):
+        tags.update(_read_ifd(header, base, tags["exif_ifd"], endian, EXIF_TAGS))
+    if isinstance(tags.get("gps_ifd"), int):
+        tags.update(_read_ifd(header, base, tags["gps_ifd"], endian, GPS_TAGS))
+    return tags
+
+
+def _parse_jpeg(header):
+    # Recorre los segmentos hasta el inicio de la imagen comprimida.
+    tags = {}
+    position = 2
+    while position < MAX_HEADER_BYTES:
+        marker = header.get(position, 4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            break
+        code = marker[1]
+        if code == 0xDA:
+            break
+        length = struct.unpack(">H", marker[2:4])[0]
+        segment_start = position + 4
+        if code == 0xE1:
+            prefix = header.get(segment_start, 29)
+            if prefix.startswith(b"Exif\0\0"):
+                tags.update(_parse_tiff(header, segment_start + 6))
+            elif prefix.startswith(b"http://ns.adobe.com/xap/1.0/"):
+                xmp = header.get(segment_start, length - 2)
+                # Un XMP cortado dejaría números a medias ("+1" de "+120.3").
+                if len(xmp) == length - 2:
+                    tags.update(_parse_xmp(xmp))
+        elif 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            size = header.get(segment_start + 1, 4)
+            if len(size) == 4:
+                tags["height"], tags["width"] = struct.unpack(">HH", size)
+        position += 2 + length
+    return tags
+
+
+def _parse_xmp(data):
+    values = {}
+    for name, value in XMP_PATTERN.findall(data):
+        if name in XMP_FIELDS:
+            try:
+                values[XMP_FIELDS[name]] = float(value)
+            except ValueError:
+                continue
+    return values
+
+
+def _degrees(value, reference):
+    if not isinstance(value, tuple) or len(value) != 3 or None in value:
+        return None
+    degrees = value[0] + value[1] / 60 + value[2] / 3600
+    return round(-degrees if reference in ("S", "W") else degrees, 7)
+
+
+def _taken(tags):
+    match = EXIF_DATE.match(tags.get("datetime_original") or tags.get("datetime") or "")
+    if not match or match.group(1) == "0000":
+        return None
+    taken = "{}-{}-{}T{}:{}:{}".format(*match.groups())
+    subsec = str(tags.get("subsec_original") or "").strip()
+    if subsec.isdigit():
+        taken += f".{subsec}"
+    return taken + (tags.get("offset_original") or "")
+
+
+def read_image_metadata(file_path):
+    # Solo la cabecera: unos KB por imagen aunque pese decenas de MB.
+    with open(file_path, "rb") as handle:
+        header = _Header(handle)
+        start = header.get(0, 24)
+        if start.startswith(b"\xff\xd8"):
+            tags = _parse_jpeg(header)
+        elif start[:4] in (b"II*\0", b"MM\0*"):
+            tags = _parse_tiff(header, 0)
+        elif start.startswith(b"\x89PNG\r\n\x1a\n"):
+            size = start[16:24]
+            tags = {}
+            if len(size) == 8:
+                tags = dict(zip(("width", "height"), struct.unpack(">II", size)))
+        else:
+            return {}
+    metadata = {
+        "taken": _taken(tags),
+        "lat": _degrees(tags.get("lat"), tags.get("lat_ref")),
+        "lon": _degrees(tags.get("lon"), tags.get("lon_ref")),
+        "make": tags.get("make") or None,
+        "model": tags.get("model") or None,
+        "width": tags.get("pixel_width") or tags.get("width"),
+        "height": tags.get("pixel_height") or tags.get("height"),
+        "orientation": tags.get("orientation"),
+    }
+    altitude = tags.get("alt")
+    if isinstance(altitude, float):
+        metadata["alt"] = round(-altitude if tags.get("alt_ref") == 1 else altitude, 2)
+    for name in XMP_FIELDS.values():
+        if name in tags:
+            metadata[name] = tags[name]
+    for name in ("width", "height", "orientation"):
+        if not isinstance(metadata[name], int):
+            metadata[name] = None
+    return {name: value for name, value in metadata.items() if value is not None}
+
+
+def file_record(file_path, relative_key, stat):
+    record = {
+        "key": relative_key,
+        "size": stat.st_size,
+        "mtime": round(stat.st_mtime, 3),
+    }
+    if os.path.splitext(relative_key)[1].lower() in METADATA_EXTENSIONS:
+        try:
+            # Comparte el límite de lectores por disco con las subidas.
+            with reader_slot(stat.st_dev):
+                record.update(read_image_metadata(file_path))
+        except (OSError, ValueError, TypeError, KeyError, struct.error) as e:
+            log_error("No se pudieron leer los metadatos", e, file=file_path)
+    return record
+
+
+def is_manifest_name(file_name):
+    # El manifiesto, su .tmp y las copias renombradas por versiones anteriores
+    # ("_manifest_<carpeta>.jsonl") no son datos de la carpeta.
+    return file_name.startswith(MANIFEST_STEM)
+
+
+def build_manifest(folder, max_workers=MANIFEST_WORKERS):
+    files = [
+        item
+        for item in list_upload_files(folder)
+        if "/" in item[1] or not is_manifest_name(item[1])
+    ]
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="manifest"
+    ) as pool:
+        records = list(pool.map(lambda item: file_record(*item), files))
+    return sorted(records, key=lambda record: record["key"])
+
+
+def _manifest_bytes(records, manifest_format):
+    if manifest_format == "parquet":
+        # pyarrow tarda en importarse: solo se carga si se usa.
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([(name, kind) for name, kind in MANIFEST_COLUMNS])
+        table = pa.Table.from_pylist(records, schema=schema)
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink, compression="zstd")
+        return sink.getvalue().to_pybytes()
+    return "".join(
+        json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        for record in records
+    ).encode("utf-8")
+
+
+def write_manifest(folder, manifest_format=MANIFEST_FORMAT):
+    # Se escribe dentro de la carpeta para que suba y se verifique con ella,
+    # a todos los destinos. Devuelve (ruta, registros) o None si está
+    # desactivado.
+    if manifest_format not in MANIFEST_NAMES:
+        return None
+    if manifest_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        manifest_format = "jsonl"
+    records = build_manifest(folder)
+    data = _manifest_bytes(records, manifest_format)
+    path = os.path.join(folder, MANIFEST_NAMES[manifest_format])
+    # Si no cambia no se reescribe: la copia en S3 sigue valiendo.
+    try:
+        with open(path, "rb") as handle:
+            unchanged = handle.read() == data
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as handle:
+            handle.write(data)
+        os.replace(temporary_path, path)
+    # Sobra el manifiesto del otro formato y las copias renombradas: subirían
+    # como archivos de datos.
+    for name in os.listdir(folder):
+        if is_manifest_name(name) and name != MANIFEST_NAMES[manifest_format]:
+            try:
+                os.remove(os.path.join(folder, name))
+            except FileNotFoundError:
+                pass
+    return path, records
+
+
+def summarize_manifest(records):
+    dated = sum(1 for record in records if "taken" in record)
+    located = sum(1 for record in records if "lat" in record)
+    return (
+        f"Manifiesto: {len(records)} archivos, {dated} con fecha de captura, "
+        f"{located} con GPS."
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Genera el manifiesto de metadatos de una carpeta"
+    )
+    parser.add_argument("folder")
+    parser.add_argument(
+        "--format",
+        choices=sorted(MANIFEST_NAMES),
+        default=MANIFEST_FORMAT if MANIFEST_FORMAT in MANIFEST_NAMES else "jsonl",
+    )
+    args = parser.parse_args()
+
+    path, records = write_manifest(args.folder, args.format)
+    print(summarize_manifest(records))
+    print(path)
@@ -0,0 +1,296 @@
+import bisect
+import json
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from awsEvents import log_error
+from awsListing import APP_DIR
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.getenv("AWS_METRICS_PORT", "9464"))
+SNAPSHOT_PATH = os.getenv(
+    "AWS_METRICS_SNAPSHOT", os.path.join(APP_DIR, "metrics.json")
+)
+SNAPSHOT_INTERVAL = float(os.getenv("AWS_METRICS_INTERVAL", "30"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    ]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        labels = _format_labels(self.label_names, key)
+        return [f"{self.name}{labels} {_format_value(value)}"]
+
+    def snapshot(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            {"labels": dict(zip(self.label_names, key)), "value": self._copy(value)}
+            for key, value in items
+        ]
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            entry["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def _render_value(self, key, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), value["counts"]):
+            cumulative += count
+            labels = _format_labels(
+                self.label_names, key, [("le", _format_value(float(bound)))]
+            )
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(value['sum'])}")
+        lines.append(f"{self.name}_count{labels} {value['count']}")
+        return lines
+
+    def _copy(self, value):
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "buckets": dict(zip(bounds, value["counts"])),
+            "sum": value["sum"],
+            "count": value["count"],
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._add(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {
+            "host": socket.gethostname(),
+            "timestamp": time.time(),
+            "metrics": {metric.name: metric.snapshot() for metric in self.metrics},
+        }
+
+
+registry = Registry()
+
+bytes_sent = registry.counter(
+    "awsapp_bytes_sent_total", "Bytes enviados a S3", ["operation"]
+)
+bytes_received = registry.counter(
+    "awsapp_bytes_received_total", "Bytes recibidos de S3", ["operation"]
+)
+requests = registry.counter(
+    "awsapp_requests_total", "Peticiones a S3", ["operation", "outcome"]
+)
+request_seconds = registry.histogram(
+    "awsapp_request_seconds",
+    "Duración de cada petición a S3 (una parte en UploadPart y GetObject)",
+    ["operation"],
+)
+first_byte_seconds = registry.histogram(
+    "awsapp_first_byte_seconds",
+    "Subida: desde que empieza la transferencia hasta el primer byte confirmado; "
+    "descarga: hasta recibir las cabeceras de cada GET",
+    ["direction"],
+)
+retries = registry.counter(
+    "awsapp_retries_total", "Reintentos por clase de error", ["operation", "error"]
+)
+queue_depth = registry.gauge(
+    "awsapp_transfer_queue_depth", "Tareas en cola esperando un hilo", ["direction"]
+)
+active_workers = registry.gauge(
+    "awsapp_transfer_active_workers", "Hilos transfiriendo ahora", ["direction"]
+)
+read_ahead_bytes = registry.gauge(
+    "awsapp_read_ahead_bytes", "Bytes leídos del disco esperando a enviarse"
+)
+files = registry.counter(
+    "awsapp_files_total", "Archivos terminados", ["direction", "outcome"]
+)
+
+
+def error_class(error):
+    # Código de error de S3 si lo hay (SlowDown, RequestTimeout...), si no la
+    # clase de la excepción (ConnectionClosedError, ReadTimeoutError...).
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        if code:
+            return code
+    return type(error).__name__
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] == "/metrics":
+            body = registry.render().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?", 1)[0] == "/metrics.json":
+            body = json.dumps(registry.snapshot()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def write_snapshot(path=SNAPSHOT_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as handle:
+        json.dump(registry.snapshot(), handle)
+    os.replace(temporary_path, path)
+
+
+def _snapshot_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_snapshot(path)
+        except OSError as e:
+            log_error("No se pudo guardar el snapshot de métricas", e, file=path)
+
+
+_metrics_server = None
+_metrics_started = False
+
+
+def start_metrics(
+    port=METRICS_PORT, snapshot_path=SNAPSHOT_PATH, interval=SNAPSHOT_INTERVAL
+):
+    # Solo escucha en localhost. port=0 o interval=0 desactivan cada salida.
+    global _metrics_server, _metrics_started
+    if _metrics_started:
+        return _metrics_server
+    _metrics_started = True
+    if port:
+        try:
+            _metrics_server = ThreadingHTTPServer(
+                (METRICS_HOST, port), _MetricsHandler
+            )
+        except OSError as e:
+            log_error("No se pudo abrir el puerto de métricas", e, port=port)
+        else:
+            _metrics_server.daemon_threads = True
+            threading.Thread(
+                target=_metrics_server.serve_forever, name="metrics", daemon=True
+            ).start()
+    if interval and snapshot_path:
+        threading.Thread(
+            target=_snapshot_loop,
+            args=(snapshot_path, interval),
+            name="metrics-snapshot",
+            daemon=True,
+        ).start()
+    return _metrics_server
@@ -0,0 +1,260 @@
+import importlib.util
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from awsEvents import log_error, log_event
+from awsListing import iter_bucket
+from awsTransfer import TransferCanceled, Uploader, list_upload_files
+
+# Vistas previas en un prefijo paralelo al de los datos: la carpeta
+# Proyecto/SS01/ tiene sus miniaturas en previews/Proyecto/SS01/.
+PREVIEW_PREFIX = "previews/"
+PREVIEW_EXTENSIONS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp"}
+PREVIEW_SIZE = 512
+PREVIEW_QUALITY = 80
+# Generar miniaturas es CPU: se deja un núcleo libre para la subida.
+PREVIEW_WORKERS = int(
+    os.getenv("AWS_PREVIEW_WORKERS", str(max(1, (os.cpu_count() or 2) - 1)))
+)
+# Las miniaturas se suben por tandas según se generan, sin esperar al final.
+PREVIEW_BATCH = 32
+# Hojas de contactos de SHEET_COLUMNS x SHEET_ROWS miniaturas.
+SHEET_TILE = 160
+SHEET_COLUMNS = 10
+SHEET_ROWS = 10
+SHEET_FOLDER = "_contactos/"
+# Procesos nuevos y no fork: la aplicación tiene hilos (subida, Qt, métricas)
+# y un fork copiaría sus locks tomados en el hijo.
+POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def previews_available():
+    # Pillow se importa en los procesos que generan las miniaturas, no al
+    # arrancar la aplicación.
+    return importlib.util.find_spec("PIL") is not None
+
+
+def preview_key(relative_key):
+    # Se conserva la extensión original: foto.tif y foto.jpg no chocan.
+    return relative_key + ".jpg"
+
+
+def sheet_key(number):
+    return f"{SHEET_FOLDER}hoja-{number:04d}.jpg"
+
+
+def _to_8_bits(image):
+    # Térmicas y multiespectrales suelen ser de 16 bits o flotantes: se
+    # estiran al rango de la imagen en vez de recortarse a blanco.
+    if image.mode.startswith("I;16"):
+        image = image.convert("I")
+    if image.mode in ("I", "F"):
+        low, high = image.getextrema()
+        scale = 255 / (high - low) if high > low else 0
+        image = image.point(lambda value: (value - low) * scale).convert("L")
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    return image
+
+
+def make_preview(source, destination, size=PREVIEW_SIZE):
+    # Se ejecuta en otro proceso: devuelve None o, si la imagen no se puede
+    # leer, (tipo, mensaje) del error para registrarlo en el proceso principal.
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(source) as image:
+            # En JPEG decodifica ya reducido (1/2, 1/4, 1/8): mucho más rápido.
+            image.draft("RGB", (size, size))
+            image = ImageOps.exif_transpose(image)
+            image = _to_8_bits(image)
+            image.thumbnail((size, size))
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            image.save(destination, "JPEG", quality=PREVIEW_QUALITY)
+    except Exception as e:
+        return type(e).__name__, str(e)
+    return None
+
+
+def make_contact_sheet(previews, destination, tile=SHEET_TILE, columns=SHEET_COLUMNS):
+    # `previews`: (ruta de la miniatura o None, nombre a rotular).
+    from PIL import Image, ImageDraw
+
+    rows = -(-len(previews) // columns)
+    label_height = 14
+    sheet = Image.new("RGB", (columns * tile, rows * (tile + label_height)), "white")
+    draw = ImageDraw.Draw(sheet)
+    for number, (path, label) in enumerate(previews):
+        left = number % columns * tile
+        top = number // columns * (tile + label_height)
+        if path is not None:
+            try:
+                with Image.open(path) as image:
+                    image.thumbnail((tile, tile))
+                    offset = ((tile - image.width) // 2, (tile - image.height) // 2)
+                    sheet.paste(image, (left + offset[0], top + offset[1]))
+            except OSError:
+                pass
+        draw.text((left + 2, top + tile), label[-24:], fill="black")
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    sheet.save(destination, "JPEG", quality=PREVIEW_QUALITY)
+    return True
+
+
+class PreviewStage:
+    # Genera y sube las vistas previas de una carpeta a la vez que la subida
+    # principal. Usa su propio Uploader: las miniaturas no esperan en la cola
+    # detrás de las partes de los originales.
+    def __init__(self, client, bucket, folder, s3_prefix, max_workers=PREVIEW_WORKERS):
+        self.client = client
+        self.bucket = bucket
+        self.folder = folder
+        self.s3_prefix = s3_prefix
+        self.max_workers = max_workers
+        self.uploader = Uploader(client, bucket, read_ahead=0, skip_existing=False)
+        self.canceled = threading.Event()
+        self.generated = 0
+        self.failed = 0
+
+    def cancel(self):
+        self.canceled.set()
+        self.uploader.cancel()
+
+    def pause(self):
+        # Solo se pausa la subida; generar no usa la red.
+        self.uploader.pause()
+
+    def resume(self):
+        self.uploader.resume()
+
+    def run(self):
+        # Devuelve (miniaturas generadas, imágenes con error, archivos subidos).
+        sources = sorted(
+            (relative_key, file_path)
+            for file_path, relative_key, stat in list_upload_files(self.folder)
+            if os.path.splitext(relative_key)[1].lower() in PREVIEW_EXTENSIONS
+        )
+        if not sources:
+            return 0, 0, 0
+        try:
+            existing = {
+                obj["Key"][len(self.s3_prefix) :]
+                for obj in iter_bucket(self.client, self.bucket, self.s3_prefix)
+            }
+        except Exception as e:
+            log_error(
+                "No se pudieron listar las vistas previas",
+                e,
+                bucket=self.bucket,
+                key=self.s3_prefix,
+            )
+            existing = set()
+
+        per_sheet = SHEET_COLUMNS * SHEET_ROWS
+        sheets = [
+            (number, sources[start : start + per_sheet])
+            for number, start in enumerate(range(0, len(sources), per_sheet), 1)
+            if sheet_key(number) not in existing
+        ]
+        # Hay que generar las que faltan en S3 y las de las hojas que faltan.
+        needed = {
+            relative_key
+            for relative_key, _ in sources
+            if preview_key(relative_key) not in existing
+        }
+        for _, members in sheets:
+            needed.update(relative_key for relative_key, _ in members)
+
+        output_dir = tempfile.mkdtemp(prefix="awsapp-previews-")
+        try:
+            local = self._generate(sources, needed, existing, output_dir)
+            self._build_sheets(sheets, local, output_dir)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        if self.canceled.is_set():
+            raise TransferCanceled()
+        return self.generated, self.failed, self.uploader.completed
+
+    def _local_path(self, output_dir, key):
+        return os.path.join(output_dir, *key.split("/"))
+
+    def _generate(self, sources, needed, existing, output_dir):
+        local = {}
+        batch = []
+        pool = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=POOL_CONTEXT
+        )
+        try:
+            futures = {}
+            for relative_key, file_path in sources:
+                if relative_key in needed:
+                    destination = self._local_path(
+                        output_dir, preview_key(relative_key)
+                    )
+                    future = pool.submit(make_preview, file_path, destination)
+                    futures[future] = (relative_key, destination)
+            for future in as_completed(futures):
+                if self.canceled.is_set():
+                    break
+                relative_key, destination = futures[future]
+                error = future.result()
+                if error is not None:
+                    log_event(
+                        "error",
+                        msg="No se pudo generar la vista previa",
+                        err=error[0],
+                        detail=error[1],
+                        file=relative_key,
+                    )
+                    self.failed += 1
+                    continue
+                self.generated += 1
+                local[relative_key] = destination
+                key = preview_key(relative_key)
+                if key not in existing:
+                    size = os.path.getsize(destination)
+                    batch.append((destination, self.s3_prefix + key, size))
+                if len(batch) >= PREVIEW_BATCH:
+                    self._upload(batch)
+                    batch = []
+        finally:
+            pool.shutdown(cancel_futures=True)
+        self._upload(batch)
+        return local
+
+    def _build_sheets(self, sheets, local, output_dir):
+        if not sheets or self.canceled.is_set():
+            return
+        batch = []
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=POOL_CONTEXT
+        ) as pool:
+            futures = {}
+            for number, members in sheets:
+                destination = self._local_path(output_dir, sheet_key(number))
+                previews = [
+                    (local.get(relative_key), relative_key)
+                    for relative_key, _ in members
+                ]
+                future = pool.submit(make_contact_sheet, previews, destination)
+                futures[future] = (number, destination)
+            for future in as_completed(futures):
+                number, destination = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    log_error(
+                        "No se pudo generar la hoja de contactos", e, sheet=number
+                    )
+                    continue
+                size = os.path.getsize(destination)
+                batch.append((destination, self.s3_prefix + sheet_key(number), size))
+        self._upload(batch)
+
+    def _upload(self, batch):
+        if batch and not self.canceled.is_set():
+            self.uploader.upload_files(batch)
@@ -0,0 +1,228 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from awsListing import APP_DIR
+
+# AWS_PROFILING=sample (o 1) muestrea todos los hilos; =cprofile usa cProfile
+# solo en el hilo de la sesión. Vacío o 0 lo desactiva.
+PROFILING_MODE = os.getenv("AWS_PROFILING", "").strip().lower()
+SESSIONS_DIR = os.getenv("AWS_SESSIONS_DIR", os.path.join(APP_DIR, "sessions"))
+SAMPLE_INTERVAL = 0.01
+TRACEMALLOC_FRAMES = 10
+SUMMARY_TOP = 15
+
+# Funciones de espera: un hilo parado en ellas no está consumiendo CPU.
+IDLE_FUNCTIONS = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("socket.py", "readinto"),
+    ("ssl.py", "read"),
+}
+
+_session_dir = None
+_session_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+def session_dir():
+    # Un directorio por ejecución de la aplicación para sus registros.
+    global _session_dir
+    with _session_lock:
+        if _session_dir is None:
+            name = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+            _session_dir = os.path.join(SESSIONS_DIR, name)
+            os.makedirs(_session_dir, exist_ok=True)
+        return _session_dir
+
+
+def _acquire_tracemalloc():
+    # tracemalloc es global: se inicia con la primera sesión y se detiene con
+    # la última, salvo que ya estuviera activo (p. ej. PYTHONTRACEMALLOC).
+    global _tracemalloc_users
+    with _session_lock:
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            _tracemalloc_users = 1
+        elif _tracemalloc_users == 0:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users
+    with _session_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    file_name = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({file_name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler(threading.Thread):
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name="sampling-profiler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        own_ident = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            thread_names = {
+                thread.ident: thread.name for thread in threading.enumerate()
+            }
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                top = frame.f_code
+                top_name = (os.path.basename(top.co_filename), top.co_name)
+                if top_name in IDLE_FUNCTIONS:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                # Los hilos de Qt no figuran en threading: se nombran por su id.
+                thread_name = thread_names.get(ident, f"hilo-{ident}")
+                self.stacks[(thread_name,) + tuple(stack)] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def hot_spots(self, top=SUMMARY_TOP):
+        own = Counter()
+        cumulative = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for name in set(stack[1:]):
+                cumulative[name] += count
+        return own.most_common(top), cumulative.most_common(top)
+
+    def write_collapsed(self, path):
+        # Formato "pila;plegada cuenta", el que usan flamegraph.pl y speedscope.
+        with open(path, "w", encoding="utf-8") as handle:
+            for stack, count in self.stacks.most_common():
+                handle.write(f"{';'.join(stack)} {count}\n")
+
+
+class ProfileSession:
+    def __init__(self, name, mode=PROFILING_MODE):
+        safe_name = re.sub(r"[^\w.-]+", "_", name).strip("_") or "sesion"
+        self.name = name
+        self.mode = "cprofile" if mode == "cprofile" else "sample"
+        self.directory = os.path.join(
+            session_dir(), "profiles", f"{safe_name}-{datetime.now():%H%M%S%f}"
+        )
+        self.profiler = None
+        self.sampler = None
+        self.start_snapshot = None
+        self.started_at = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        _acquire_tracemalloc()
+        self.start_snapshot = tracemalloc.take_snapshot()
+        if self.mode == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.sampler = SamplingProfiler()
+            self.sampler.start()
+        self.started_at = time.monotonic()
+
+    def stop(self):
+        duration = time.monotonic() - self.started_at
+        lines = [
+            f"Sesión: {self.name}",
+            f"Modo: {self.mode}",
+            f"Duración: {duration:.1f} s",
+            "",
+        ]
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(os.path.join(self.directory, "profile.pstats"))
+            output = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=output)
+            stats.sort_stats("cumulative").print_stats(SUMMARY_TOP)
+            stats.sort_stats("tottime").print_stats(SUMMARY_TOP)
+            lines.append(output.getvalue())
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler.write_collapsed(os.path.join(self.directory, "stacks.txt"))
+            lines += self._sample_summary()
+
+        end_snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        _release_tracemalloc()
+        end_snapshot.dump(os.path.join(self.directory, "tracemalloc.snapshot"))
+        lines.append(f"Memoria: pico trazado {peak / 1024 / 1024:.1f} MiB")
+        lines.append("Mayores aumentos de memoria durante la sesión:")
+        for stat in end_snapshot.compare_to(self.start_snapshot, "lineno")[:10]:
+            lines.append(f"  {stat}")
+
+        summary_path = os.path.join(self.directory, "summary.txt")
+        with open(summary_path, "w", encoding="utf-8") as handle:
+            handle.write("\n".join(lines) + "\n")
+        return summary_path
+
+    def _sample_summary(self):
+        total = sum(self.sampler.stacks.values()) or 1
+        own, cumulative = self.sampler.hot_spots()
+        interval_ms = self.sampler.interval * 1000
+        lines = [
+            f"Muestras: {self.sampler.samples} cada {interval_ms:.0f} ms "
+            "(tiempo real, sin hilos en espera)",
+            "",
+            "Más tiempo propio:",
+        ]
+        lines += [f"  {count / total:6.1%}  {name}" for name, count in own]
+        lines += ["", "Más tiempo acumulado:"]
+        lines += [f"  {count / total:6.1%}  {name}" for name, count in cumulative]
+        lines.append("")
+        return lines
+
+
+@contextmanager
+def profile_session(name, mode=None):
+    mode = PROFILING_MODE if mode is None else mode
+    if mode in ("", "0", "false", "no"):
+        yield None
+        return
+    # awsEvents importa este módulo para el directorio de la sesión.
+    from awsEvents import log_error, log_event
+
+    session = ProfileSession(name, mode)
+    try:
+        session.start()
+    except Exception as e:
+        log_error("No se pudo iniciar el perfilado", e, name=name)
+        yield None
+        return
+    try:
+        yield session
+    finally:
+        try:
+            summary_path = session.stop()
+            log_event("profile", name=name, file=summary_path)
+        except Exception as e:
+            log_error("No se pudo guardar el perfil", e, name=name)
@@ -0,0 +1,82 @@
+import itertools
+import os
+import time
+
+# Orden de la cola de subidas. La prioridad manda siempre; la política solo
+# desempata carpetas con la misma prioridad.
+QUEUE_POLICIES = {
+    "fifo": "Orden de llegada",
+    "sjf": "Más pequeñas primero",
+    "lpt": "Más grandes primero",
+    "deadline": "Fecha límite más próxima",
+}
+DEFAULT_POLICY = "fifo"
+
+_sequence = itertools.count()
+
+
+def folder_totals(folder):
+    files = 0
+    total = 0
+    for rootf, dirs, file_names in os.walk(folder):
+        for file_name in file_names:
+            try:
+                total += os.path.getsize(os.path.join(rootf, file_name))
+            except OSError:
+                continue
+            files += 1
+    return files, total
+
+
+class UploadJob:
+    def __init__(self, folder, s3_folder, priority=0, deadline=None, size=None):
+        self.folder = folder
+        self.s3_folder = s3_folder
+        self.priority = priority
+        # Marca de tiempo (time.time()) o None si no tiene fecha límite.
+        self.deadline = deadline
+        self.size = folder_totals(folder)[1] if size is None else size
+        self.queued_at = time.time()
+        self.sequence = next(_sequence)
+
+
+class UploadQueue:
+    # Se consulta y modifica solo desde el hilo de la interfaz.
+    def __init__(self, policy=DEFAULT_POLICY):
+        self.jobs = []
+        self.set_policy(policy)
+
+    def set_policy(self, policy):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Política de cola desconocida: {policy}")
+        self.policy = policy
+
+    def put(self, job):
+        self.jobs.append(job)
+
+    def remove(self, job):
+        self.jobs.remove(job)
+        return job
+
+    def clear(self):
+        self.jobs.clear()
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def ordered(self):
+        # Se ordena en cada consulta: así un cambio de política o de
+        # prioridad afecta ya a la siguiente carpeta que arranque.
+        return sorted(self.jobs, key=self._key)
+
+    def _key(self, job):
+        if self.policy == "sjf":
+            order = job.size
+        elif self.policy == "lpt":
+            # Las más largas primero reducen el tiempo total (makespan).
+            order = -job.size
+        elif self.policy == "deadline":
+            order = float("inf") if job.deadline is None else job.deadline
+        else:
+            order = 0
+        return (-job.priority, order, job.sequence)
@@ -0,0 +1,284 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from awsEvents import log_error, log_event
+from awsTransfer import Uploader, upload_journal
+
+# Una subida multipart sin terminar sigue cobrando sus partes. Las que no se
+# pueden reanudar desde este equipo se abortan pasado este margen: otra
+# máquina o un `aws s3 cp` podrían seguir subiéndolas.
+SWEEP_STALE_HOURS = float(os.getenv("AWS_SWEEP_STALE_HOURS", "48"))
+# Barrido periódico dentro de la aplicación; 0 lo desactiva.
+SWEEP_INTERVAL_HOURS = float(os.getenv("AWS_SWEEP_INTERVAL_HOURS", "6"))
+# Espera tras arrancar para no competir con las primeras subidas.
+SWEEP_DELAY = 120
+SWEEP_WORKERS = 8
+
+SweepReport = namedtuple(
+    "SweepReport",
+    [
+        "found",
+        "resumed",
+        "aborted",
+        "kept",
+        "failed",
+        "reclaimed_bytes",
+        "reused_bytes",
+    ],
+)
+
+
+def _list_uploads(client, bucket, prefix, delimiter=None):
+    params = {"Bucket": bucket, "Prefix": prefix}
+    if delimiter:
+        params["Delimiter"] = delimiter
+    uploads = []
+    children = []
+    paginator = client.get_paginator("list_multipart_uploads")
+    for page in paginator.paginate(**params):
+        uploads.extend(page.get("Uploads", []))
+        children.extend(item["Prefix"] for item in page.get("CommonPrefixes", []))
+    return uploads, children
+
+
+def list_incomplete_uploads(client, bucket, prefixes=("",), max_workers=SWEEP_WORKERS):
+    # Primero un nivel con delimitador y luego cada subprefijo en paralelo:
+    # el listado de un bucket grande no queda en una sola cadena de páginas.
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="s3-sweep"
+    ) as pool:
+        top = list(
+            pool.map(
+                lambda prefix: _list_uploads(client, bucket, prefix, "/"), prefixes
+            )
+        )
+        uploads = [upload for found, _ in top for upload in found]
+        children = [child for _, found in top for child in found]
+        for found, _ in pool.map(
+            lambda prefix: _list_uploads(client, bucket, prefix), children
+        ):
+            uploads.extend(found)
+    return uploads
+
+
+def uploaded_parts(client, bucket, key, upload_id):
+    # {número de parte: (ETag, tamaño)}; None si la subida ya no existe.
+    parts = {}
+    try:
+        paginator = client.get_paginator("list_parts")
+        for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+            for part in page.get("Parts", []):
+                parts[part["PartNumber"]] = (part["ETag"], part["Size"])
+    except Exception as e:
+        log_error("No se pudieron listar las partes", e, bucket=bucket, key=key)
+        return None
+    return parts
+
+
+def _resumable_parts(entry, parts):
+    # Partes reutilizables si el archivo local no ha cambiado desde que empezó
+    # la subida; None si hay que descartarla.
+    try:
+        stat = os.stat(entry["file"])
+    except OSError:
+        return None
+    if stat.st_size != entry["size"] or stat.st_mtime != entry["mtime"]:
+        return None
+    part_size = entry["part_size"]
+    etags = {}
+    for number, (etag, size) in parts.items():
+        # Una parte de tamaño inesperado se vuelve a subir.
+        if size == min(part_size, entry["size"] - (number - 1) * part_size):
+            etags[number] = etag
+    return etags
+
+
+def _age(upload, now):
+    initiated = upload.get("Initiated")
+    return now - initiated.timestamp() if initiated is not None else 0
+
+
+def sweep(
+    client,
+    bucket,
+    prefixes=("",),
+    stale_hours=SWEEP_STALE_HOURS,
+    journal=upload_journal,
+    resume=True,
+    dry_run=False,
+):
+    uploads = list_incomplete_uploads(client, bucket, prefixes)
+    entries = journal.entries() if journal is not None else {}
+    active = set(journal.active) if journal is not None else set()
+    uploads = [upload for upload in uploads if upload["UploadId"] not in active]
+    with ThreadPoolExecutor(
+        max_workers=SWEEP_WORKERS, thread_name_prefix="s3-sweep"
+    ) as pool:
+        all_parts = list(
+            pool.map(
+                lambda upload: uploaded_parts(
+                    client, bucket, upload["Key"], upload["UploadId"]
+                ),
+                uploads,
+            )
+        )
+
+    now = time.time()
+    to_resume = []
+    to_abort = []
+    kept = 0
+    reused_bytes = 0
+    for upload, parts in zip(uploads, all_parts):
+        if parts is None:
+            # Terminada o abortada mientras se listaba.
+            continue
+        upload_id = upload["UploadId"]
+        entry = entries.get(upload_id)
+        if entry is not None and (
+            entry["bucket"] != bucket or entry["key"] != upload["Key"]
+        ):
+            entry = None
+        etags = _resumable_parts(entry, parts) if resume and entry else None
+        if etags is not None:
+            to_resume.append((upload_id, entry, etags))
+            reused_bytes += sum(parts[number][1] for number in etags)
+        elif entry is not None or _age(upload, now) >= stale_hours * 3600:
+            # Lo que empezó este equipo y ya no se puede reanudar no va a
+            # terminarlo nadie: se aborta sin esperar al margen.
+            to_abort.append((upload, sum(size for _, size in parts.values())))
+        else:
+            kept += 1
+
+    resumed = aborted = failed = reclaimed_bytes = 0
+    if not dry_run:
+        for upload, size in to_abort:
+            try:
+                client.abort_multipart_upload(
+                    Bucket=bucket, Key=upload["Key"], UploadId=upload["UploadId"]
+                )
+            except Exception as e:
+                log_error(
+                    "No se pudo abortar la subida multipart",
+                    e,
+                    bucket=bucket,
+                    key=upload["Key"],
+                )
+                failed += 1
+                continue
+            aborted += 1
+            reclaimed_bytes += size
+            if journal is not None:
+                journal.remove(upload["UploadId"])
+        if to_resume:
+            uploader = Uploader(
+                client, bucket, read_ahead=0, skip_existing=False, journal=journal
+            )
+            resumed, resume_failed = uploader.resume_interrupted(to_resume)
+            failed += len(resume_failed)
+    else:
+        resumed = len(to_resume)
+        aborted = len(to_abort)
+        reclaimed_bytes = sum(size for _, size in to_abort)
+
+    # Entradas del diario cuya subida ya no existe en S3.
+    if journal is not None and not dry_run:
+        listed = {upload["UploadId"] for upload in uploads}
+        for upload_id, entry in entries.items():
+            under_prefixes = any(entry["key"].startswith(prefix) for prefix in prefixes)
+            if (
+                entry["bucket"] == bucket
+                and under_prefixes
+                and upload_id not in listed
+                and upload_id not in active
+            ):
+                journal.remove(upload_id)
+
+    report = SweepReport(
+        found=len(uploads),
+        resumed=resumed,
+        aborted=aborted,
+        kept=kept,
+        failed=failed,
+        reclaimed_bytes=reclaimed_bytes,
+        reused_bytes=reused_bytes,
+    )
+    log_event("sweep", bucket=bucket, dry_run=dry_run, **report._asdict())
+    return report
+
+
+def summarize(report):
+    return (
+        f"Subidas multipart sin terminar: {report.found}. "
+        f"Reanudadas {report.resumed} ({report.reused_bytes / 1024 / 1024:.1f} MiB "
+        f"aprovechados), abortadas {report.aborted} "
+        f"({report.reclaimed_bytes / 1024 / 1024:.1f} MiB liberados), "
+        f"pendientes {report.kept}, con error {report.failed}."
+    )
+
+
+def _sweep_loop(destinations, make_client, interval, delay):
+    time.sleep(delay)
+    while True:
+        for destination in destinations:
+            bucket, prefix = destination.bucket, destination.prefix
+            try:
+                # Los clientes se crean aquí y no al arrancar: importar boto3
+                # retrasaría la ventana.
+                # El resultado queda en el evento "sweep".
+                sweep(make_client(destination.region), bucket, [prefix])
+            except Exception as e:
+                log_error("No se pudo barrer", e, bucket=bucket, key=prefix)
+        time.sleep(interval)
+
+
+def start_sweeper(
+    destinations, make_client, interval_hours=SWEEP_INTERVAL_HOURS, delay=SWEEP_DELAY
+):
+    # `destinations`: Destination de cada subida; `make_client(región)` devuelve
+    # el cliente S3 y se llama desde el hilo del barrido.
+    if not interval_hours:
+        return None
+    thread = threading.Thread(
+        target=_sweep_loop,
+        args=(list(destinations), make_client, interval_hours * 3600, delay),
+        name="s3-sweeper",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import boto3
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description="Reanuda o aborta subidas multipart sin terminar"
+    )
+    parser.add_argument("prefixes", nargs="*", default=[""])
+    parser.add_argument("--stale-hours", type=float, default=SWEEP_STALE_HOURS)
+    parser.add_argument("--no-resume", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    client = boto3.client(
+        "s3",
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+    )
+    report = sweep(
+        client,
+        os.getenv("AWS_BUCKET"),
+        args.prefixes,
+        args.stale_hours,
+        resume=not args.no_resume,
+        dry_run=args.dry_run,
+    )
+    print(summarize(report))
@@ -0,0 +1,1231 @@
+import json
+import mmap
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import awsMetrics as metrics
+from awsDevices import physical_order, reader_slot
+from awsEvents import log_error, log_event
+from awsListing import APP_DIR, iter_bucket
+
+MiB = 1024 * 1024
+
+# Mismos valores que awsconfig.txt para el CLI.
+PART_SIZE = 64 * MiB
+MULTIPART_THRESHOLD = 64 * MiB
+TRANSFER_WORKERS = 16
+TRANSFER_RETRIES = 3
+# Varias transferencias comparten el cliente: el pool debe cubrir sus hilos.
+CLIENT_POOL_CONNECTIONS = 64
+READ_CHUNK = 1 * MiB
+# Lectura anticipada al subir: hilos lectores cargan las siguientes partes en
+# un pool de búferes de este tamaño total mientras otros hilos envían.
+# 0 desactiva el pool y cada hilo lee su parte mapeada al enviarla.
+READ_AHEAD_MEMORY = 256 * MiB
+READ_AHEAD_READERS = 2
+PROGRESS_INTERVAL = 0.5
+
+PARTIAL_SUFFIX = ".s3part"
+JOURNAL_SUFFIX = ".s3journal"
+UPLOAD_JOURNAL_PATH = os.path.join(APP_DIR, "multipart_uploads.json")
+
+
+class TransferCanceled(Exception):
+    pass
+
+
+class TransferPaused(Exception):
+    pass
+
+
+def _raised_from(error, error_type):
+    # Recorre la cadena de excepciones (`raise ... from` y la implícita).
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, error_type):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+Destination = namedtuple("Destination", ["bucket", "prefix", "region"])
+
+
+def parse_destinations(text):
+    # "bucket[/prefijo][@región]" separados por comas, p. ej.
+    # "respaldo-capturas@eu-west-1,otro-bucket/copias/".
+    destinations = []
+    for item in text.split(","):
+        item = item.strip()
+        if item.startswith("s3://"):
+            item = item[len("s3://") :]
+        if not item:
+            continue
+        location, _, region = item.partition("@")
+        bucket, _, prefix = location.partition("/")
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        destinations.append(Destination(bucket, prefix, region or None))
+    return destinations
+
+
+class DownloadJournal:
+    def __init__(self, path, key, size, etag, part_size):
+        self.path = path
+        self.state = {
+            "key": key,
+            "size": size,
+            "etag": etag,
+            "part_size": part_size,
+            "done": [],
+        }
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, key, size, etag, part_size):
+        journal = cls(path, key, size, etag, part_size)
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                state = json.load(handle)
+        except (OSError, ValueError):
+            return journal
+        # Solo se reanuda si el objeto en S3 sigue siendo el mismo.
+        same_object = all(
+            state.get(field) == journal.state[field]
+            for field in ["key", "size", "etag", "part_size"]
+        )
+        if same_object:
+            journal.state["done"] = state.get("done", [])
+        return journal
+
+    def done_parts(self):
+        return set(self.state["done"])
+
+    def mark_done(self, part_number):
+        with self.lock:
+            self.state["done"].append(part_number)
+            temporary_path = self.path + ".tmp"
+            with open(temporary_path, "w", encoding="utf-8") as handle:
+                json.dump(self.state, handle)
+            os.replace(temporary_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class UploadJournal:
+    # Subidas multipart abiertas desde este equipo, por UploadId: si la
+    # aplicación se cierra de golpe, el barrido (awsSweeper) sabe qué archivo
+    # local corresponde a cada una y puede terminarla.
+    def __init__(self, path=UPLOAD_JOURNAL_PATH):
+        self.path = path
+        # Subidas de este proceso que siguen en marcha: el barrido no las toca.
+        self.active = set()
+        self.lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entries):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as handle:
+            json.dump(entries, handle)
+        os.replace(temporary_path, self.path)
+
+    def entries(self):
+        with self.lock:
+            return self._read()
+
+    def add(self, upload_id, **entry):
+        with self.lock:
+            self.active.add(upload_id)
+            entries = self._read()
+            entries[upload_id] = entry
+            try:
+                self._write(entries)
+            except OSError as e:
+                log_error("No se pudo guardar el diario de subidas", e)
+
+    def remove(self, upload_id):
+        with self.lock:
+            self.active.discard(upload_id)
+            entries = self._read()
+            if entries.pop(upload_id, None) is None:
+                return
+            try:
+                self._write(entries)
+            except OSError as e:
+                log_error("No se pudo guardar el diario de subidas", e)
+
+
+upload_journal = UploadJournal()
+
+
+class TransferProgress:
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.bytes_done = 0
+        self.bytes_total = 0
+        # Lo que ya estaba hecho (en S3, en disco o partes de una subida
+        # reanudada) cuenta para el avance pero no para la velocidad.
+        self.bytes_skipped = 0
+        self.started_at = time.monotonic()
+        self.last_report = 0
+        # El tiempo en pausa no cuenta para la velocidad ni el tiempo restante.
+        self.paused_at = None
+        self.paused_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add_total(self, size):
+        with self.lock:
+            self.bytes_total += size
+
+    def add_skipped(self, size):
+        with self.lock:
+            self.bytes_skipped += size
+        self.add_done(size)
+
+    def add_done(self, size):
+        with self.lock:
+            self.bytes_done += size
+            now = time.monotonic()
+            if self.callback is None or now - self.last_report < PROGRESS_INTERVAL:
+                return
+            self.last_report = now
+            done, total = self.bytes_done, self.bytes_total
+        self.callback(done, total, self.speed())
+
+    def pause(self):
+        with self.lock:
+            if self.paused_at is None:
+                self.paused_at = time.monotonic()
+
+    def resume(self):
+        with self.lock:
+            if self.paused_at is not None:
+                self.paused_seconds += time.monotonic() - self.paused_at
+                self.paused_at = None
+
+    def speed(self):
+        now = self.paused_at or time.monotonic()
+        elapsed = now - self.started_at - self.paused_seconds
+        transferred = self.bytes_done - self.bytes_skipped
+        return transferred / elapsed if elapsed > 0 else 0.0
+
+
+class _Transfer:
+    direction = None
+
+    def __init__(
+        self,
+        client,
+        bucket,
+        max_workers=TRANSFER_WORKERS,
+        part_size=PART_SIZE,
+        threshold=MULTIPART_THRESHOLD,
+        progress_callback=None,
+        endpoint=None,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.max_workers = max_workers
+        self.part_size = part_size
+        self.threshold = threshold
+        self.progress = TransferProgress(progress_callback)
+        self.canceled = threading.Event()
+        # Sin marcar = en pausa. Las peticiones esperan aquí antes de salir.
+        self.running = threading.Event()
+        self.running.set()
+        self.failed = []
+        self.completed = 0
+        # Con Transfer Acceleration el cliente conserva la URL regional: quien
+        # elige el endpoint lo indica aquí para registrarlo en los eventos.
+        self.endpoint = endpoint or getattr(
+            getattr(client, "meta", None), "endpoint_url", None
+        )
+        self._pending_parts = {}
+        self._file_started = {}
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self.canceled.set()
+        # Despierta a los hilos en pausa para que vean la cancelación.
+        self.running.set()
+
+    def pause(self):
+        # Las peticiones en curso se cortan y se repiten al reanudar; las
+        # partes ya enviadas y los UploadId se conservan.
+        if self.canceled.is_set() or not self.running.is_set():
+            return
+        self.running.clear()
+        self.progress.pause()
+        log_event("transfer_pause", dir=self.direction)
+
+    def resume(self):
+        if self.running.is_set():
+            return
+        self.progress.resume()
+        self.running.set()
+        log_event("transfer_resume", dir=self.direction)
+
+    @property
+    def paused(self):
+        return not self.running.is_set()
+
+    def _wait_if_paused(self):
+        self.running.wait()
+        if self.canceled.is_set():
+            raise TransferCanceled()
+
+    def _submit(self, pool, function, *args):
+        metrics.queue_depth.inc(direction=self.direction)
+
+        def run():
+            metrics.queue_depth.dec(direction=self.direction)
+            metrics.active_workers.inc(direction=self.direction)
+            try:
+                function(*args)
+            finally:
+                metrics.active_workers.dec(direction=self.direction)
+
+        return pool.submit(run)
+
+    def _request(self, operation, method, **params):
+        started = time.monotonic()
+        try:
+            response = method(**params)
+        except Exception:
+            metrics.requests.inc(operation=operation, outcome="error")
+            raise
+        finally:
+            metrics.request_seconds.observe(
+                time.monotonic() - started, operation=operation
+            )
+        metrics.requests.inc(operation=operation, outcome="ok")
+        return response
+
+    def _with_retries(self, action, operation, **fields):
+        # `fields` (key, part, bytes) se añaden al evento de cada intento.
+        attempt = 1
+        while True:
+            self._wait_if_paused()
+            started = time.monotonic()
+            try:
+                result = action()
+            except Exception as e:
+                # botocore envuelve lo que lanza el cuerpo (HTTPClientError):
+                # la cancelación y la pausa se miran en el estado, no en el tipo.
+                if self.canceled.is_set() or _raised_from(e, TransferCanceled):
+                    raise TransferCanceled() from e
+                if not self.running.is_set() or _raised_from(e, TransferPaused):
+                    # La petición cortada por la pausa no cuenta como intento.
+                    continue
+                self._log_request(operation, started, attempt, fields, e)
+                if attempt == TRANSFER_RETRIES:
+                    raise
+                metrics.retries.inc(operation=operation, error=metrics.error_class(e))
+                if self.canceled.wait(2**attempt):
+                    raise TransferCanceled() from e
+                attempt += 1
+            else:
+                self._log_request(operation, started, attempt, fields)
+                return result
+
+    def _log_request(self, operation, started, attempt, fields, error=None):
+        log_event(
+            "request",
+            dir=self.direction,
+            op=operation,
+            attempt=attempt,
+            dur=round(time.monotonic() - started, 4),
+            ok=error is None,
+            err=None if error is None else metrics.error_class(error),
+            endpoint=self.endpoint,
+            **fields,
+        )
+
+    def _start_file(self, key, size):
+        with self._lock:
+            self._file_started[key] = (time.monotonic(), size)
+        log_event("file_start", dir=self.direction, key=key, bytes=size)
+
+    def _finish(self, key, success, skipped=False):
+        # `skipped`: ya estaba en el destino; no cuenta para la velocidad.
+        outcome = "skipped" if skipped else "ok" if success else "error"
+        metrics.files.inc(direction=self.direction, outcome=outcome)
+        with self._lock:
+            if success:
+                self.completed += 1
+            else:
+                self.failed.append(key)
+            started, size = self._file_started.pop(key, (None, None))
+        log_event(
+            "file_end",
+            dir=self.direction,
+            key=key,
+            bytes=size,
+            dur=None if started is None else round(time.monotonic() - started, 4),
+            ok=success,
+            skipped=skipped or None,
+        )
+
+
+class Downloader(_Transfer):
+    direction = "download"
+
+    def local_path(self, key, prefix, local_dir):
+        # Se conserva el nombre de la carpeta descargada, igual que al subir.
+        base = prefix.rstrip("/")
+        base = base[: base.rfind("/") + 1] if "/" in base else ""
+        relative = key[len(base) :]
+        # Claves con ".." o "/" inicial no deben escribir fuera de local_dir.
+        root = os.path.abspath(local_dir)
+        destination = os.path.abspath(os.path.join(root, *relative.split("/")))
+        if destination == root or os.path.commonpath([root, destination]) != root:
+            raise ValueError(f"La clave {key} sale de la carpeta de destino")
+        return destination
+
+    def download(self, keys, local_dir):
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="s3-download"
+        ) as pool:
+            for key in keys:
+                if key.endswith("/"):
+                    objects = iter_bucket(self.client, self.bucket, key)
+                else:
+                    head = self._request(
+                        "HeadObject",
+                        self.client.head_object,
+                        Bucket=self.bucket,
+                        Key=key,
+                    )
+                    objects = [
+                        {
+                            "Key": key,
+                            "Size": head["ContentLength"],
+                            "ETag": head["ETag"],
+                        }
+                    ]
+                for obj in objects:
+                    if self.canceled.is_set():
+                        break
+                    try:
+                        destination = self.local_path(obj["Key"], key, local_dir)
+                    except ValueError as e:
+                        log_error("Clave no descargable", e, key=obj["Key"])
+                        self._finish(obj["Key"], False)
+                        continue
+                    self._schedule(pool, obj, destination)
+        if self.canceled.is_set():
+            raise TransferCanceled()
+        return self.completed, self.failed
+
+    def _schedule(self, pool, obj, destination):
+        if obj["Key"].endswith("/"):
+            os.makedirs(destination, exist_ok=True)
+            return
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        size = obj["Size"]
+        self.progress.add_total(size)
+        self._start_file(obj["Key"], size)
+
+        if os.path.exists(destination) and os.path.getsize(destination) == size:
+            self.progress.add_skipped(size)
+            self._finish(obj["Key"], True, skipped=True)
+            return
+
+        if size < self.threshold:
+            self._submit(pool, self._download_small, obj, destination)
+            return
+
+        partial_path = destination + PARTIAL_SUFFIX
+        journal = DownloadJournal.load(
+            destination + JOURNAL_SUFFIX, obj["Key"], size, obj["ETag"], self.part_size
+        )
+        done_parts = journal.done_parts()
+        if not done_parts or not os.path.exists(partial_path):
+            done_parts = set()
+            journal.state["done"] = []
+            # Archivo disperso del tamaño final: cada parte escribe en su rango.
+            with open(partial_path, "wb") as handle:
+                handle.truncate(size)
+
+        ranges = []
+        for part_number, start in enumerate(range(0, size, self.part_size), 1):
+            end = min(start + self.part_size, size) - 1
+            if part_number in done_parts:
+                self.progress.add_skipped(end - start + 1)
+            else:
+                ranges.append((part_number, start, end))
+
+        if not ranges:
+            self._complete_partial(obj, destination, journal)
+            return
+        with self._lock:
+            self._pending_parts[obj["Key"]] = len(ranges)
+        for part_number, start, end in ranges:
+            self._submit(
+                pool,
+                self._download_part,
+                obj,
+                destination,
+                journal,
+                part_number,
+                start,
+                end,
+            )
+
+    def _copy_body(self, body, handle):
+        while True:
+            if self.canceled.is_set():
+                raise TransferCanceled()
+            if not self.running.is_set():
+                raise TransferPaused()
+            chunk = body.read(READ_CHUNK)
+            if not chunk:
+                break
+            handle.write(chunk)
+            metrics.bytes_received.inc(len(chunk), operation="GetObject")
+            self.progress.add_done(len(chunk))
+
+    def _download_small(self, obj, destination):
+        partial_path = destination + PARTIAL_SUFFIX
+
+        def fetch():
+            response = self._get_object(Key=obj["Key"])
+            with open(partial_path, "wb") as handle:
+                try:
+                    self._copy_body(response["Body"], handle)
+                except Exception:
+                    self.progress.add_done(-handle.tell())
+                    raise
+
+        try:
+            self._with_retries(fetch, "GetObject", key=obj["Key"], bytes=obj["Size"])
+            os.replace(partial_path, destination)
+            self._finish(obj["Key"], True)
+        except TransferCanceled:
+            pass
+        except Exception:
+            self._finish(obj["Key"], False)
+
+    def _download_part(self, obj, destination, journal, part_number, start, end):
+        partial_path = destination + PARTIAL_SUFFIX
+
+        def fetch():
+            response = self._get_object(
+                Key=obj["Key"],
+                Range=f"bytes={start}-{end}",
+                IfMatch=obj["ETag"],
+            )
+            with open(partial_path, "r+b") as handle:
+                handle.seek(start)
+                try:
+                    self._copy_body(response["Body"], handle)
+                except Exception:
+                    self.progress.add_done(start - handle.tell())
+                    raise
+
+        try:
+            self._with_retries(
+                fetch,
+                "GetObject",
+                key=obj["Key"],
+                part=part_number,
+                bytes=end - start + 1,
+            )
+        except TransferCanceled:
+            return
+        except Exception:
+            with self._lock:
+                already_failed = self._pending_parts.pop(obj["Key"], None) is None
+            if not already_failed:
+                self._finish(obj["Key"], False)
+            return
+
+        journal.mark_done(part_number)
+        with self._lock:
+            if obj["Key"] not in self._pending_parts:
+                return
+            self._pending_parts[obj["Key"]] -= 1
+            last_part = self._pending_parts[obj["Key"]] == 0
+            if last_part:
+                del self._pending_parts[obj["Key"]]
+        if last_part:
+            self._complete_partial(obj, destination, journal)
+
+    def _get_object(self, **params):
+        # get_object vuelve al recibir las cabeceras: su duración es el TTFB.
+        started = time.monotonic()
+        response = self._request(
+            "GetObject", self.client.get_object, Bucket=self.bucket, **params
+        )
+        metrics.first_byte_seconds.observe(
+            time.monotonic() - started, direction=self.direction
+        )
+        return response
+
+    def _complete_partial(self, obj, destination, journal):
+        os.replace(destination + PARTIAL_SUFFIX, destination)
+        journal.remove()
+        self._finish(obj["Key"], True)
+
+
+class ViewBody:
+    # Cuerpo de petición sobre una memoryview. read() devuelve trozos de la
+    # vista, que llegan al socket sin copiarse. Si se cancela o se pausa la
+    # transferencia el siguiente read() corta la petición en curso en vez de
+    # terminarla.
+    def __init__(self, view, canceled=None, running=None):
+        self._view = view
+        self.length = len(view)
+        self.position = 0
+        self.canceled = canceled
+        self.running = running
+
+    def read(self, size=-1):
+        if self.canceled is not None and self.canceled.is_set():
+            raise TransferCanceled()
+        if self.running is not None and not self.running.is_set():
+            raise TransferPaused()
+        if size is None or size < 0:
+            size = self.length - self.position
+        chunk = self._view[self.position : self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # botocore vuelve al inicio tras calcular el checksum y al reintentar.
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.length
+        self.position = min(max(offset, 0), self.length)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def close(self):
+        # El mapa o búfer se libera con la última memoryview que siga viva;
+        # cerrarlo a mano fallaría si el cliente HTTP aún guarda algún trozo.
+        self._view = memoryview(b"")
+        self.position = self.length = 0
+
+
+class PartBody(ViewBody):
+    # Parte [start, start + length) de un archivo mapeado en memoria. Solo se
+    # mapea la parte: la memoria no crece con el tamaño del archivo.
+    def __init__(self, file_path, start, length, canceled=None, running=None):
+        offset = start - start % mmap.ALLOCATIONGRANULARITY
+        with open(file_path, "rb") as handle:
+            file_map = mmap.mmap(
+                handle.fileno(),
+                start - offset + length,
+                access=mmap.ACCESS_READ,
+                offset=offset,
+            )
+        if hasattr(file_map, "madvise"):
+            file_map.madvise(mmap.MADV_SEQUENTIAL)
+        super().__init__(memoryview(file_map)[start - offset :], canceled, running)
+
+
+class BufferPool:
+    # Búferes reutilizables con un límite total de bytes. acquire() espera a
+    # que se liberen búferes si el pool está lleno: así los lectores no se
+    # adelantan más de lo que los envíos pueden absorber.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.in_use = 0
+        self._free = {}
+        self._free_bytes = 0
+        self._users = {}
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self, size):
+        with self._condition:
+            # Un búfer mayor que el pool se admite cuando este está vacío.
+            while not self._closed and self.in_use and (
+                self.in_use + size > self.capacity
+            ):
+                self._condition.wait()
+            if self._closed:
+                raise TransferCanceled()
+            self.in_use += size
+            metrics.read_ahead_bytes.set(self.in_use)
+            if size in self._free:
+                self._free_bytes -= size
+                buffers = self._free[size]
+                if len(buffers) == 1:
+                    del self._free[size]
+                return buffers.pop()
+            # Se descartan búferes libres de otros tamaños hasta que quepa.
+            while self._free and self.in_use + self._free_bytes > self.capacity:
+                other_size, buffers = next(iter(self._free.items()))
+                buffers.pop()
+                self._free_bytes -= other_size
+                if not buffers:
+                    del self._free[other_size]
+        return bytearray(size)
+
+    def share(self, buffer, users):
+        # El búfer vuelve al pool cuando lo han liberado sus `users` envíos.
+        if users > 1:
+            with self._condition:
+                self._users[id(buffer)] = users
+
+    def release(self, buffer):
+        with self._condition:
+            users = self._users.pop(id(buffer), 1) - 1
+            if users > 0:
+                self._users[id(buffer)] = users
+                return
+            self.in_use -= len(buffer)
+            metrics.read_ahead_bytes.set(self.in_use)
+            # Solo se guardan los búferes grandes (partes y archivos medianos).
+            if len(buffer) >= READ_CHUNK and not self._closed:
+                self._free.setdefault(len(buffer), []).append(buffer)
+                self._free_bytes += len(buffer)
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._free.clear()
+            self._free_bytes = 0
+            self._condition.notify_all()
+
+
+def list_upload_files(folder):
+    # (ruta, clave relativa, stat) en orden físico de lectura.
+    stats = []
+    for rootf, dirs, file_names in os.walk(folder):
+        for file_name in file_names:
+            file_path = os.path.join(rootf, file_name)
+            stats.append((file_path, os.stat(file_path)))
+    return [
+        (file_path, os.path.relpath(file_path, folder).replace(os.sep, "/"), stat)
+        for file_path, stat in physical_order(stats)
+    ]
+
+
+def start_readers(reads, buffers, devices, count):
+    readers = [
+        threading.Thread(
+            target=_read_ahead,
+            args=(reads, buffers, devices),
+            name=f"s3-read-{number}",
+            daemon=True,
+        )
+        for number in range(count)
+    ]
+    for reader in readers:
+        reader.start()
+    return readers
+
+
+def stop_readers(reads, readers):
+    for reader in readers:
+        reads.put(None)
+    for reader in readers:
+        reader.join()
+
+
+def _read_ahead(reads, buffers, devices):
+    # Cada tarea es un rango de un archivo y los envíos que lo esperan (uno
+    # por destino): el rango se lee una vez y el búfer se comparte.
+    while True:
+        task = reads.get()
+        if task is None:
+            return
+        file_path, start, length, targets = task
+        try:
+            buffer = buffers.acquire(length)
+        except TransferCanceled:
+            # La tarea se entrega igualmente: el envío ve la cancelación y
+            # aborta la subida multipart si la hay.
+            buffer = None
+        else:
+            try:
+                # Límite de lectores por disco compartido con las demás subidas.
+                with reader_slot(devices.get(file_path)):
+                    _read_range(file_path, start, length, buffer)
+            except OSError:
+                # Sin búfer, el envío vuelve a leer del disco y el error se
+                # registra y reintenta como cualquier otro.
+                buffers.release(buffer)
+                buffer = None
+            else:
+                buffers.share(buffer, len(targets))
+        for transfer, pool, function, args in targets:
+            transfer._submit(pool, function, *args, buffer)
+
+
+def _read_range(file_path, start, length, buffer):
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as handle:
+        handle.seek(start)
+        done = 0
+        while done < length:
+            read = handle.readinto(view[done:length])
+            if not read:
+                raise OSError(f"{file_path} cambió de tamaño durante la subida")
+            done += read
+
+
+class Uploader(_Transfer):
+    direction = "upload"
+
+    def __init__(
+        self,
+        *args,
+        read_ahead=READ_AHEAD_MEMORY,
+        readers=READ_AHEAD_READERS,
+        skip_existing=True,
+        journal=upload_journal,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.read_ahead = read_ahead
+        self.readers = readers
+        self.skip_existing = skip_existing
+        self.journal = journal
+        self._existing = {}
+        self.started_at = None
+        self._first_byte_seen = False
+        self._buffers = None
+        self._reads = None
+        self._devices = {}
+
+    def cancel(self):
+        super().cancel()
+        if self._buffers is not None:
+            self._buffers.close()
+
+    def upload(self, folder, s3_prefix):
+        self.started_at = time.monotonic()
+        self._load_existing(s3_prefix)
+        files = []
+        for file_path, relative_key, stat in list_upload_files(folder):
+            files.append((file_path, s3_prefix + relative_key, stat.st_size))
+            self._devices[file_path] = stat.st_dev
+        return self.upload_files(files)
+
+    def upload_files(self, files):
+        # (ruta, clave, tamaño) en el orden de lectura. Se puede llamar varias
+        # veces con el mismo Uploader: progreso y resultados se acumulan.
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        for file_path, key, size in files:
+            self.progress.add_total(size)
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="s3-upload"
+        ) as pool:
+            # Los lectores terminan antes de cerrar el pool: le envían tareas.
+            readers = []
+            if self.read_ahead and self.readers:
+                self._buffers = BufferPool(self.read_ahead)
+                if self.canceled.is_set():
+                    self._buffers.close()
+                self._reads = queue.Queue(maxsize=self.max_workers)
+                readers = start_readers(
+                    self._reads, self._buffers, self._devices, self.readers
+                )
+            try:
+                for file_path, key, size in files:
+                    if self.canceled.is_set():
+                        break
+                    self._schedule(pool, file_path, key, size)
+            finally:
+                stop_readers(self._reads, readers)
+        if self.canceled.is_set():
+            raise TransferCanceled()
+        return self.completed, self.failed
+
+    def resume_interrupted(self, uploads):
+        # Termina subidas multipart interrumpidas. Cada elemento es
+        # (UploadId, entrada del diario, {número de parte: ETag} ya en S3).
+        self.started_at = time.monotonic()
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="s3-resume"
+        ) as pool:
+            for upload_id, entry, etags in uploads:
+                if self.canceled.is_set():
+                    break
+                key, size = entry["key"], entry["size"]
+                self.progress.add_total(size)
+                self._start_file(key, size)
+                if self.journal is not None:
+                    self.journal.active.add(upload_id)
+                upload = {"id": upload_id, "etags": dict(etags), "closed": False}
+                self._schedule_parts(
+                    pool, entry["file"], key, size, upload, entry["part_size"]
+                )
+        if self.canceled.is_set():
+            raise TransferCanceled()
+        return self.completed, self.failed
+
+    def _load_existing(self, s3_prefix):
+        # Lo que ya está en S3 con el mismo tamaño y es posterior a la última
+        # modificación local no se vuelve a subir: al reanudar tras cancelar o
+        # tras un fallo solo se envía lo que falta, pero un archivo editado se
+        # sobrescribe aunque no cambie de tamaño.
+        if not self.skip_existing:
+            return
+        try:
+            for obj in iter_bucket(self.client, self.bucket, s3_prefix):
+                last_modified = obj.get("LastModified")
+                if last_modified is not None and not isinstance(
+                    last_modified, (int, float)
+                ):
+                    last_modified = last_modified.timestamp()
+                self._existing[obj["Key"]] = (obj["Size"], last_modified)
+        except Exception as e:
+            log_error(
+                "No se pudo listar lo ya subido", e, bucket=self.bucket, key=s3_prefix
+            )
+            self._existing = {}
+
+    def _dispatch(self, pool, function, file_path, start, length, *args):
+        if self._reads is None:
+            self._submit(pool, function, *args)
+        else:
+            targets = [(self, pool, function, args)]
+            self._reads.put((file_path, start, length, targets))
+
+    def _release(self, buffer):
+        if buffer is not None:
+            self._buffers.release(buffer)
+
+    def _body(self, file_path, start, length, buffer):
+        if buffer is not None:
+            return ViewBody(memoryview(buffer)[:length], self.canceled, self.running)
+        if length == 0:
+            # mmap no admite mapas vacíos.
+            return ViewBody(memoryview(b""), self.canceled, self.running)
+        return PartBody(file_path, start, length, self.canceled, self.running)
+
+    def _is_uploaded(self, file_path, key, size):
+        existing_size, last_modified = self._existing.get(key, (None, None))
+        if existing_size != size or last_modified is None:
+            return False
+        # LastModified de S3 va en segundos enteros.
+        return os.path.getmtime(file_path) < last_modified + 1
+
+    def _schedule(self, pool, file_path, key, size):
+        self._start_file(key, size)
+        if self._is_uploaded(file_path, key, size):
+            self.progress.add_skipped(size)
+            self._finish(key, True, skipped=True)
+            return
+        if size < self.threshold:
+            self._dispatch(
+                pool, self._upload_small, file_path, 0, size, file_path, key, size
+            )
+            return
+
+        # La subida multipart se crea aquí y no en un hilo del pool: el pool no
+        # admite tareas nuevas una vez que el bucle de upload() ha terminado.
+        try:
+            upload_id = self._with_retries(
+                lambda: self._request(
+                    "CreateMultipartUpload",
+                    self.client.create_multipart_upload,
+                    Bucket=self.bucket,
+                    Key=key,
+                )["UploadId"],
+                "CreateMultipartUpload",
+                key=key,
+            )
+        except TransferCanceled:
+            return
+        except Exception:
+            self._finish(key, False)
+            return
+        if self.journal is not None:
+            self.journal.add(
+                upload_id,
+                bucket=self.bucket,
+                key=key,
+                file=os.path.abspath(file_path),
+                size=size,
+                mtime=os.path.getmtime(file_path),
+                part_size=self.part_size,
+                started=time.time(),
+            )
+        upload = {"id": upload_id, "etags": {}, "closed": False}
+        self._schedule_parts(pool, file_path, key, size, upload, self.part_size)
+
+    def _schedule_parts(self, pool, file_path, key, size, upload, part_size):
+        # Las partes que ya tienen ETag (al reanudar) no se vuelven a enviar.
+        ranges = []
+        for part_number, start in enumerate(range(0, size, part_size), 1):
+            length = min(part_size, size - start)
+            if part_number in upload["etags"]:
+                self.progress.add_skipped(length)
+            else:
+                ranges.append((part_number, start, length))
+        if not ranges:
+            self._complete(key, upload)
+            return
+        with self._lock:
+            self._pending_parts[key] = len(ranges)
+        for part_number, start, length in ranges:
+            self._dispatch(
+                pool,
+                self._upload_part,
+                file_path,
+                start,
+                length,
+                file_path,
+                key,
+                upload,
+                part_number,
+                start,
+                length,
+            )
+
+    def _sent(self, size, operation):
+        metrics.bytes_sent.inc(size, operation=operation)
+        with self._lock:
+            first_byte = not self._first_byte_seen
+            self._first_byte_seen = True
+        if first_byte:
+            metrics.first_byte_seconds.observe(
+                time.monotonic() - self.started_at, direction=self.direction
+            )
+        self.progress.add_done(size)
+
+    def _upload_small(self, file_path, key, size, buffer=None):
+        def send():
+            body = self._body(file_path, 0, size, buffer)
+            try:
+                self._request(
+                    "PutObject",
+                    self.client.put_object,
+                    Bucket=self.bucket,
+                    Key=key,
+                    Body=body,
+                )
+            finally:
+                body.close()
+
+        try:
+            self._with_retries(send, "PutObject", key=key, bytes=size)
+        except TransferCanceled:
+            return
+        except Exception:
+            self._finish(key, False)
+            return
+        finally:
+            self._release(buffer)
+        self._sent(size, "PutObject")
+        self._finish(key, True)
+
+    def _upload_part(
+        self, file_path, key, upload, part_number, start, length, buffer=None
+    ):
+        def send():
+            body = self._body(file_path, start, length, buffer)
+            try:
+                response = self._request(
+                    "UploadPart",
+                    self.client.upload_part,
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload["id"],
+                    PartNumber=part_number,
+                    Body=body,
+                )
+            finally:
+                body.close()
+            return response["ETag"]
+
+        try:
+            etag = self._with_retries(
+                send, "UploadPart", key=key, part=part_number, bytes=length
+            )
+        except TransferCanceled:
+            self._abort(key, upload)
+            return
+        except Exception:
+            with self._lock:
+                already_failed = self._pending_parts.pop(key, None) is None
+            self._abort(key, upload)
+            if not already_failed:
+                self._finish(key, False)
+            return
+        finally:
+            self._release(buffer)
+
+        self._sent(length, "UploadPart")
+        with self._lock:
+            if key not in self._pending_parts:
+                return
+            upload["etags"][part_number] = etag
+            self._pending_parts[key] -= 1
+            last_part = self._pending_parts[key] == 0
+            if last_part:
+                del self._pending_parts[key]
+        if last_part:
+            self._complete(key, upload)
+
+    def _complete(self, key, upload):
+        parts = [
+            {"PartNumber": part_number, "ETag": etag}
+            for part_number, etag in sorted(upload["etags"].items())
+        ]
+        try:
+            self._with_retries(
+                lambda: self._request(
+                    "CompleteMultipartUpload",
+                    self.client.complete_multipart_upload,
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload["id"],
+                    MultipartUpload={"Parts": parts},
+                ),
+                "CompleteMultipartUpload",
+                key=key,
+            )
+        except TransferCanceled:
+            self._abort(key, upload)
+            return
+        except Exception:
+            self._abort(key, upload)
+            self._finish(key, False)
+            return
+        if self.journal is not None:
+            self.journal.remove(upload["id"])
+        self._finish(key, True)
+
+    def _abort(self, key, upload):
+        # Las partes ya subidas se cobran hasta que se aborta la subida.
+        with self._lock:
+            if upload["closed"]:
+                return
+            upload["closed"] = True
+        try:
+            self._request(
+                "AbortMultipartUpload",
+                self.client.abort_multipart_upload,
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload["id"],
+            )
+        except Exception as e:
+            log_error(
+                "No se pudo abortar la subida multipart", e, bucket=self.bucket, key=key
+            )
+        # Si el aborto falla, el barrido la encontrará cuando caduque.
+        if self.journal is not None:
+            self.journal.remove(upload["id"])
+
+
+class FanOutUploader:
+    # Sube una carpeta a varios destinos (buckets, regiones o prefijos)
+    # leyendo cada bloque del disco una sola vez. Cada destino es un Uploader
+    # con su cliente, su progreso y sus reintentos; comparten los lectores y
+    # el pool de búferes, así que el destino más lento marca el ritmo.
+    def __init__(
+        self, uploaders, read_ahead=READ_AHEAD_MEMORY, readers=READ_AHEAD_READERS
+    ):
+        sizes = {(uploader.part_size, uploader.threshold) for uploader in uploaders}
+        if len(sizes) > 1:
+            raise ValueError("Todos los destinos deben usar el mismo tamaño de parte")
+        self.uploaders = uploaders
+        # Sin pool no hay búfer que compartir entre destinos.
+        self.read_ahead = max(read_ahead, uploaders[0].part_size)
+        self.readers = max(readers, 1)
+        self.canceled = threading.Event()
+
+    def cancel(self):
+        self.canceled.set()
+        for uploader in self.uploaders:
+            uploader.cancel()
+
+    def pause(self):
+        for uploader in self.uploaders:
+            uploader.pause()
+
+    def resume(self):
+        for uploader in self.uploaders:
+            uploader.resume()
+
+    @property
+    def paused(self):
+        return any(uploader.paused for uploader in self.uploaders)
+
+    def upload(self, folder, s3_prefixes):
+        # Devuelve (completados, fallidos) de cada destino, en su orden.
+        files = list_upload_files(folder)
+        devices = {file_path: stat.st_dev for file_path, _, stat in files}
+        buffers = BufferPool(self.read_ahead)
+        for uploader, s3_prefix in zip(self.uploaders, s3_prefixes):
+            uploader.started_at = time.monotonic()
+            uploader._buffers = buffers
+            uploader._devices = devices
+            # Aquí se recogen las lecturas de cada destino para agruparlas.
+            uploader._reads = queue.SimpleQueue()
+            uploader._load_existing(s3_prefix)
+            for _, _, stat in files:
+                uploader.progress.add_total(stat.st_size)
+        if self.canceled.is_set():
+            buffers.close()
+        reads = queue.Queue(
+            maxsize=max(uploader.max_workers for uploader in self.uploaders)
+        )
+
+        with ExitStack() as stack:
+            pools = [
+                stack.enter_context(
+                    ThreadPoolExecutor(
+                        max_workers=uploader.max_workers,
+                        thread_name_prefix=f"s3-upload-{number}",
+                    )
+                )
+                for number, uploader in enumerate(self.uploaders)
+            ]
+            readers = start_readers(reads, buffers, devices, self.readers)
+            try:
+                for file_path, relative_key, stat in files:
+                    if self.canceled.is_set():
+                        break
+                    ranges = {}
+                    destinations = zip(self.uploaders, pools, s3_prefixes)
+                    for uploader, pool, s3_prefix in destinations:
+                        uploader._schedule(
+                            pool, file_path, s3_prefix + relative_key, stat.st_size
+                        )
+                        while not uploader._reads.empty():
+                            _, start, length, targets = uploader._reads.get()
+                            ranges.setdefault((start, length), []).extend(targets)
+                    for (start, length), targets in ranges.items():
+                        reads.put((file_path, start, length, targets))
+            finally:
+                stop_readers(reads, readers)
+        if self.canceled.is_set():
+            raise TransferCanceled()
+        return [(uploader.completed, uploader.failed) for uploader in self.uploaders]
@@ -1,12 +1,47 @@
+import multiprocessing
 import os
-import subprocess
-import re
-from queue import Queue
+import sys
+import threading
+import time
+from collections import Counter
+from functools import partial
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import pyqtSignal, QObject, QThread
-import boto3
 from dotenv import load_dotenv
-import requests
+
+from awsDevices import device_id, device_upload_limit
+from awsEndpoints import ENDPOINT_CANDIDATES, EndpointSelector, parse_candidates
+from awsExplorer import S3FileExplorer
+from awsIndex import get_index
+from awsListing import (
+    invalidate_prefix,
+    list_prefix,
+    load_cached_folders,
+    save_cached_folders,
+)
+from awsManifest import is_manifest_name, summarize_manifest, write_manifest
+from awsMetrics import start_metrics
+from awsPreviews import PREVIEW_PREFIX, PreviewStage, previews_available
+from awsProfiling import profile_session
+from awsQueue import (
+    DEFAULT_POLICY,
+    QUEUE_POLICIES,
+    UploadJob,
+    UploadQueue,
+    folder_totals,
+)
+from awsSweeper import start_sweeper
+from awsTransfer import (
+    CLIENT_POOL_CONNECTIONS,
+    MiB,
+    Destination,
+    Downloader,
+    FanOutUploader,
+    TransferCanceled,
+    Uploader,
+    parse_destinations,
+)
+from awsVerify import summarize, verify_upload
 
 
 # Determinar si se está ejecutando en un entorno empaquetado (ejecutable)
@@ -24,12 +59,12 @@ load_dotenv()
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_BUCKET = os.getenv("AWS_BUCKET")
+# Copias adicionales de cada subida, p. ej. "respaldo@eu-west-1,otro/copias/".
+EXTRA_DESTINATIONS = parse_destinations(os.getenv("AWS_EXTRA_DESTINATIONS", ""))
+PRIMARY_DESTINATION = Destination(AWS_BUCKET, "", None)
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-)
+_s3_clients = {}
+_s3_client_lock = threading.Lock()
 
 selected_folders = []
 total_files = 0
@@ -37,11 +72,66 @@ total_files = 0
 progress_bars = {}
 progress_labels = {}
 upload_threads = {}
+download_threads = {}
 
 MAX_CONCURRENT_UPLOADS = 5
+# Al cerrar la aplicación, espera máxima a que terminen los hilos cancelados.
+THREAD_STOP_TIMEOUT_MS = 3000
+
+
+def get_s3_client(region=None, endpoint=None):
+    # boto3 tarda en importarse: el cliente se crea al primer uso, normalmente
+    # desde el hilo que carga las carpetas de S3 tras mostrar la ventana.
+    with _s3_client_lock:
+        client = _s3_clients.get((region, endpoint))
+        if client is None:
+            import boto3
+            from botocore.config import Config
+
+            options = {}
+            s3_options = {}
+            if endpoint == "accelerate":
+                s3_options["use_accelerate_endpoint"] = True
+            elif endpoint not in (None, "default"):
+                options["endpoint_url"] = endpoint
+            client = _s3_clients[(region, endpoint)] = boto3.client(
+                "s3",
+                region_name=region,
+                aws_access_key_id=AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                config=Config(
+                    max_pool_connections=CLIENT_POOL_CONNECTIONS, s3=s3_options
+                ),
+                **options,
+            )
+        return client
+
+
+# Endpoint más rápido para el bucket principal entre AWS_ENDPOINT_CANDIDATES.
+endpoint_selector = EndpointSelector(
+    AWS_BUCKET,
+    parse_candidates(ENDPOINT_CANDIDATES),
+    lambda endpoint: get_s3_client(endpoint=endpoint),
+)
+
+
+def destination_progress_name(folder, destination):
+    base_folder_name = os.path.basename(folder)
+    if destination == PRIMARY_DESTINATION:
+        return base_folder_name
+    return f"{base_folder_name} → {destination.bucket}/{destination.prefix}"
+
+
+def progress_names(folder):
+    return [
+        destination_progress_name(folder, destination)
+        for destination in [PRIMARY_DESTINATION] + EXTRA_DESTINATIONS
+    ]
 
 
 def check_internet_connection():
+    import requests
+
     try:
         response = requests.get("https://www.google.com", timeout=5)
         return response.status_code == 200
@@ -52,9 +142,12 @@ def check_internet_connection():
 class ProgressWindow(QtWidgets.QWidget):
     cancel_all = pyqtSignal()
     reset_ui = pyqtSignal()
+    pause_all = pyqtSignal()
+    pause_toggled = pyqtSignal(str)
 
     def __init__(self):
         super().__init__()
+        self.pause_buttons = {}
         self.initUI()
         self.close_event_handled = False
 
@@ -76,6 +169,10 @@ class ProgressWindow(QtWidgets.QWidget):
         layout.setContentsMargins(5, 5, 5, 5)
         layout.setSpacing(15)
 
+        self.pause_all_button = QtWidgets.QPushButton("Pausar todo", self)
+        self.pause_all_button.clicked.connect(lambda: self.pause_all.emit())
+        layout.addWidget(self.pause_all_button)
+
         scroll_area = QtWidgets.QScrollArea(self)
         scroll_area.setWidgetResizable(True)
         scroll_area.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
@@ -92,13 +189,21 @@ class ProgressWindow(QtWidgets.QWidget):
         self.setLayout(layout)
         self.show()
 
-    def add_progress_ui(self, folder_name, initial_message="Cargando archivos..."):
+    def add_progress_ui(
+        self,
+        folder_name,
+        initial_message="Cargando archivos...",
+        title=None,
+        pause_key=None,
+    ):
         group_box = QtWidgets.QGroupBox()
         group_box_layout = QtWidgets.QVBoxLayout()
         group_box_layout.setContentsMargins(5, 5, 5, 5)
         group_box_layout.setSpacing(5)
 
-        folder_label = QtWidgets.QLabel(f"Subiendo Carpeta: {folder_name}", self)
+        if title is None:
+            title = f"Subiendo Carpeta: {folder_name}"
+        folder_label = QtWidgets.QLabel(title, self)
         group_box_layout.addWidget(folder_label)
 
         barra_layout = QtWidgets.QHBoxLayout()
@@ -115,6 +220,12 @@ class ProgressWindow(QtWidgets.QWidget):
 
         barra_layout.addWidget(progress_bar)
 
+        if pause_key is not None:
+            pause_button = QtWidgets.QPushButton("Pausar", self)
+            pause_button.clicked.connect(lambda: self.pause_toggled.emit(pause_key))
+            barra_layout.addWidget(pause_button)
+            self.pause_buttons[pause_key] = pause_button
+
         group_box_layout.addLayout(barra_layout)
 
         progress_label = QtWidgets.QLabel(initial_message, self)
@@ -136,6 +247,13 @@ class ProgressWindow(QtWidgets.QWidget):
             elif value == 0:
                 self.set_progress_color(folder_name, "default")
 
+    def set_paused(self, pause_key, paused):
+        if pause_key in self.pause_buttons:
+            self.pause_buttons[pause_key].setText("Reanudar" if paused else "Pausar")
+
+    def set_all_paused(self, paused):
+        self.pause_all_button.setText("Reanudar todo" if paused else "Pausar todo")
+
     def set_progress_color(self, folder_name, color):
         if folder_name in progress_bars:
             progress_bar = progress_bars[folder_name]
@@ -179,28 +297,58 @@ class ProgressWindow(QtWidgets.QWidget):
 class UploadWorker(QObject):
     progress_updated = pyqtSignal(str, float, str)
     upload_complete = pyqtSignal(str, bool)
+    verification_finished = pyqtSignal(str, str)
     cancel_signal = pyqtSignal()
-
-    def __init__(self, folder, s3_folder, max_retries=3):
+    pause_signal = pyqtSignal()
+    resume_signal = pyqtSignal()
+
+    def __init__(
+        self,
+        folder,
+        s3_folder,
+        max_retries=3,
+        verify_checksums=False,
+        make_previews=False,
+    ):
         super().__init__()
         self.folder = folder
         self.s3_folder = s3_folder
         self.is_canceled = False
         self.max_retries = max_retries
-        self.cancel_signal.connect(self.cancel_upload)
+        self.verify_checksums = verify_checksums
+        self.make_previews = make_previews
+        self.preview_stage = None
+        self.preview_thread = None
+        self.uploaded_objects = []
+        self.uploader = None
+        # Cada destino se reintenta hasta quedar subido y verificado.
+        self.pending_destinations = [PRIMARY_DESTINATION] + EXTRA_DESTINATIONS
+        self.uploaded_destinations = []
+        self.cancel_event = threading.Event()
+        self.is_paused = False
+        self.cancel_signal.connect(self.cancel_upload, QtCore.Qt.DirectConnection)
+        self.pause_signal.connect(self.pause_upload, QtCore.Qt.DirectConnection)
+        self.resume_signal.connect(self.resume_upload, QtCore.Qt.DirectConnection)
 
     def run(self):
+        with profile_session(f"subida-{os.path.basename(self.folder)}"):
+            self.run_upload()
+
+    def run_upload(self):
         retries = 0
         success = False
+        self.update_manifest()
+        self.start_previews()
 
         while retries < self.max_retries and not success and not self.is_canceled:
             if not check_internet_connection():
                 self.handle_connection_loss()
                 retries += 1
-                QtCore.QThread.sleep(5)
+                self.cancel_event.wait(5)
                 continue
 
-            success = self.upload_to_s3()
+            self.upload_to_s3()
+            success = self.verify_uploaded_files()
             if not success:
                 retries += 1
                 if retries < self.max_retries:
@@ -208,7 +356,7 @@ class UploadWorker(QObject):
                         self.folder, 0, "Error: Fallo en la subida. Reintentando..."
                     )
                     self.handle_connection_loss()
-                    QtCore.QThread.sleep(5)
+                    self.cancel_event.wait(5)
                 else:
                     self.progress_updated.emit(
                         self.folder,
@@ -216,105 +364,189 @@ class UploadWorker(QObject):
                         "Error: Fallo en la subida. Máximo número de reintentos alcanzado.",
                     )
 
+        if self.preview_thread is not None:
+            self.preview_thread.join()
+            invalidate_prefix(AWS_BUCKET, self.preview_stage.s3_prefix)
+        invalidate_prefix(
+            AWS_BUCKET, f"{self.s3_folder}{os.path.basename(self.folder)}/"
+        )
+        if success:
+            self.record_uploaded_files()
         self.upload_complete.emit(self.folder, success)
 
-    def upload_to_s3(self):
+    def update_manifest(self):
+        # Va dentro de la carpeta: sube y se verifica con ella en cada destino.
         base_folder_name = os.path.basename(self.folder)
-        s3_path = f"s3://{AWS_BUCKET}/{self.s3_folder}{base_folder_name}/"
-        command = [
-            "aws",
-            "s3",
-            "cp",
-            self.folder,
-            s3_path,
-            "--recursive",
-        ]
+        self.progress_updated.emit(base_folder_name, 0, "Leyendo metadatos...")
+        try:
+            result = write_manifest(self.folder)
+        except Exception as e:
+            self.verification_finished.emit(
+                self.folder, f"No se pudo generar el manifiesto: {e}"
+            )
+            return
+        if result is not None:
+            path, records = result
+            self.verification_finished.emit(
+                self.folder, f"{base_folder_name}: {summarize_manifest(records)}"
+            )
 
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
-            universal_newlines=True,
+    def start_previews(self):
+        # Las miniaturas suben a la vez que los originales pero en su propio
+        # pool, así que están en S3 mucho antes: desde lejos se puede revisar
+        # el vuelo sin esperar a la carpeta completa.
+        if not self.make_previews:
+            return
+        base_folder_name = os.path.basename(self.folder)
+        self.preview_stage = PreviewStage(
+            get_s3_client(),
+            AWS_BUCKET,
+            self.folder,
+            f"{PREVIEW_PREFIX}{self.s3_folder}{base_folder_name}/",
         )
-
-        data_transferred_regex = re.compile(
-            r"Completed (\d+(\.\d+)?) (KiB|MiB|GiB)/~?(\d+(\.\d+)?) (KiB|MiB|GiB) \((\d+(\.\d+)?) (KiB|MiB|GiB)/s\)"
+        if self.is_paused:
+            self.preview_stage.pause()
+        self.preview_thread = threading.Thread(
+            target=self.run_previews, name="previews", daemon=True
         )
+        self.preview_thread.start()
 
-        while True:
-            if self.is_canceled:
-                process.terminate()
-                return False
-
-            line = process.stdout.readline()
-            if not line and process.poll() is not None:
-                break
-            if line.startswith("Completed"):
-                match = data_transferred_regex.search(line)
-                if match:
-                    completed_data = float(match.group(1))
-                    completed_unit = match.group(3)
-                    total_data = float(match.group(4))
-                    total_unit = match.group(6)
-                    speed = float(match.group(7))
-                    speed_unit = match.group(8)
-
-                    completed_dataKB, total_dataKB, speedKBps = self.convert_units(
-                        completed_data,
-                        completed_unit,
-                        total_data,
-                        total_unit,
-                        speed,
-                        speed_unit,
-                    )
-
-                    if total_dataKB > 0:
-                        progress = (completed_dataKB / total_dataKB) * 100
-
-                        remaining_dataKB = total_dataKB - completed_dataKB
-                        if speedKBps > 0:
-                            time2finish = remaining_dataKB / speedKBps
-                        else:
-                            time2finish = float("inf")
-
-                        time2finish_str = self.format_time2finish(time2finish)
-
-                        self.progress_updated.emit(
-                            base_folder_name,
-                            progress,
-                            f"{completed_data}{completed_unit} de {total_data}{total_unit} Subidos. Tiempo restante: {time2finish_str}.",
-                        )
-
-        stderr = process.stderr.read()
-        return process.returncode == 0 and not self.is_canceled
+    def run_previews(self):
+        base_folder_name = os.path.basename(self.folder)
+        try:
+            generated, failed, uploaded = self.preview_stage.run()
+        except TransferCanceled:
+            return
+        except Exception as e:
+            self.verification_finished.emit(
+                self.folder, f"No se pudieron generar las vistas previas: {e}"
+            )
+            return
+        message = (
+            f"Vistas previas de {base_folder_name}: {generated} generadas, "
+            f"{uploaded} archivos subidos"
+        )
+        if failed:
+            message += f", {failed} imágenes no se pudieron leer"
+        self.verification_finished.emit(self.folder, message + ".")
+
+    def verify_uploaded_files(self):
+        for destination in self.uploaded_destinations:
+            if self.verify_destination(destination):
+                self.pending_destinations.remove(destination)
+        self.uploaded_destinations = []
+        return not self.pending_destinations
+
+    def verify_destination(self, destination):
+        base_folder_name = os.path.basename(self.folder)
+        progress_name = destination_progress_name(self.folder, destination)
+        s3_prefix = f"{destination.prefix}{self.s3_folder}{base_folder_name}/"
+        self.progress_updated.emit(progress_name, 100, "Verificando archivos en S3...")
+        try:
+            result = verify_upload(
+                get_s3_client(destination.region),
+                destination.bucket,
+                self.folder,
+                s3_prefix,
+                checksums=self.verify_checksums,
+            )
+        except Exception as e:
+            self.verification_finished.emit(
+                self.folder, f"No se pudo verificar {progress_name}: {e}"
+            )
+            return False
+        self.verification_finished.emit(
+            self.folder, f"{progress_name}: {summarize(result)}"
+        )
+        if destination == PRIMARY_DESTINATION:
+            self.uploaded_objects = result.listed
+        # Los objetos sobrantes no invalidan la subida: pueden ser de antes.
+        return not result.missing and not result.mismatched
 
-    def convert_units(
-        self, completed_data, completed_unit, total_data, total_unit, speed, speed_unit
-    ):
-        if completed_unit == "MiB":
-            completed_dataKB = completed_data * 1024
-        elif completed_unit == "GiB":
-            completed_dataKB = completed_data * 1024 * 1024
-        else:
-            completed_dataKB = completed_data
+    def record_uploaded_files(self):
+        try:
+            get_index().record_objects(AWS_BUCKET, self.uploaded_objects)
+        except Exception as e:
+            self.verification_finished.emit(
+                self.folder, f"No se pudo actualizar el índice local: {e}"
+            )
 
-        if total_unit == "MiB":
-            total_dataKB = total_data * 1024
-        elif total_unit == "GiB":
-            total_dataKB = total_data * 1024 * 1024
+    def upload_to_s3(self):
+        base_folder_name = os.path.basename(self.folder)
+        destinations = list(self.pending_destinations)
+        self.uploaded_destinations = []
+        endpoint = None
+        if PRIMARY_DESTINATION in destinations:
+            endpoint = endpoint_selector.select()
+        uploaders = [
+            Uploader(
+                get_s3_client(
+                    destination.region,
+                    endpoint if destination == PRIMARY_DESTINATION else None,
+                ),
+                destination.bucket,
+                progress_callback=partial(
+                    self.report_progress,
+                    destination_progress_name(self.folder, destination),
+                ),
+                endpoint=endpoint if destination == PRIMARY_DESTINATION else None,
+            )
+            for destination in destinations
+        ]
+        prefixes = [
+            f"{destination.prefix}{self.s3_folder}{base_folder_name}/"
+            for destination in destinations
+        ]
+        if len(uploaders) == 1:
+            self.uploader = uploaders[0]
         else:
-            total_dataKB = total_data
+            # Varios destinos: cada bloque se lee del disco una sola vez.
+            self.uploader = FanOutUploader(uploaders)
+        # Una pausa pedida entre reintentos se aplica al nuevo intento.
+        if self.is_paused:
+            self.uploader.pause()
+        if self.is_canceled:
+            return False
+        try:
+            if len(uploaders) == 1:
+                results = [self.uploader.upload(self.folder, prefixes[0])]
+            else:
+                results = self.uploader.upload(self.folder, prefixes)
+        except TransferCanceled:
+            return False
+        except Exception as e:
+            self.progress_updated.emit(base_folder_name, 0, f"Error: {e}")
+            return False
+        for destination, uploader, (completed, failed) in zip(
+            destinations, uploaders, results
+        ):
+            if destination == PRIMARY_DESTINATION and not failed:
+                endpoint_selector.observe(endpoint, uploader.progress.speed())
+            if failed:
+                self.progress_updated.emit(
+                    destination_progress_name(self.folder, destination),
+                    0,
+                    f"Error: {len(failed)} archivos no se pudieron subir.",
+                )
+            else:
+                self.uploaded_destinations.append(destination)
+        return len(self.uploaded_destinations) == len(destinations)
 
-        if speed_unit == "MiB":
-            speedKBps = speed * 1024
-        elif speed_unit == "GiB":
-            speedKBps = speed * 1024 * 1024
+    def report_progress(self, progress_name, bytes_done, bytes_total, speed):
+        if bytes_total <= 0:
+            return
+        progress = bytes_done / bytes_total * 100
+        if speed > 0:
+            time2finish = (bytes_total - bytes_done) / speed
         else:
-            speedKBps = speed
-
-        return completed_dataKB, total_dataKB, speedKBps
+            time2finish = float("inf")
+        time2finish_str = self.format_time2finish(time2finish)
+        self.progress_updated.emit(
+            progress_name,
+            progress,
+            f"{bytes_done / MiB:.1f}MiB de {bytes_total / MiB:.1f}MiB Subidos "
+            f"({speed / MiB:.1f}MiB/s). Tiempo restante: {time2finish_str}.",
+        )
 
     def format_time2finish(self, time2finish):
         if time2finish == float("inf"):
@@ -338,142 +570,100 @@ class UploadWorker(QObject):
 
     def cancel_upload(self):
         self.is_canceled = True
+        self.cancel_event.set()
+        if self.uploader is not None:
+            self.uploader.cancel()
+        if self.preview_stage is not None:
+            self.preview_stage.cancel()
+
+    def pause_upload(self):
+        self.is_paused = True
+        if self.uploader is not None:
+            self.uploader.pause()
+        if self.preview_stage is not None:
+            self.preview_stage.pause()
+
+    def resume_upload(self):
+        self.is_paused = False
+        if self.uploader is not None:
+            self.uploader.resume()
+        if self.preview_stage is not None:
+            self.preview_stage.resume()
+
+
+class DownloadWorker(QObject):
+    progress_updated = pyqtSignal(str, float, str)
+    download_complete = pyqtSignal(str, str, bool)
+    cancel_signal = pyqtSignal()
+    pause_signal = pyqtSignal()
+    resume_signal = pyqtSignal()
 
-
-class S3FileExplorer(QtWidgets.QWidget):
-    def __init__(self):
+    def __init__(self, key, local_dir, progress_name):
         super().__init__()
-        self.current_path = ""
-        self.history = [""]
-        self.history_index = 0
-        self.initUI()
-
-    def initUI(self):
-        self.setWindowTitle("Explorador de S3")
-        self.setGeometry(100, 100, 800, 600)
-
-        main_layout = QtWidgets.QVBoxLayout(self)
-
-        toolbar = QtWidgets.QHBoxLayout()
-        self.back_button = QtWidgets.QPushButton("< Atrás")
-        self.back_button.clicked.connect(self.go_back)
-        self.back_button.setEnabled(False)
-
-        self.forward_button = QtWidgets.QPushButton("Adelante >")
-        self.forward_button.clicked.connect(self.go_forward)
-        self.forward_button.setEnabled(False)
-
-        self.home_button = QtWidgets.QPushButton("Home")
-        self.home_button.clicked.connect(self.go_home)
-
-        self.refresh_button = QtWidgets.QPushButton("Refrescar")
-        self.refresh_button.clicked.connect(self.refresh)
-
-        toolbar.addWidget(self.back_button)
-        toolbar.addWidget(self.forward_button)
-        toolbar.addWidget(self.home_button)
-        toolbar.addWidget(self.refresh_button)
-
-        self.path_edit = QtWidgets.QLineEdit(self)
-        self.path_edit.setText(self.current_path)
-        self.path_edit.returnPressed.connect(self.navigate_to_path)
-        toolbar.addWidget(self.path_edit)
-
-        main_layout.addLayout(toolbar)
-
-        self.tree_view = QtWidgets.QTreeWidget(self)
-        self.tree_view.setHeaderLabel("Nombre")
-        self.tree_view.itemDoubleClicked.connect(self.on_item_double_clicked)
-        main_layout.addWidget(self.tree_view)
-
-        self.setLayout(main_layout)
-        self.show()
-
-        self.go_home()
-
-    def navigate_to_path(self):
-        path = self.path_edit.text().strip()
-        if path != self.current_path:
-            self.load_path(path)
-            self.history.append(path)
-            self.history_index += 1
-            self.update_navigation_buttons()
-
-    def load_path(self, path=""):
-        self.tree_view.clear()
-        self.current_path = path
-        self.path_edit.setText(path)
-
-        if path and not path.endswith("/"):
-            path += "/"
+        self.key = key
+        self.local_dir = local_dir
+        self.progress_name = progress_name
+        self.downloader = Downloader(
+            get_s3_client(), AWS_BUCKET, progress_callback=self.report_progress
+        )
+        self.cancel_signal.connect(self.cancel_download, QtCore.Qt.DirectConnection)
+        self.pause_signal.connect(self.downloader.pause, QtCore.Qt.DirectConnection)
+        self.resume_signal.connect(self.downloader.resume, QtCore.Qt.DirectConnection)
 
+    def run(self):
+        success = False
         try:
-            folder_icon = self.style().standardIcon(QtWidgets.QStyle.SP_DirIcon)
-            file_icon = self.style().standardIcon(QtWidgets.QStyle.SP_FileIcon)
-
-            paginator = s3_client.get_paginator("list_objects_v2")
-            for page in paginator.paginate(
-                Bucket=AWS_BUCKET, Prefix=path, Delimiter="/"
-            ):
-                for folder in page.get("CommonPrefixes", []):
-                    folder_name = folder["Prefix"][len(path) :].strip("/")
-                    folder_item = QtWidgets.QTreeWidgetItem(
-                        self.tree_view, [folder_name]
-                    )
-                    folder_item.setIcon(0, folder_icon)
-                    folder_item.setData(0, QtCore.Qt.UserRole, folder["Prefix"])
-
-                for obj in page.get("Contents", []):
-                    file_name = obj["Key"][len(path) :]
-                    if file_name and "/" not in file_name:
-                        file_item = QtWidgets.QTreeWidgetItem(
-                            self.tree_view, [file_name]
-                        )
-                        file_item.setIcon(0, file_icon)
-                        file_item.setData(0, QtCore.Qt.UserRole, obj["Key"])
+            completed, failed = self.downloader.download([self.key], self.local_dir)
+            success = not failed
+            if failed:
+                self.progress_updated.emit(
+                    self.progress_name,
+                    0,
+                    f"Error: {len(failed)} archivos no se pudieron descargar.",
+                )
+        except TransferCanceled:
+            pass
         except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "Error", str(e))
-
-    def on_item_double_clicked(self, item, column):
-        item_data = item.data(0, QtCore.Qt.UserRole)
-        if item_data.endswith("/"):
-            self.load_path(item_data)
-            self.history.append(item_data)
-            self.history_index += 1
-            self.update_navigation_buttons()
-
-    def go_back(self):
-        if self.history_index > 0:
-            self.history_index -= 1
-            self.load_path(self.history[self.history_index])
-            self.update_navigation_buttons()
-
-    def go_forward(self):
-        if self.history_index < len(self.history) - 1:
-            self.history_index += 1
-            self.load_path(self.history[self.history_index])
-            self.update_navigation_buttons()
-
-    def go_home(self):
-        self.load_path("")
-        self.history = [""]
-        self.history_index = 0
-        self.update_navigation_buttons()
-
-    def refresh(self):
-        self.load_path(self.current_path)
-
-    def update_navigation_buttons(self):
-        self.back_button.setEnabled(self.history_index > 0)
-        self.forward_button.setEnabled(self.history_index < len(self.history) - 1)
+            self.progress_updated.emit(self.progress_name, 0, f"Error: {e}")
+        self.download_complete.emit(self.progress_name, self.key, success)
+
+    def report_progress(self, bytes_done, bytes_total, speed):
+        if bytes_total <= 0:
+            return
+        progress = bytes_done / bytes_total * 100
+        if speed > 0:
+            time2finish = (bytes_total - bytes_done) / speed
+            time2finish_str = f"~{int(time2finish // 60)} minutos"
+        else:
+            time2finish_str = "Tiempo desconocido"
+        self.progress_updated.emit(
+            self.progress_name,
+            progress,
+            f"{bytes_done / MiB:.1f}MiB de {bytes_total / MiB:.1f}MiB Descargados "
+            f"({speed / MiB:.1f}MiB/s). Tiempo restante: {time2finish_str}.",
+        )
+
+    def cancel_download(self):
+        self.downloader.cancel()
 
 
 class S3UploaderApp(QtWidgets.QWidget):
+    s3_folders_loaded = pyqtSignal(list)
+    s3_folders_failed = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.initUI()
-        self.upload_queue = Queue()
+        self.upload_queue = UploadQueue()
+        self.folder_sizes = {}
         self.active_uploads = 0
+        self.device_uploads = Counter()
+        self.upload_devices = {}
+        # Trabajos en pausa (carpetas locales o claves descargadas) y pausa
+        # general. Una carpeta en pausa no sale de la cola hasta reanudarla.
+        self.paused_jobs = set()
+        self.all_paused = False
+        self.stopping_threads = []
         self.progress_window = None
         self.close_event_handled = False
         self.last_selected_folder = "/mnt/e/Stuff/Adentu/Imagenes/MEM/SS01"
@@ -512,6 +702,9 @@ class S3UploaderApp(QtWidgets.QWidget):
         s3_folder_layout = QtWidgets.QHBoxLayout()
 
         self.s3_folder_combobox = QtWidgets.QComboBox(self)
+        self.s3_folders_loaded.connect(self.on_s3_folders_loaded)
+        self.s3_folders_failed.connect(self.on_s3_folders_failed)
+        self.fill_s3_folder_combobox(load_cached_folders(AWS_BUCKET))
         self.update_s3_folder_combobox()
         self.s3_folder_combobox.currentIndexChanged.connect(self.on_s3_folder_selected)
         s3_folder_layout.addWidget(self.s3_folder_combobox)
@@ -522,6 +715,34 @@ class S3UploaderApp(QtWidgets.QWidget):
 
         main_layout.addLayout(s3_folder_layout)
 
+        queue_layout = QtWidgets.QHBoxLayout()
+
+        queue_layout.addWidget(QtWidgets.QLabel("Prioridad:", self))
+        self.priority_spinbox = QtWidgets.QSpinBox(self)
+        self.priority_spinbox.setRange(0, 9)
+        self.priority_spinbox.setToolTip("Las carpetas con más prioridad suben antes")
+        queue_layout.addWidget(self.priority_spinbox)
+
+        queue_layout.addWidget(QtWidgets.QLabel("Límite (min):", self))
+        self.deadline_spinbox = QtWidgets.QSpinBox(self)
+        self.deadline_spinbox.setRange(0, 7 * 24 * 60)
+        self.deadline_spinbox.setSpecialValueText("Sin límite")
+        queue_layout.addWidget(self.deadline_spinbox)
+
+        queue_layout.addWidget(QtWidgets.QLabel("Orden de la cola:", self))
+        self.queue_policy_combobox = QtWidgets.QComboBox(self)
+        for policy, label in QUEUE_POLICIES.items():
+            self.queue_policy_combobox.addItem(label, policy)
+        self.queue_policy_combobox.setCurrentIndex(
+            list(QUEUE_POLICIES).index(DEFAULT_POLICY)
+        )
+        self.queue_policy_combobox.currentIndexChanged.connect(
+            self.on_queue_policy_changed
+        )
+        queue_layout.addWidget(self.queue_policy_combobox)
+
+        main_layout.addLayout(queue_layout)
+
         btn_layout = QtWidgets.QHBoxLayout()
 
         self.upload_button = QtWidgets.QPushButton("Subir Carpetas", self)
@@ -529,6 +750,20 @@ class S3UploaderApp(QtWidgets.QWidget):
         self.upload_button.clicked.connect(self.upload_folder)
         btn_layout.addWidget(self.upload_button)
 
+        self.verify_checksums_checkbox = QtWidgets.QCheckBox(
+            "Verificar checksums", self
+        )
+        btn_layout.addWidget(self.verify_checksums_checkbox)
+
+        self.previews_checkbox = QtWidgets.QCheckBox("Vistas previas", self)
+        self.previews_checkbox.setToolTip(
+            f"Sube miniaturas y hojas de contactos a {PREVIEW_PREFIX}"
+        )
+        if not previews_available():
+            self.previews_checkbox.setEnabled(False)
+            self.previews_checkbox.setToolTip("Requiere Pillow")
+        btn_layout.addWidget(self.previews_checkbox)
+
         self.s3_dirView = QtWidgets.QPushButton("Ver directorio S3", self)
         self.s3_dirView.clicked.connect(self.show_s3_directory)
         btn_layout.addWidget(self.s3_dirView)
@@ -542,7 +777,8 @@ class S3UploaderApp(QtWidgets.QWidget):
         self.show()
 
     def show_s3_directory(self):
-        self.s3_dir_view_window = S3FileExplorer()
+        self.s3_dir_view_window = S3FileExplorer(get_s3_client(), AWS_BUCKET)
+        self.s3_dir_view_window.download_requested.connect(self.download_from_s3)
         self.s3_dir_view_window.show()
 
     def closeEvent(self, event):
@@ -557,6 +793,7 @@ class S3UploaderApp(QtWidgets.QWidget):
             )
             if reply == QtWidgets.QMessageBox.Yes:
                 self.cancel_all_uploads()
+                self.wait_for_stopping_threads()
                 if self.progress_window:
                     self.progress_window.close_event_handled = True
                     self.progress_window.close()
@@ -568,7 +805,6 @@ class S3UploaderApp(QtWidgets.QWidget):
             event.ignore()
 
     def select_folder(self):
-        global selected_folders, total_files
         initial_dir = self.last_selected_folder
         selected_folder = QtWidgets.QFileDialog.getExistingDirectory(
             self, "Selecciona una carpeta", initial_dir
@@ -580,24 +816,34 @@ class S3UploaderApp(QtWidgets.QWidget):
             self.result_list.addItem(f"Seleccionada la carpeta: {selected_folder}")
             self.result_list.addItem("Contando archivos...")
             self.result_list.scrollToBottom()
-            total_files += sum(len(files) for _, _, files in os.walk(selected_folder))
-            self.result_list.addItem(
-                f"Se han detectado {total_files} archivos en total por subir de la carpeta {os.path.basename(selected_folder)}."
-            )
-            self.result_list.scrollToBottom()
-
-            for rootf, dirs, files in os.walk(selected_folder):
-                folder_name = os.path.basename(rootf)
-                for file_name in files:
-                    base, ext = os.path.splitext(file_name)
-                    if not base.endswith(f"_{folder_name}"):
-                        new_file_name = f"{base}_{folder_name}{ext}"
-                        old_path = os.path.join(rootf, file_name)
-                        new_path = os.path.join(rootf, new_file_name)
-                        os.rename(old_path, new_path)
+            with profile_session(f"escaneo-{os.path.basename(selected_folder)}"):
+                self.scan_selected_folder(selected_folder)
 
         self.update_upload_button_state()
 
+    def scan_selected_folder(self, selected_folder):
+        global total_files
+        files, size = folder_totals(selected_folder)
+        total_files += files
+        self.folder_sizes[selected_folder] = size
+        self.result_list.addItem(
+            f"Se han detectado {total_files} archivos en total por subir de la carpeta {os.path.basename(selected_folder)}."
+        )
+        self.result_list.scrollToBottom()
+
+        for rootf, dirs, files in os.walk(selected_folder):
+            folder_name = os.path.basename(rootf)
+            for file_name in files:
+                if rootf == selected_folder and is_manifest_name(file_name):
+                    # El manifiesto conserva su nombre: se regenera en cada subida.
+                    continue
+                base, ext = os.path.splitext(file_name)
+                if not base.endswith(f"_{folder_name}"):
+                    new_file_name = f"{base}_{folder_name}{ext}"
+                    old_path = os.path.join(rootf, file_name)
+                    new_path = os.path.join(rootf, new_file_name)
+                    os.rename(old_path, new_path)
+
     def delete_selected_folders(self):
         selected_items = self.file_list.selectedItems()
         if not selected_items:
@@ -611,19 +857,42 @@ class S3UploaderApp(QtWidgets.QWidget):
         self.update_upload_button_state()
 
     def list_s3_folders(self, bucket_name):
-        folders = []
-        paginator = s3_client.get_paginator("list_objects_v2")
-        for page in paginator.paginate(Bucket=bucket_name, Delimiter="/"):
-            for prefix in page.get("CommonPrefixes", []):
-                folders.append(prefix.get("Prefix"))
-        return folders
+        prefixes = list_prefix(get_s3_client(), bucket_name).prefixes
+        return [prefix for prefix in prefixes if prefix != PREVIEW_PREFIX]
 
     def update_s3_folder_combobox(self):
-        folders = self.list_s3_folders(AWS_BUCKET)
+        threading.Thread(target=self.load_s3_folders, daemon=True).start()
+
+    def load_s3_folders(self):
+        try:
+            folders = self.list_s3_folders(AWS_BUCKET)
+        except Exception as e:
+            self.s3_folders_failed.emit(str(e))
+            return
+        try:
+            save_cached_folders(AWS_BUCKET, folders)
+        except OSError:
+            pass
+        self.s3_folders_loaded.emit(folders)
+
+    def on_s3_folders_loaded(self, folders):
+        self.fill_s3_folder_combobox(folders)
+        self.update_upload_button_state()
+
+    def on_s3_folders_failed(self, message):
+        self.result_list.addItem(f"Error al listar las carpetas de S3: {message}")
+        self.result_list.scrollToBottom()
+
+    def fill_s3_folder_combobox(self, folders):
+        current_folder = self.s3_folder_combobox.currentText()
+        self.s3_folder_combobox.blockSignals(True)
         self.s3_folder_combobox.clear()
         self.s3_folder_combobox.addItems(folders)
-        if folders:
+        if current_folder in folders:
+            self.s3_folder_combobox.setCurrentIndex(folders.index(current_folder))
+        elif folders:
             self.s3_folder_combobox.setCurrentIndex(0)
+        self.s3_folder_combobox.blockSignals(False)
 
     def on_s3_folder_selected(self):
         s3_folder = self.s3_folder_combobox.currentText()
@@ -643,7 +912,9 @@ class S3UploaderApp(QtWidgets.QWidget):
             if not new_folder_name.endswith("/"):
                 new_folder_name += "/"
             try:
-                s3_client.put_object(Bucket=AWS_BUCKET, Key=new_folder_name)
+                get_s3_client().put_object(Bucket=AWS_BUCKET, Key=new_folder_name)
+                invalidate_prefix(AWS_BUCKET, new_folder_name)
+                get_index().record_upload(AWS_BUCKET, new_folder_name, 0)
                 self.result_list.addItem(
                     f"Carpeta creada: s3://{AWS_BUCKET}/{new_folder_name}"
                 )
@@ -660,88 +931,270 @@ class S3UploaderApp(QtWidgets.QWidget):
 
         self.file_list.clear()
 
+        self.show_progress_window()
+
+        priority = self.priority_spinbox.value()
+        minutes = self.deadline_spinbox.value()
+        deadline = time.time() + minutes * 60 if minutes else None
+        for folder in selected_folders:
+            base_folder_name = os.path.basename(folder)
+            if base_folder_name not in progress_bars:
+                for number, progress_name in enumerate(progress_names(folder)):
+                    # Un botón de pausa por carpeta, en la fila del destino
+                    # principal.
+                    self.progress_window.add_progress_ui(
+                        progress_name,
+                        "Carpeta en cola",
+                        pause_key=None if number else folder,
+                    )
+                self.upload_queue.put(
+                    UploadJob(
+                        folder,
+                        s3_folder,
+                        priority=priority,
+                        deadline=deadline,
+                        size=self.folder_sizes.get(folder),
+                    )
+                )
+
+        self.start_next_uploads()
+
+    def show_progress_window(self):
         if not self.progress_window or not self.progress_window.isVisible():
             self.progress_window = ProgressWindow()
             self.progress_window.cancel_all.connect(self.cancel_all_uploads)
             self.progress_window.reset_ui.connect(self.reset_ui_state)
+            self.progress_window.pause_all.connect(self.toggle_pause_all)
+            self.progress_window.pause_toggled.connect(self.toggle_pause)
+            self.progress_window.set_all_paused(self.all_paused)
             self.progress_window.show()
 
             progress_bars.clear()
             progress_labels.clear()
 
-        for folder in selected_folders:
-            base_folder_name = os.path.basename(folder)
-            if base_folder_name not in progress_bars:
-                self.progress_window.add_progress_ui(
-                    base_folder_name, "Carpeta en cola"
+    def download_from_s3(self, keys, local_dir):
+        self.show_progress_window()
+
+        for key in keys:
+            if key in download_threads:
+                continue
+            # La fila se identifica por la ruta completa: dos claves con el
+            # mismo nombre en carpetas distintas no comparten barra.
+            progress_name = f"s3://{AWS_BUCKET}/{key}"
+            self.progress_window.add_progress_ui(
+                progress_name,
+                "Preparando descarga...",
+                f"Descargando: s3://{AWS_BUCKET}/{key}",
+                pause_key=key,
+            )
+            self.progress_window.set_progress_color(progress_name, "default")
+            self.progress_window.update_progress(progress_name, 0, "Iniciando...")
+
+            worker = DownloadWorker(key, local_dir, progress_name)
+            worker_thread = QThread()
+            worker.moveToThread(worker_thread)
+
+            worker.progress_updated.connect(self.progress_window.update_progress)
+            worker.download_complete.connect(self.on_download_complete)
+            if self.all_paused:
+                worker.pause_signal.emit()
+
+            worker_thread.started.connect(worker.run)
+            worker_thread.start()
+            download_threads[key] = (worker, worker_thread)
+
+            self.result_list.addItem(
+                f"Descargando s3://{AWS_BUCKET}/{key} en {local_dir}"
+            )
+        self.result_list.scrollToBottom()
+
+    def on_download_complete(self, progress_name, key, success):
+        if key not in download_threads:
+            # Cancelada: cancel_all_uploads ya se ocupó de su hilo.
+            return
+        self.stop_thread_later(*download_threads.pop(key))
+        self.paused_jobs.discard(key)
+        if success:
+            self.result_list.addItem(f"Descarga completada: s3://{AWS_BUCKET}/{key}")
+            if progress_name in progress_bars:
+                self.progress_window.update_progress(
+                    progress_name, 100, "Descarga completada."
                 )
-                self.upload_queue.put((folder, s3_folder))
+        else:
+            self.result_list.addItem(f"Error al descargar s3://{AWS_BUCKET}/{key}.")
+            if progress_name in progress_bars:
+                self.progress_window.set_progress_color(progress_name, "red")
+        self.result_list.scrollToBottom()
 
-        self.start_next_uploads()
+    def on_queue_policy_changed(self):
+        policy = self.queue_policy_combobox.currentData()
+        self.upload_queue.set_policy(policy)
+        self.result_list.addItem(f"Orden de la cola: {QUEUE_POLICIES[policy]}")
+        self.result_list.scrollToBottom()
+
+    def next_upload_job(self):
+        # La primera carpeta según el orden de la cola cuyo disco no esté
+        # ocupado: dos subidas desde un mismo disco giratorio se pelean por
+        # el cabezal.
+        for job in self.upload_queue.ordered():
+            if job.folder in self.paused_jobs:
+                continue
+            device = device_id(job.folder)
+            limit = device_upload_limit(device)
+            if limit is None or self.device_uploads[device] < limit:
+                return self.upload_queue.remove(job)
+        return None
 
     def start_next_uploads(self):
-        while (
-            self.active_uploads < MAX_CONCURRENT_UPLOADS
-            and not self.upload_queue.empty()
-        ):
-            folder, s3_folder = self.upload_queue.get()
-            base_folder_name = os.path.basename(folder)
+        # En pausa general no arranca nada nuevo.
+        while not self.all_paused and self.active_uploads < MAX_CONCURRENT_UPLOADS:
+            job = self.next_upload_job()
+            if job is None:
+                break
+            folder, s3_folder = job.folder, job.s3_folder
 
-            self.progress_window.update_progress(base_folder_name, 0, "Iniciando...")
-            self.progress_window.set_progress_color(base_folder_name, "default")
+            for progress_name in progress_names(folder):
+                self.progress_window.update_progress(progress_name, 0, "Iniciando...")
+                self.progress_window.set_progress_color(progress_name, "default")
 
-            worker = UploadWorker(folder, s3_folder)
+            worker = UploadWorker(
+                folder,
+                s3_folder,
+                verify_checksums=self.verify_checksums_checkbox.isChecked(),
+                make_previews=self.previews_checkbox.isChecked(),
+            )
             worker_thread = QThread()
             worker.moveToThread(worker_thread)
 
             worker.progress_updated.connect(self.progress_window.update_progress)
             worker.upload_complete.connect(self.on_upload_complete)
+            worker.verification_finished.connect(self.on_verification_finished)
 
             worker_thread.started.connect(worker.run)
             worker_thread.start()
             upload_threads[folder] = (worker, worker_thread)
 
+            device = device_id(folder)
+            self.upload_devices[folder] = device
+            self.device_uploads[device] += 1
             self.active_uploads += 1
 
     def on_upload_complete(self, folder, success):
-        base_folder_name = os.path.basename(folder)
+        if folder not in upload_threads:
+            # Cancelada: cancel_all_uploads ya liberó su hilo y su hueco.
+            return
+        self.stop_thread_later(*upload_threads.pop(folder))
+        self.paused_jobs.discard(folder)
         if success:
             self.result_list.addItem(f"La carpeta {folder} se ha subido exitosamente.")
-            if base_folder_name in progress_bars:
-                self.progress_window.update_progress(
-                    base_folder_name, 100, "Carpeta subida con éxito."
-                )
-                self.progress_window.set_progress_color(base_folder_name, "green")
         else:
             self.result_list.addItem(f"Error al subir la carpeta {folder}.")
-            if base_folder_name in progress_bars:
-                self.progress_window.set_progress_color(base_folder_name, "red")
-            if base_folder_name in progress_labels:
-                progress_labels[base_folder_name].setText(
+        for progress_name in progress_names(folder):
+            if success and progress_name in progress_bars:
+                self.progress_window.update_progress(
+                    progress_name, 100, "Carpeta subida con éxito."
+                )
+                self.progress_window.set_progress_color(progress_name, "green")
+            elif progress_name in progress_bars:
+                self.progress_window.set_progress_color(progress_name, "red")
+                progress_labels[progress_name].setText(
                     "Error al subir la carpeta o problema de conexión."
                 )
 
         self.result_list.scrollToBottom()
 
+        if folder in self.upload_devices:
+            self.device_uploads[self.upload_devices.pop(folder)] -= 1
         self.active_uploads -= 1
         self.start_next_uploads()
 
+    def job_worker(self, pause_key):
+        threads = upload_threads.get(pause_key) or download_threads.get(pause_key)
+        return threads[0] if threads else None
+
+    def toggle_pause(self, pause_key):
+        # Pausar no pierde nada: la transferencia conserva sus subidas
+        # multipart y las partes enviadas, y al reanudar sigue donde estaba.
+        paused = pause_key not in self.paused_jobs
+        if paused:
+            self.paused_jobs.add(pause_key)
+        else:
+            self.paused_jobs.discard(pause_key)
+        worker = self.job_worker(pause_key)
+        if worker is not None and not self.all_paused:
+            (worker.pause_signal if paused else worker.resume_signal).emit()
+        if self.progress_window:
+            self.progress_window.set_paused(pause_key, paused)
+        state = "En pausa" if paused else "Reanudada"
+        self.result_list.addItem(f"{state}: {pause_key}")
+        self.result_list.scrollToBottom()
+        if not paused:
+            self.start_next_uploads()
+
+    def toggle_pause_all(self):
+        self.all_paused = not self.all_paused
+        jobs = list(upload_threads.items()) + list(download_threads.items())
+        for key, (worker, worker_thread) in jobs:
+            if key not in self.paused_jobs:
+                if self.all_paused:
+                    worker.pause_signal.emit()
+                else:
+                    worker.resume_signal.emit()
+        if self.progress_window:
+            self.progress_window.set_all_paused(self.all_paused)
+        if self.all_paused:
+            self.result_list.addItem("Todas las transferencias están en pausa.")
+        else:
+            self.result_list.addItem("Transferencias reanudadas.")
+        self.result_list.scrollToBottom()
+        if not self.all_paused:
+            self.start_next_uploads()
+
+    def on_verification_finished(self, folder, message):
+        self.result_list.addItem(message)
+        self.result_list.scrollToBottom()
+
     def cancel_all_uploads(self):
         global upload_threads
 
+        # No se espera a los hilos: cada worker corta sus peticiones en curso,
+        # aborta sus subidas multipart y termina por su cuenta. Los archivos
+        # ya subidos se conservan y no se repiten al volver a subir la carpeta.
         for folder, (worker, worker_thread) in upload_threads.items():
             worker.cancel_signal.emit()
-            worker_thread.quit()
-            worker_thread.wait()
+            self.stop_thread_later(worker, worker_thread)
 
         upload_threads.clear()
+        self.active_uploads = 0
+        self.device_uploads.clear()
+        self.upload_devices.clear()
+        self.paused_jobs.clear()
+        self.all_paused = False
+
+        for key, (worker, worker_thread) in download_threads.items():
+            worker.cancel_signal.emit()
+            self.stop_thread_later(worker, worker_thread)
+
+        download_threads.clear()
         self.result_list.addItem("Todas las cargas pendientes han sido canceladas.")
-        self.upload_queue.queue.clear()
+        self.upload_queue.clear()
 
         if self.progress_window:
             self.progress_window.close()
             self.progress_window = None
 
+    def stop_thread_later(self, worker, worker_thread):
+        # Qt aborta si se destruye un QThread en marcha: las referencias se
+        # guardan hasta que el hilo termina.
+        entry = (worker, worker_thread)
+        self.stopping_threads.append(entry)
+        worker_thread.finished.connect(lambda: self.stopping_threads.remove(entry))
+        worker_thread.quit()
+
+    def wait_for_stopping_threads(self):
+        for worker, worker_thread in list(self.stopping_threads):
+            worker_thread.wait(THREAD_STOP_TIMEOUT_MS)
+
     def update_upload_button_state(self):
         if selected_folders and self.s3_folder_combobox.currentIndex() != -1:
             self.upload_button.setEnabled(True)
@@ -749,13 +1202,14 @@ class S3UploaderApp(QtWidgets.QWidget):
             self.upload_button.setEnabled(False)
 
     def reset_ui_state(self):
-        global selected_folders, total_files, progress_bars, progress_labels, upload_threads
+        global selected_folders, total_files, progress_bars, progress_labels, upload_threads, download_threads
 
         selected_folders = []
         total_files = 0
         progress_bars = {}
         progress_labels = {}
         upload_threads = {}
+        download_threads = {}
 
         self.file_list.clear()
         self.select_folder_button.setEnabled(True)
@@ -764,6 +1218,11 @@ class S3UploaderApp(QtWidgets.QWidget):
 
 
 if __name__ == "__main__":
+    # Las vistas previas usan procesos: en el ejecutable empaquetado cada
+    # proceso hijo arranca este mismo programa.
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication([])
+    start_metrics()
+    start_sweeper([PRIMARY_DESTINATION] + EXTRA_DESTINATIONS, get_s3_client)
     uploader = S3UploaderApp()
     app.exec_()
@@ -0,0 +1,164 @@
+import hashlib
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from awsListing import FANOUT_WORKERS, iter_bucket
+from awsTransfer import MiB, PART_SIZE, READ_CHUNK
+
+CHECKSUM_WORKERS = 4
+
+# `listed` son todos los objetos encontrados bajo el prefijo, tal como los
+# devuelve S3, para poder actualizar el índice local sin volver a listar.
+VerifyResult = namedtuple(
+    "VerifyResult", ["checked", "missing", "extra", "mismatched", "listed"]
+)
+
+
+def build_manifest(folder, s3_prefix):
+    manifest = []
+    for rootf, dirs, files in os.walk(folder):
+        for file_name in files:
+            file_path = os.path.join(rootf, file_name)
+            relative_path = os.path.relpath(file_path, folder)
+            key = s3_prefix + relative_path.replace(os.sep, "/")
+            manifest.append((key, os.path.getsize(file_path), file_path))
+    # Mismo orden que el listado de S3 (UTF-8 binario = orden de code points).
+    manifest.sort()
+    return manifest
+
+
+def merge_join(manifest, objects):
+    # Ambos lados vienen ordenados por clave: se recorren una sola vez.
+    local = iter(manifest)
+    entry = next(local, None)
+    for obj in objects:
+        if obj["Key"].endswith("/"):
+            continue
+        while entry is not None and entry[0] < obj["Key"]:
+            yield entry, None
+            entry = next(local, None)
+        if entry is not None and entry[0] == obj["Key"]:
+            yield entry, obj
+            entry = next(local, None)
+        else:
+            yield None, obj
+    while entry is not None:
+        yield entry, None
+        entry = next(local, None)
+
+
+def _md5_range(handle, length):
+    digest = hashlib.md5()
+    while length > 0:
+        chunk = handle.read(min(READ_CHUNK, length))
+        if not chunk:
+            break
+        digest.update(chunk)
+        length -= len(chunk)
+    return digest
+
+
+def local_etag(path, size, remote_etag, part_size=PART_SIZE):
+    # ETag de S3: MD5 del archivo, o en multipart el MD5 de los MD5 de cada
+    # parte seguido de "-N". Si N no cuadra con part_size, se deduce el tamaño
+    # de parte (el CLI usa múltiplos de MiB).
+    remote_etag = remote_etag.strip('"')
+    with open(path, "rb") as handle:
+        if "-" not in remote_etag:
+            return _md5_range(handle, size).hexdigest()
+        part_count = int(remote_etag.rsplit("-", 1)[1])
+        if -(-size // part_size) != part_count:
+            part_size = -(-size // part_count)
+            part_size = -(-part_size // MiB) * MiB
+        digests = b"".join(
+            _md5_range(handle, part_size).digest() for _ in range(part_count)
+        )
+    return f"{hashlib.md5(digests).hexdigest()}-{part_count}"
+
+
+def verify_upload(
+    client,
+    bucket,
+    folder,
+    s3_prefix,
+    checksums=False,
+    max_workers=FANOUT_WORKERS,
+):
+    manifest = build_manifest(folder, s3_prefix)
+    listed = []
+
+    def remote_objects():
+        for obj in iter_bucket(client, bucket, s3_prefix, max_workers=max_workers):
+            listed.append(obj)
+            yield obj
+
+    missing, extra, mismatched, to_hash = [], [], [], []
+    for entry, obj in merge_join(manifest, remote_objects()):
+        if obj is None:
+            missing.append(entry[0])
+        elif entry is None:
+            extra.append(obj["Key"])
+        elif entry[1] != obj["Size"]:
+            mismatched.append(entry[0])
+        elif checksums and obj.get("ETag"):
+            to_hash.append((entry, obj["ETag"]))
+
+    if to_hash:
+        with ThreadPoolExecutor(max_workers=CHECKSUM_WORKERS) as pool:
+            etags = pool.map(
+                lambda item: local_etag(item[0][2], item[0][1], item[1]), to_hash
+            )
+            for (entry, remote_etag), etag in zip(to_hash, etags):
+                if etag != remote_etag.strip('"'):
+                    mismatched.append(entry[0])
+        mismatched.sort()
+
+    return VerifyResult(len(manifest), missing, extra, mismatched, listed)
+
+
+def summarize(result):
+    if not result.missing and not result.mismatched:
+        message = f"Verificados {result.checked} archivos en S3."
+    else:
+        message = (
+            f"Verificación: {len(result.missing)} faltantes y "
+            f"{len(result.mismatched)} distintos de {result.checked} archivos."
+        )
+    if result.extra:
+        message += f" {len(result.extra)} objetos en S3 no están en la carpeta local."
+    return message
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import boto3
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description="Compara una carpeta local con su destino en S3"
+    )
+    parser.add_argument("folder")
+    parser.add_argument("s3_prefix", help="prefijo de destino, p. ej. Proyecto/SS01/")
+    parser.add_argument("--checksums", action="store_true")
+    args = parser.parse_args()
+
+    client = boto3.client(
+        "s3",
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+    )
+    result = verify_upload(
+        client, os.getenv("AWS_BUCKET"), args.folder, args.s3_prefix, args.checksums
+    )
+    print(summarize(result))
+    for label, keys in [
+        ("Falta", result.missing),
+        ("Distinto", result.mismatched),
+        ("Sobra", result.extra),
+    ]:
+        for key in keys:
+            print(f"{label}: {key}")
@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+KiB = 1024
+MiB = 1024 * KiB
+GiB = 1024 * MiB
+
+POOL_SIZE = 32 * MiB
+WRITE_CHUNK = 4 * MiB
+HEADER_SIZE = 64
+GENERATE_WORKERS = 8
+
+# Estructura de una captura real: <proyecto>/<vuelo>/<cámara>/ con archivos
+# ya renombrados con el sufijo de la cámara, como hace select_folder.
+DatasetSpec = namedtuple(
+    "DatasetSpec",
+    [
+        "depth",
+        "branching",
+        "flights",
+        "cameras",
+        "files_per_camera",
+        "files_jitter",
+        "size_median",
+        "size_sigma",
+        "min_size",
+        "max_size",
+        "compressible",
+        "extension",
+        "max_bytes",
+    ],
+)
+PlannedFile = namedtuple("PlannedFile", ["path", "size", "compressible", "offset"])
+
+DEFAULT_SPEC = DatasetSpec(
+    depth=1,
+    branching=2,
+    flights=3,
+    cameras=("D", "H", "I"),
+    files_per_camera=200,
+    files_jitter=0.2,
+    size_median=8 * MiB,
+    size_sigma=0.35,
+    min_size=64 * KiB,
+    max_size=64 * MiB,
+    compressible=0.0,
+    extension=".JPG",
+    max_bytes=None,
+)
+
+SIZE_UNITS = {"": 1, "K": KiB, "M": MiB, "G": GiB}
+
+
+def parse_size(text):
+    # Acepta "512", "64KB", "8MiB", "1.5G"...
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([A-Za-z]*)\s*", str(text))
+    unit = match.group(2).upper().rstrip("B").rstrip("I") if match else None
+    if unit not in SIZE_UNITS:
+        raise ValueError(f"Tamaño no válido: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[unit])
+
+
+class ContentPool:
+    # Dos bloques fijos generados desde la semilla: uno aleatorio (no
+    # comprimible) y otro de texto repetitivo. Cada archivo lee del bloque a
+    # partir de un desplazamiento propio y empieza con una cabecera única,
+    # así los contenidos (y sus MD5) no se repiten.
+    def __init__(self, seed, size=POOL_SIZE):
+        rng = random.Random(seed)
+        self.random_block = rng.randbytes(size)
+        words = [rng.randbytes(rng.randint(3, 9)).hex().encode() for _ in range(64)]
+        text = bytearray()
+        while len(text) < size:
+            text += b" ".join(rng.choice(words) for _ in range(16)) + b"\n"
+        self.text_block = bytes(text[:size])
+        self.size = size
+
+    def write(self, path, size, compressible=False, offset=0, name=None):
+        block = memoryview(self.text_block if compressible else self.random_block)
+        name = path if name is None else name
+        header = hashlib.sha256(name.encode("utf-8")).digest() * 2
+        with open(path, "wb") as handle:
+            written = handle.write(header[: min(size, HEADER_SIZE)])
+            offset %= self.size
+            while written < size:
+                length = min(size - written, WRITE_CHUNK, self.size - offset)
+                written += handle.write(block[offset : offset + length])
+                offset = (offset + length) % self.size
+
+
+def plan_dataset(spec, seed):
+    # Rutas relativas, para que el contenido no dependa de dónde se genere.
+    rng = random.Random(seed)
+    parents = [""]
+    for level in range(spec.depth):
+        parents = [
+            os.path.join(parent, f"P{level + 1}{number + 1:02d}")
+            for parent in parents
+            for number in range(spec.branching)
+        ]
+
+    mu = math.log(spec.size_median)
+    planned = []
+    total = 0
+    for parent in parents:
+        for flight in range(spec.flights):
+            flight_dir = os.path.join(parent, f"SS{flight + 1:02d}")
+            for camera in spec.cameras:
+                camera_dir = os.path.join(flight_dir, camera)
+                jitter = rng.uniform(-spec.files_jitter, spec.files_jitter)
+                count = max(1, round(spec.files_per_camera * (1 + jitter)))
+                for number in range(count):
+                    size = int(rng.lognormvariate(mu, spec.size_sigma))
+                    size = min(max(size, spec.min_size), spec.max_size)
+                    if spec.max_bytes is not None and total + size > spec.max_bytes:
+                        return planned, total
+                    path = os.path.join(
+                        camera_dir, f"IMG_{number + 1:05d}_{camera}{spec.extension}"
+                    )
+                    compressible = rng.random() < spec.compressible
+                    planned.append(
+                        PlannedFile(path, size, compressible, rng.randrange(POOL_SIZE))
+                    )
+                    total += size
+    return planned, total
+
+
+def generate(root, spec=DEFAULT_SPEC, seed=0, workers=GENERATE_WORKERS):
+    planned, total = plan_dataset(spec, seed)
+    pool = ContentPool(seed)
+    for directory in sorted({os.path.dirname(item.path) for item in planned}):
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+
+    def write(item):
+        path = os.path.join(root, item.path)
+        pool.write(path, item.size, item.compressible, item.offset, item.path)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(write, planned))
+    return planned, total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Genera capturas sintéticas con la estructura de carpetas real"
+    )
+    parser.add_argument("root")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, default=DEFAULT_SPEC.depth)
+    parser.add_argument("--branching", type=int, default=DEFAULT_SPEC.branching)
+    parser.add_argument("--flights", type=int, default=DEFAULT_SPEC.flights)
+    parser.add_argument("--cameras", nargs="+", default=list(DEFAULT_SPEC.cameras))
+    parser.add_argument(
+        "--files-per-camera", type=int, default=DEFAULT_SPEC.files_per_camera
+    )
+    parser.add_argument(
+        "--files-jitter", type=float, default=DEFAULT_SPEC.files_jitter
+    )
+    parser.add_argument("--size-median", default="8MB")
+    parser.add_argument(
+        "--size-sigma", type=float, default=DEFAULT_SPEC.size_sigma
+    )
+    parser.add_argument("--min-size", default="64KB")
+    parser.add_argument("--max-size", default="64MB")
+    parser.add_argument(
+        "--compressible",
+        type=float,
+        default=DEFAULT_SPEC.compressible,
+        help="fracción de archivos con contenido comprimible (0-1)",
+    )
+    parser.add_argument("--extension", default=DEFAULT_SPEC.extension)
+    parser.add_argument(
+        "--max-bytes", help="detiene la generación al llegar a este tamaño"
+    )
+    parser.add_argument("--workers", type=int, default=GENERATE_WORKERS)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="solo muestra el tamaño resultante"
+    )
+    args = parser.parse_args()
+
+    spec = DatasetSpec(
+        depth=args.depth,
+        branching=args.branching,
+        flights=args.flights,
+        cameras=tuple(args.cameras),
+        files_per_camera=args.files_per_camera,
+        files_jitter=args.files_jitter,
+        size_median=parse_size(args.size_median),
+        size_sigma=args.size_sigma,
+        min_size=parse_size(args.min_size),
+        max_size=parse_size(args.max_size),
+        compressible=args.compressible,
+        extension=args.extension,
+        max_bytes=parse_size(args.max_bytes) if args.max_bytes else None,
+    )
+
+    started = time.perf_counter()
+    if args.dry_run:
+        planned, total = plan_dataset(spec, args.seed)
+    else:
+        planned, total = generate(args.root, spec, args.seed, args.workers)
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        "root": args.root,
+        "seed": args.seed,
+        "spec": spec._asdict(),
+        "files": len(planned),
+        "bytes": total,
+        "compressible_files": sum(item.compressible for item in planned),
+        "seconds": elapsed,
+        "dry_run": args.dry_run,
+    }
+    if not args.dry_run and elapsed > 0:
+        summary["write_mib_s"] = total / MiB / elapsed
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
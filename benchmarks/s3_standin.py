@@ -0,0 +1,490 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+# Servidor S3 mínimo para medir el cliente sin red ni coste: PutObject,
+# multipart (con ListMultipartUploads y ListParts), ListObjectsV2, HEAD/GET y
+# DELETE, sin comprobar firmas.
+# Por defecto solo guarda tamaño y ETag de cada objeto; con keep_data=True
+# guarda también el contenido para poder descargarlo. `latency` (segundos por
+# petición) y `bandwidth` (bytes/s de subida) emulan un endpoint lejano.
+
+S3_NS = "http://s3.amazonaws.com/doc/2006-03-01/"
+LIST_MAX_KEYS = 1000
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value, timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%S.000Z"
+    )
+
+
+def _xml(root, body):
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<{root} xmlns="{S3_NS}">'
+        f"{body}</{root}>"
+    ).encode("utf-8")
+
+
+class StoredObject:
+    __slots__ = ["size", "etag", "last_modified", "data"]
+
+    def __init__(self, size, etag, data=None):
+        self.size = size
+        self.etag = etag
+        self.last_modified = time.time()
+        self.data = data
+
+
+class S3StandIn:
+    def __init__(
+        self, host="127.0.0.1", port=0, keep_data=False, latency=0.0, bandwidth=None
+    ):
+        self.keep_data = keep_data
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.objects = {}
+        self.uploads = {}
+        self.requests = Counter()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.standin = self
+        self._thread = None
+
+    @property
+    def endpoint_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="s3-standin", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "request_count": sum(self.requests.values()),
+                "bytes_received": self.bytes_received,
+                "bytes_sent": self.bytes_sent,
+                "objects": len(self.objects),
+                "open_uploads": len(self.uploads),
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests.clear()
+            self.bytes_received = 0
+            self.bytes_sent = 0
+
+    def clear(self):
+        with self.lock:
+            self.objects.clear()
+            self.uploads.clear()
+
+
+def _decode_aws_chunked(data):
+    # Cuerpo "aws-chunked": "<tamaño hex>[;extensiones]\r\n<datos>\r\n" hasta
+    # un trozo de tamaño 0, seguido opcionalmente de trailers.
+    out = bytearray()
+    position = 0
+    while True:
+        line_end = data.index(b"\r\n", position)
+        size = int(data[position:line_end].split(b";", 1)[0], 16)
+        position = line_end + 2
+        if size == 0:
+            return bytes(out)
+        out += data[position : position + size]
+        position += size + 2
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def standin(self):
+        return self.server.standin
+
+    def _target(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        query = {name: values[-1] for name, values in query.items()}
+        path = unquote(url.path.lstrip("/"))
+        host = self.headers.get("Host", "").split(":", 1)[0]
+        if host.endswith(".localhost"):
+            # Estilo virtual-host ("bucket.localhost"); con una IP el cliente
+            # usa siempre el estilo de ruta ("/bucket/clave").
+            return host[: -len(".localhost")], path, query
+        bucket, _, key = path.partition("/")
+        return bucket, key, query
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length) if length else b""
+        with self.standin.lock:
+            self.standin.bytes_received += len(data)
+        if self.standin.bandwidth:
+            time.sleep(len(data) / self.standin.bandwidth)
+        if "aws-chunked" in self.headers.get("Content-Encoding", ""):
+            data = _decode_aws_chunked(data)
+        return data
+
+    def _send(self, status, body=b"", headers=None):
+        if self.standin.latency:
+            time.sleep(self.standin.latency)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body and "Content-Type" not in (headers or {}):
+            self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+            with self.standin.lock:
+                self.standin.bytes_sent += len(body)
+
+    def _error(self, status, code, message=""):
+        self._send(
+            status,
+            b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            + f"<Error><Code>{code}</Code><Message>{escape(message)}</Message>"
+            f"</Error>".encode("utf-8"),
+        )
+
+    def _count(self, operation):
+        with self.standin.lock:
+            self.standin.requests[operation] += 1
+
+    def do_PUT(self):
+        bucket, key, query = self._target()
+        data = self._read_body()
+        if not key:
+            self._count("CreateBucket")
+            self._send(200)
+            return
+        if "uploadId" in query:
+            self._count("UploadPart")
+            with self.standin.lock:
+                upload = self.standin.uploads.get(query["uploadId"])
+            if upload is None:
+                self._error(404, "NoSuchUpload")
+                return
+            digest = hashlib.md5(data)
+            kept = data if self.standin.keep_data else None
+            part = (len(data), digest.digest(), kept)
+            with self.standin.lock:
+                upload["parts"][int(query["partNumber"])] = part
+            self._send(200, headers={"ETag": f'"{digest.hexdigest()}"'})
+            return
+        self._count("PutObject")
+        etag = hashlib.md5(data).hexdigest()
+        stored = StoredObject(
+            len(data), etag, data if self.standin.keep_data else None
+        )
+        with self.standin.lock:
+            self.standin.objects[(bucket, key)] = stored
+        self._send(200, headers={"ETag": f'"{etag}"'})
+
+    def do_POST(self):
+        bucket, key, query = self._target()
+        body = self._read_body()
+        if "uploads" in query:
+            self._count("CreateMultipartUpload")
+            upload_id = uuid.uuid4().hex
+            with self.standin.lock:
+                self.standin.uploads[upload_id] = {
+                    "bucket": bucket,
+                    "key": key,
+                    "parts": {},
+                    "initiated": time.time(),
+                }
+            self._send(
+                200,
+                _xml(
+                    "InitiateMultipartUploadResult",
+                    f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+                    f"<UploadId>{upload_id}</UploadId>",
+                ),
+            )
+            return
+        if "uploadId" in query:
+            self._count("CompleteMultipartUpload")
+            with self.standin.lock:
+                upload = self.standin.uploads.pop(query["uploadId"], None)
+            if upload is None:
+                self._error(404, "NoSuchUpload")
+                return
+            root = ElementTree.fromstring(body)
+            numbers = sorted(
+                int(element.text)
+                for element in root.iter()
+                if element.tag.endswith("PartNumber")
+            )
+            if any(number not in upload["parts"] for number in numbers):
+                self._error(400, "InvalidPart")
+                return
+            parts = [upload["parts"][number] for number in numbers]
+            etag = hashlib.md5(b"".join(part[1] for part in parts)).hexdigest()
+            etag = f"{etag}-{len(parts)}"
+            data = None
+            if self.standin.keep_data:
+                data = b"".join(part[2] for part in parts)
+            stored = StoredObject(sum(part[0] for part in parts), etag, data)
+            with self.standin.lock:
+                self.standin.objects[(bucket, key)] = stored
+            self._send(
+                200,
+                _xml(
+                    "CompleteMultipartUploadResult",
+                    f"<Location>{self.standin.endpoint_url}/{quote(bucket)}/"
+                    f"{quote(key)}</Location><Bucket>{escape(bucket)}</Bucket>"
+                    f"<Key>{escape(key)}</Key><ETag>&quot;{etag}&quot;</ETag>",
+                ),
+            )
+            return
+        self._error(400, "NotImplemented", "Operación no soportada")
+
+    def do_DELETE(self):
+        bucket, key, query = self._target()
+        self._read_body()
+        if "uploadId" in query:
+            self._count("AbortMultipartUpload")
+            with self.standin.lock:
+                self.standin.uploads.pop(query["uploadId"], None)
+            self._send(204)
+            return
+        self._count("DeleteObject")
+        with self.standin.lock:
+            self.standin.objects.pop((bucket, key), None)
+        self._send(204)
+
+    def do_HEAD(self):
+        bucket, key, query = self._target()
+        if not key:
+            self._count("HeadBucket")
+            self._send(200)
+            return
+        self._count("HeadObject")
+        self._send_object(bucket, key, head=True)
+
+    def do_GET(self):
+        bucket, key, query = self._target()
+        if key and "uploadId" in query:
+            self._count("ListParts")
+            self._list_parts(bucket, key, query)
+            return
+        if key:
+            self._count("GetObject")
+            self._send_object(bucket, key)
+            return
+        if "uploads" in query:
+            self._count("ListMultipartUploads")
+            self._list_uploads(bucket, query)
+            return
+        self._count("ListObjectsV2")
+        self._list_objects(bucket, query)
+
+    def _send_object(self, bucket, key, head=False):
+        with self.standin.lock:
+            stored = self.standin.objects.get((bucket, key))
+        if stored is None:
+            self._error(404, "NoSuchKey")
+            return
+        headers = {
+            "ETag": f'"{stored.etag}"',
+            "Last-Modified": datetime.fromtimestamp(
+                stored.last_modified, timezone.utc
+            ).strftime("%a, %d %b %Y %H:%M:%S GMT"),
+            "Content-Type": "binary/octet-stream",
+            "Accept-Ranges": "bytes",
+        }
+        if head:
+            self.send_response(200)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(stored.size))
+            self.end_headers()
+            return
+        # Sin keep_data se sirven ceros del tamaño correcto.
+        data = stored.data if stored.data is not None else bytes(stored.size)
+        status = 200
+        byte_range = self.headers.get("Range")
+        if byte_range and byte_range.startswith("bytes="):
+            start, _, end = byte_range[6:].partition("-")
+            start = int(start)
+            end = min(int(end) if end else stored.size - 1, stored.size - 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{stored.size}"
+            data = data[start : end + 1]
+            status = 206
+        self._send(status, data, headers)
+
+    def _list_objects(self, bucket, query):
+        prefix = query.get("prefix", "")
+        delimiter = query.get("delimiter", "")
+        max_keys = min(int(query.get("max-keys", LIST_MAX_KEYS)), LIST_MAX_KEYS)
+        start_after = query.get("continuation-token") or query.get("start-after", "")
+        with self.standin.lock:
+            keys = sorted(
+                key
+                for object_bucket, key in self.standin.objects
+                if object_bucket == bucket
+                and key.startswith(prefix)
+                and key > start_after
+            )
+            entries = []
+            prefixes = []
+            last_key = None
+            truncated = False
+            for key in keys:
+                if delimiter:
+                    position = key.find(delimiter, len(prefix))
+                    if position != -1:
+                        common_prefix = key[: position + len(delimiter)]
+                        if prefixes and prefixes[-1] == common_prefix:
+                            continue
+                        if len(entries) + len(prefixes) == max_keys:
+                            truncated = True
+                            break
+                        prefixes.append(common_prefix)
+                        last_key = common_prefix + "\U0010ffff"
+                        continue
+                if len(entries) + len(prefixes) == max_keys:
+                    truncated = True
+                    break
+                entries.append((key, self.standin.objects[(bucket, key)]))
+                last_key = key
+
+        body = [
+            f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix>",
+            f"<KeyCount>{len(entries) + len(prefixes)}</KeyCount>",
+            f"<MaxKeys>{max_keys}</MaxKeys>",
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>",
+        ]
+        if delimiter:
+            body.append(f"<Delimiter>{escape(delimiter)}</Delimiter>")
+        if truncated:
+            body.append(
+                f"<NextContinuationToken>{escape(last_key)}</NextContinuationToken>"
+            )
+        for key, stored in entries:
+            body.append(
+                f"<Contents><Key>{escape(key)}</Key>"
+                f"<LastModified>{_timestamp(stored.last_modified)}</LastModified>"
+                f"<ETag>&quot;{stored.etag}&quot;</ETag><Size>{stored.size}</Size>"
+                f"<StorageClass>STANDARD</StorageClass></Contents>"
+            )
+        for common_prefix in prefixes:
+            body.append(
+                f"<CommonPrefixes><Prefix>{escape(common_prefix)}</Prefix>"
+                f"</CommonPrefixes>"
+            )
+        self._send(200, _xml("ListBucketResult", "".join(body)))
+
+    def _list_uploads(self, bucket, query):
+        # Sin paginar: todas las subidas caben en una respuesta.
+        prefix = query.get("prefix", "")
+        delimiter = query.get("delimiter", "")
+        with self.standin.lock:
+            uploads = sorted(
+                (upload["key"], upload_id, upload["initiated"])
+                for upload_id, upload in self.standin.uploads.items()
+                if upload["bucket"] == bucket and upload["key"].startswith(prefix)
+            )
+        body = [
+            f"<Bucket>{escape(bucket)}</Bucket><Prefix>{escape(prefix)}</Prefix>",
+            "<IsTruncated>false</IsTruncated>",
+        ]
+        prefixes = []
+        for key, upload_id, initiated in uploads:
+            position = key.find(delimiter, len(prefix)) if delimiter else -1
+            if position >= 0:
+                common_prefix = key[: position + len(delimiter)]
+                if common_prefix not in prefixes:
+                    prefixes.append(common_prefix)
+                continue
+            body.append(
+                f"<Upload><Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"
+                f"<Initiated>{_timestamp(initiated)}</Initiated>"
+                f"<StorageClass>STANDARD</StorageClass></Upload>"
+            )
+        for common_prefix in prefixes:
+            body.append(
+                f"<CommonPrefixes><Prefix>{escape(common_prefix)}</Prefix>"
+                f"</CommonPrefixes>"
+            )
+        self._send(200, _xml("ListMultipartUploadsResult", "".join(body)))
+
+    def _list_parts(self, bucket, key, query):
+        with self.standin.lock:
+            upload = self.standin.uploads.get(query["uploadId"])
+            parts = sorted(upload["parts"].items()) if upload is not None else []
+        if upload is None:
+            self._error(404, "NoSuchUpload")
+            return
+        body = [
+            f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+            f"<UploadId>{query['uploadId']}</UploadId>",
+            "<IsTruncated>false</IsTruncated>",
+        ]
+        for number, (size, digest, _) in parts:
+            body.append(
+                f"<Part><PartNumber>{number}</PartNumber>"
+                f"<LastModified>{_timestamp(upload['initiated'])}</LastModified>"
+                f"<ETag>&quot;{digest.hex()}&quot;</ETag><Size>{size}</Size></Part>"
+            )
+        self._send(200, _xml("ListPartsResult", "".join(body)))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor S3 local para pruebas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--keep-data", action="store_true")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="ms añadidos a cada respuesta"
+    )
+    parser.add_argument("--bandwidth", type=float, help="MB/s máximos de subida")
+    args = parser.parse_args()
+
+    standin = S3StandIn(
+        args.host,
+        args.port,
+        args.keep_data,
+        latency=args.latency / 1000,
+        bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None,
+    ).start()
+    print(f"S3 local en {standin.endpoint_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        standin.stop()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que no deben cargarse antes de mostrar la ventana.
+HEAVY_MODULES = ["boto3", "botocore", "requests", "pyarrow", "PIL"]
+
+# Se ejecuta en un proceso nuevo para medir también el arranque del intérprete.
+# Se lanza el punto de entrada real (`__main__` de la aplicación): la medida
+# termina cuando llega al bucle de eventos con la ventana ya creada.
+CHILD_CODE = """
+import json, os, runpy, sys, time
+start = time.perf_counter()
+from PyQt5 import QtWidgets
+qt_ready = time.perf_counter()
+
+def exec_(app):
+    app.processEvents()
+    shown = time.perf_counter()
+    print(json.dumps({
+        "qt": qt_ready - start,
+        "window": shown - qt_ready,
+        "heavy_modules": [name for name in sys.argv[2:] if name in sys.modules],
+    }), flush=True)
+    os._exit(0)
+
+QtWidgets.QApplication.exec_ = exec_
+runpy.run_module(sys.argv[1], run_name="__main__", alter_sys=True)
+"""
+
+
+def run_once(app_module, env):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, app_module] + HEAVY_MODULES,
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    total = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample["total"] = total
+    return sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque de la aplicación")
+    parser.add_argument("--app", default="awsUploadWIN")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=2.0,
+        help="falla si la mediana hasta mostrar la ventana supera este valor",
+    )
+    parser.add_argument("--output", help="archivo JSON donde guardar el resultado")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # Un endpoint inalcanzable comprueba que la ventana no espera a la red.
+    env.setdefault("AWS_ENDPOINT_URL", "http://10.255.255.1:9")
+    env.setdefault("AWS_BUCKET", "startup-bench")
+    env.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    env.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+    samples = [run_once(args.app, env) for _ in range(args.runs)]
+    summary = {"app": args.app, "runs": args.runs, "samples": samples}
+    for field in ["qt", "window", "total"]:
+        values = [sample[field] for sample in samples]
+        summary[field] = {
+            "median": statistics.median(values),
+            "min": min(values),
+            "max": max(values),
+        }
+    summary["heavy_modules"] = sorted(
+        {name for sample in samples for name in sample["heavy_modules"]}
+    )
+
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text)
+
+    failed = False
+    if summary["heavy_modules"]:
+        print(
+            "Módulos pesados cargados antes de la ventana: "
+            + ", ".join(summary["heavy_modules"]),
+            file=sys.stderr,
+        )
+        failed = True
+    time_to_window = summary["total"]["median"]
+    if time_to_window > args.max_seconds:
+        print(
+            f"Arranque lento: {time_to_window:.2f}s > {args.max_seconds:.2f}s",
+            file=sys.stderr,
+        )
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from make_dataset import ContentPool
+from s3_standin import S3StandIn
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from awsTransfer import READ_AHEAD_MEMORY, MiB  # noqa: E402
+
+KiB = 1024
+BUCKET = "upload-bench"
+
+# (tamaño de archivo, cantidad) por perfil; --scale multiplica las cantidades.
+PROFILES = {
+    "tiny": [(4 * KiB, 2000)],
+    "mixed": [(4 * KiB, 500), (256 * KiB, 200), (4 * MiB, 40), (96 * MiB, 2)],
+    "huge": [(512 * MiB, 2)],
+}
+
+# Motor propio de la aplicación (awsTransfer.Uploader) en un proceso aparte,
+# para medir su CPU y memoria igual que las del CLI.
+ENGINE_CODE = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import boto3
+from botocore.config import Config
+import awsMetrics
+from awsTransfer import CLIENT_POOL_CONNECTIONS, Uploader
+endpoint_url, bucket, folder, prefix = sys.argv[2:6]
+workers, part_size, read_ahead = map(int, sys.argv[6:9])
+client = boto3.client(
+    "s3",
+    endpoint_url=endpoint_url,
+    config=Config(max_pool_connections=max(workers, CLIENT_POOL_CONNECTIONS)),
+)
+uploader = Uploader(
+    client,
+    bucket,
+    max_workers=workers,
+    part_size=part_size,
+    threshold=part_size,
+    read_ahead=read_ahead,
+)
+completed, failed = uploader.upload(folder, prefix)
+print(json.dumps(awsMetrics.registry.snapshot()))
+sys.exit(1 if failed else 0)
+"""
+
+AWS_CONFIG = """[default]
+region = us-east-1
+s3 =
+  max_concurrent_requests = {concurrency}
+  multipart_chunksize = {part_size}MB
+  multipart_threshold = {part_size}MB
+"""
+
+
+def write_dataset(path, profile, scale=1.0, pool=None):
+    # Distribuciones fijas de tamaño; para capturas realistas, make_dataset.py.
+    pool = pool or ContentPool(0)
+    files = 0
+    total = 0
+    for size, count in PROFILES[profile]:
+        for number in range(max(1, int(count * scale))):
+            folder = os.path.join(path, f"{size // KiB}KiB", f"{number // 1000:03d}")
+            os.makedirs(folder, exist_ok=True)
+            file_path = os.path.join(folder, f"file_{number:06d}.bin")
+            pool.write(file_path, size, offset=number * size)
+            files += 1
+            total += size
+    return files, total
+
+
+def dataset_size(path):
+    files = 0
+    total = 0
+    for rootf, dirs, file_names in os.walk(path):
+        for file_name in file_names:
+            files += 1
+            total += os.path.getsize(os.path.join(rootf, file_name))
+    return files, total
+
+
+def run_measured(command, env):
+    # La salida va a archivos: con tuberías el proceso podría bloquearse
+    # mientras se espera con wait4.
+    stdout_file = tempfile.TemporaryFile()
+    stderr_file = tempfile.TemporaryFile()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        command,
+        stdout=stdout_file,
+        stderr=stderr_file,
+        env=env,
+    )
+    if hasattr(os, "wait4"):
+        # wait4 devuelve el uso de recursos de este proceso en concreto.
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - started
+        cpu = usage.ru_utime + usage.ru_stime
+        peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else KiB)
+    else:
+        process.wait()
+        elapsed = time.perf_counter() - started
+        cpu = peak_rss = None
+    outputs = []
+    for output_file in (stdout_file, stderr_file):
+        output_file.seek(0)
+        outputs.append(output_file.read().decode("utf-8", "replace"))
+        output_file.close()
+    return process.returncode, outputs[0], outputs[1], elapsed, cpu, peak_rss
+
+
+def upload_command(
+    engine, aws, folder, prefix, endpoint_url, concurrency, part_size, read_ahead
+):
+    if engine == "cli":
+        # Mismo comando que usaba UploadWorker, apuntando al servidor local.
+        return [
+            aws, "s3", "cp", folder, f"s3://{BUCKET}/{prefix}", "--recursive",
+            "--endpoint-url", endpoint_url,
+        ]  # fmt: skip
+    return [
+        sys.executable, "-c", ENGINE_CODE, REPO_DIR, endpoint_url, BUCKET,
+        folder, prefix, str(concurrency), str(part_size * MiB),
+        str(read_ahead * MiB),
+    ]  # fmt: skip
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de subida contra S3 local")
+    parser.add_argument(
+        "--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES)
+    )
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[10, 50])
+    parser.add_argument(
+        "--part-sizes", nargs="+", type=int, default=[8, 64], help="en MB"
+    )
+    parser.add_argument(
+        "--dataset",
+        help="carpeta ya generada (p. ej. con make_dataset.py) en vez de perfiles",
+    )
+    parser.add_argument(
+        "--read-ahead",
+        type=int,
+        default=READ_AHEAD_MEMORY // MiB,
+        help="MB del pool de lectura anticipada del motor python (0 la desactiva)",
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument(
+        "--engine",
+        choices=["python", "cli"],
+        default="python",
+        help="python: awsTransfer.Uploader; cli: aws s3 cp",
+    )
+    parser.add_argument("--aws", default="aws", help="ejecutable del AWS CLI")
+    parser.add_argument(
+        "--workdir", help="carpeta para los datos (por defecto temporal)"
+    )
+    parser.add_argument("--output", help="archivo JSON donde guardar el resultado")
+    args = parser.parse_args()
+
+    aws = aws_version = None
+    if args.engine == "cli":
+        aws = shutil.which(args.aws)
+        if aws is None:
+            parser.error(f"No se encontró el AWS CLI ({args.aws})")
+        aws_version = subprocess.run(
+            [aws, "--version"], capture_output=True, text=True
+        ).stdout.strip()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="upload-bench-")
+    config_path = os.path.join(workdir, "aws_config")
+    env = dict(os.environ)
+    env.update(
+        {
+            "AWS_CONFIG_FILE": config_path,
+            "AWS_SHARED_CREDENTIALS_FILE": os.path.join(workdir, "credentials"),
+            "AWS_ACCESS_KEY_ID": "bench",
+            "AWS_SECRET_ACCESS_KEY": "bench",
+            "AWS_DEFAULT_REGION": "us-east-1",
+        }
+    )
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "engine": args.engine,
+        "read_ahead_mb": args.read_ahead if args.engine == "python" else None,
+        "aws_cli": aws_version,
+        "scale": args.scale,
+        "results": [],
+    }
+
+    if args.dataset:
+        datasets = [(os.path.basename(os.path.normpath(args.dataset)), args.dataset)]
+    else:
+        datasets = [
+            (profile, os.path.join(workdir, profile)) for profile in args.profiles
+        ]
+    pool = ContentPool(0)
+
+    with S3StandIn() as standin:
+        for profile, dataset in datasets:
+            if args.dataset:
+                files, total = dataset_size(dataset)
+            else:
+                shutil.rmtree(dataset, ignore_errors=True)
+                files, total = write_dataset(dataset, profile, args.scale, pool)
+            for concurrency in args.concurrency:
+                for part_size in args.part_sizes:
+                    with open(config_path, "w", encoding="utf-8") as handle:
+                        handle.write(
+                            AWS_CONFIG.format(
+                                concurrency=concurrency, part_size=part_size
+                            )
+                        )
+                    for run in range(args.repeat):
+                        standin.clear()
+                        standin.reset_stats()
+                        command = upload_command(
+                            args.engine,
+                            aws,
+                            dataset,
+                            f"{profile}/",
+                            standin.endpoint_url,
+                            concurrency,
+                            part_size,
+                            args.read_ahead,
+                        )
+                        returncode, stdout, stderr, elapsed, cpu, peak_rss = (
+                            run_measured(command, env)
+                        )
+                        stats = standin.stats()
+                        result = {
+                            "profile": profile,
+                            "files": files,
+                            "bytes": total,
+                            "concurrency": concurrency,
+                            "part_size_mb": part_size,
+                            "run": run,
+                            "ok": returncode == 0 and stats["objects"] == files,
+                            "seconds": elapsed,
+                            "throughput_mib_s": total / MiB / elapsed,
+                            "files_per_second": files / elapsed,
+                            "requests": stats["request_count"],
+                            "requests_per_second": stats["request_count"] / elapsed,
+                            "requests_by_operation": stats["requests"],
+                            "cpu_seconds": cpu,
+                            "peak_rss_mib": peak_rss / MiB if peak_rss else None,
+                        }
+                        if args.engine == "python" and stdout.strip():
+                            result["metrics"] = json.loads(stdout)["metrics"]
+                        if returncode != 0:
+                            result["error"] = stderr.strip()[-2000:]
+                        report["results"].append(result)
+                        print(
+                            f"{profile} c={concurrency} part={part_size}MB: "
+                            f"{result['throughput_mib_s']:.1f} MiB/s, "
+                            f"{result['requests_per_second']:.0f} req/s",
+                            file=sys.stderr,
+                        )
+            if not args.dataset:
+                shutil.rmtree(dataset, ignore_errors=True)
+
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text)
+
+
+if __name__ == "__main__":
+    main()
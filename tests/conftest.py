@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+
+# Sin registro de eventos en disco durante las pruebas.
+os.environ["AWS_EVENT_LOG"] = "0"
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+from s3_standin import S3StandIn  # noqa: E402
+
+BUCKET = "pruebas"
+
+
+@pytest.fixture
+def standin():
+    with S3StandIn() as server:
+        yield server
+
+
+@pytest.fixture
+def client(standin):
+    # boto3 real: envuelve los errores del cuerpo igual que contra S3.
+    boto3 = pytest.importorskip("boto3")
+    return boto3.client(
+        "s3",
+        endpoint_url=standin.endpoint_url,
+        region_name="us-east-1",
+        aws_access_key_id="prueba",
+        aws_secret_access_key="prueba",
+    )
+
+
+@pytest.fixture
+def events(monkeypatch):
+    # Eventos registrados por los módulos de transferencia: [(evento, campos)].
+    import awsTransfer
+
+    recorded = []
+
+    def log_event(event, **fields):
+        recorded.append((event, fields))
+
+    monkeypatch.setattr(awsTransfer, "log_event", log_event)
+    return recorded
+
+
+@pytest.fixture
+def make_file(tmp_path):
+    def make(name, size):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(size))
+        return str(path)
+
+    return make
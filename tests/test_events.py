@@ -0,0 +1,32 @@
+from awsEvents import analyze, format_report
+from awsTransfer import MiB
+from test_transfer import _uploader
+
+
+def test_skipped_files_stay_out_of_throughput(client, make_file, events):
+    path = make_file("foto.jpg", 1 * MiB)
+    _uploader(client).upload_files([(path, "carpeta/foto.jpg", 1 * MiB)])
+    uploader = _uploader(client)
+    uploader._load_existing("carpeta/")
+    uploader.upload_files([(path, "carpeta/foto.jpg", 1 * MiB)])
+
+    ends = [fields for event, fields in events if event == "file_end"]
+    assert [fields.get("skipped") for fields in ends] == [None, True]
+
+    # Misma forma que en el registro: marca de tiempo y sin campos vacíos.
+    records = [
+        dict(
+            {name: value for name, value in fields.items() if value is not None},
+            ev="file_end",
+            ts=float(index),
+        )
+        for index, fields in enumerate(ends)
+    ]
+    report = analyze(records)
+    assert report["files"] == 1
+    assert report["bytes"] == 1 * MiB
+    assert report["skipped_files"] == 1
+    assert report["skipped_bytes"] == 1 * MiB
+    rate = ends[0]["bytes"] / ends[0]["dur"]
+    assert report["file_throughput"] == {"p50": rate, "p90": rate, "p99": rate}
+    assert "Ya en el destino: 1" in format_report(report)
@@ -0,0 +1,59 @@
+import pytest
+
+from awsTransfer import FanOutUploader, MiB, Uploader
+from test_transfer import PART_SIZE, _uploader
+
+
+def test_fan_out_writes_the_same_bytes_to_every_destination(
+    client, standin, make_file, tmp_path
+):
+    standin.keep_data = True
+    small = make_file("Vuelo/a.jpg", 1 * MiB)
+    large = make_file("Vuelo/sub/b.tif", 12 * MiB)
+    destinations = [("pruebas", "P/Vuelo/"), ("pruebas", "copia/"), ("otro", "V/")]
+    uploaders = [
+        Uploader(
+            client,
+            bucket,
+            part_size=PART_SIZE,
+            threshold=PART_SIZE,
+            read_ahead=0,
+            journal=None,
+        )
+        for bucket, _ in destinations
+    ]
+
+    fan_out = FanOutUploader(uploaders, read_ahead=4 * PART_SIZE)
+    results = fan_out.upload(
+        str(tmp_path / "Vuelo"), [prefix for _, prefix in destinations]
+    )
+    assert results == [(2, [])] * 3
+    for (bucket, prefix), uploader in zip(destinations, uploaders):
+        for path, relative_key in [(small, "a.jpg"), (large, "sub/b.tif")]:
+            with open(path, "rb") as handle:
+                expected = handle.read()
+            assert standin.objects[(bucket, prefix + relative_key)].data == expected
+        assert uploader.progress.bytes_done == 13 * MiB
+    assert standin.stats()["requests"]["CompleteMultipartUpload"] == 3
+
+
+def test_fan_out_skips_only_where_the_file_exists(client, standin, make_file, tmp_path):
+    make_file("Vuelo/a.jpg", 1 * MiB)
+    _uploader(client).upload(str(tmp_path / "Vuelo"), "P/Vuelo/")
+    standin.reset_stats()
+
+    uploaders = [_uploader(client), _uploader(client)]
+    results = FanOutUploader(uploaders).upload(
+        str(tmp_path / "Vuelo"), ["P/Vuelo/", "copia/"]
+    )
+    assert results == [(1, []), (1, [])]
+    assert standin.stats()["requests"]["PutObject"] == 1
+    assert uploaders[0].progress.bytes_skipped == 1 * MiB
+    assert ("pruebas", "copia/a.jpg") in standin.objects
+
+
+def test_fan_out_needs_one_part_size(client):
+    with pytest.raises(ValueError):
+        FanOutUploader(
+            [_uploader(client), Uploader(client, "pruebas", part_size=8 * MiB)]
+        )
@@ -0,0 +1,82 @@
+import pytest
+
+import awsIndex
+from awsIndex import BucketIndex
+
+
+@pytest.fixture
+def index():
+    index = BucketIndex(":memory:")
+    yield index
+    index.close()
+
+
+def _put(client, *keys):
+    for key in keys:
+        client.put_object(Bucket="pruebas", Key=key, Body=b"x")
+
+
+def _search(index, pattern, prefix=""):
+    return sorted(
+        obj["Key"]
+        for batch in index.search("pruebas", pattern, prefix=prefix)
+        for obj in batch
+    )
+
+
+def test_search_after_write_through_indexes_the_bucket(client, index):
+    _put(client, "Proyecto/V1/a.jpg", "Proyecto/V2/b.jpg", "Proyecto/V3/c.jpg")
+    # La subida de la propia aplicación llega al índice antes que ningún refresco.
+    index.record_upload("pruebas", "Proyecto/V3/c.jpg", 1)
+    assert not index.has_bucket("pruebas")
+
+    assert index.refresh_if_stale(client, "pruebas") is not None
+    assert index.has_bucket("pruebas")
+    assert _search(index, ".jpg") == [
+        "Proyecto/V1/a.jpg",
+        "Proyecto/V2/b.jpg",
+        "Proyecto/V3/c.jpg",
+    ]
+    assert index.refresh_if_stale(client, "pruebas") is None
+
+
+def test_old_and_expired_units_are_relisted(client, index):
+    _put(client, "Proyecto/V1/a.jpg")
+    index.refresh_if_stale(client, "pruebas")
+    # Subidas de otro equipo: no pasan por el write-through.
+    _put(client, "Proyecto/V1/b.jpg", "Proyecto/V2/c.jpg")
+    assert index.refresh_if_stale(client, "pruebas", "Proyecto/") is None
+    assert _search(index, ".jpg") == ["Proyecto/V1/a.jpg"]
+
+    index.refresh_if_stale(client, "pruebas", "Proyecto/", max_age=0)
+    assert _search(index, ".jpg") == [
+        "Proyecto/V1/a.jpg",
+        "Proyecto/V1/b.jpg",
+        "Proyecto/V2/c.jpg",
+    ]
+
+    _put(client, "Proyecto/V2/d.jpg")
+    index.expire("pruebas", "Proyecto/V2/")
+    assert index.is_stale("pruebas", "Proyecto/V2/")
+    index.refresh_if_stale(client, "pruebas", "Proyecto/V2/")
+    assert _search(index, "d.jpg") == ["Proyecto/V2/d.jpg"]
+    assert not index.is_stale("pruebas", "Proyecto/")
+
+
+def test_unit_marked_during_refresh_stays_dirty(client, index, monkeypatch):
+    _put(client, "Proyecto/V1/a.jpg")
+    iter_bucket = awsIndex.iter_bucket
+
+    def iter_and_upload(*args, **kwargs):
+        # Otra subida de la aplicación llega mientras se lista la unidad.
+        for obj in iter_bucket(*args, **kwargs):
+            index.record_upload("pruebas", "Proyecto/V1/b.jpg", 1)
+            yield obj
+
+    monkeypatch.setattr(awsIndex, "iter_bucket", iter_and_upload)
+    index.refresh(client, "pruebas")
+    assert index.is_stale("pruebas", "Proyecto/V1/")
+
+    monkeypatch.setattr(awsIndex, "iter_bucket", iter_bucket)
+    index.refresh(client, "pruebas")
+    assert not index.is_stale("pruebas", "Proyecto/V1/")
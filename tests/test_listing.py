@@ -0,0 +1,80 @@
+import awsListing
+import s3_standin
+from awsListing import ListingCache, aggregate_prefix, iter_bucket
+
+
+def _put_tree(client, prefix, folders, subfolders):
+    for folder in range(folders):
+        for subfolder in range(subfolders):
+            client.put_object(
+                Bucket="pruebas",
+                Key=f"{prefix}c{folder:03d}/s{subfolder}/foto.jpg",
+                Body=b"x" * 10,
+            )
+
+
+def test_root_totals_survive_their_own_subtree(client):
+    # 40 carpetas con 3 subcarpetas: 161 prefijos para una caché de 32.
+    _put_tree(client, "raiz/", 40, 3)
+    cache = ListingCache(ttl=None, max_entries=32)
+    result = aggregate_prefix(client, "pruebas", "raiz/", cache=cache)
+    assert len(result) == 161
+    root = cache.get("pruebas", "raiz/", None)
+    assert (root.size, root.count) == (1200, 120)
+    # No se guardan nietos que luego expulsarían a los nodos visibles.
+    assert cache.get("pruebas", "raiz/c000/s0/", None) is None
+
+
+def test_small_subtree_is_cached_whole(client):
+    _put_tree(client, "raiz/", 2, 2)
+    cache = ListingCache(ttl=None, max_entries=32)
+    aggregate_prefix(client, "pruebas", "raiz/", cache=cache)
+    child = cache.get("pruebas", "raiz/c001/", None)
+    grandchild = cache.get("pruebas", "raiz/c001/s1/", None)
+    assert (child.size, child.count) == (20, 2)
+    assert (grandchild.size, grandchild.count) == (10, 1)
+    assert cache.get("pruebas", "raiz/", None).count == 4
+
+
+def test_iter_bucket_yields_key_order_over_uneven_shards(client, monkeypatch):
+    # Páginas de 5 claves: el fragmento grande ocupa varias y los demás una o
+    # ninguna.
+    monkeypatch.setattr(s3_standin, "LIST_MAX_KEYS", 5)
+    keys = [f"raiz/m/{number:02d}.jpg" for number in range(23)]
+    keys += ["raiz/a.jpg", "raiz/c.jpg", "raiz/z/1.jpg", "raiz/z/2.jpg"]
+    for key in keys:
+        client.put_object(Bucket="pruebas", Key=key, Body=b"x")
+
+    # Los límites coinciden con claves existentes: ninguna se repite ni se pierde.
+    split_points = ["raiz/a.jpg", "raiz/b", "raiz/m/05.jpg", "raiz/n", "raiz/y"]
+    listed = [
+        obj["Key"]
+        for obj in iter_bucket(
+            client, "pruebas", "raiz/", max_workers=2, split_points=split_points
+        )
+    ]
+    assert listed == sorted(keys)
+
+
+def test_iter_bucket_lists_at_most_max_workers_shards_ahead(client, monkeypatch):
+    for letter in "abcdef":
+        client.put_object(Bucket="pruebas", Key=f"raiz/{letter}.jpg", Body=b"x")
+    started = []
+    list_shard = awsListing._list_shard
+
+    def record_shard(client, bucket, shard, out, stop):
+        started.append(shard)
+        list_shard(client, bucket, shard, out, stop)
+
+    monkeypatch.setattr(awsListing, "_list_shard", record_shard)
+    objects = iter_bucket(
+        client,
+        "pruebas",
+        "raiz/",
+        max_workers=2,
+        split_points=[f"raiz/{letter}" for letter in "bcdef"],
+    )
+    assert next(objects)["Key"] == "raiz/a.jpg"
+    assert len(started) == 2
+    assert [obj["Key"] for obj in objects] == [f"raiz/{c}.jpg" for c in "bcdef"]
+    assert len(started) == 6
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from awsManifest import (
+    MANIFEST_NAMES,
+    build_manifest,
+    read_image_metadata,
+    write_manifest,
+)
+
+XMP = (
+    b'<x:xmpmeta><rdf:Description drone-dji:RelativeAltitude="+120.30" '
+    b'drone-dji:GimbalYawDegree="-45.5"/></x:xmpmeta>'
+)
+
+
+def test_manifest_is_not_a_data_record(tmp_path):
+    folder = tmp_path / "SS01"
+    folder.mkdir()
+    (folder / "notas.txt").write_bytes(b"vuelo")
+    path, records = write_manifest(str(folder), "jsonl")
+    assert os.path.basename(path) == MANIFEST_NAMES["jsonl"]
+    assert [record["key"] for record in records] == ["notas.txt"]
+
+    # Copia que el renombrado de versiones anteriores dejaba en la carpeta.
+    os.rename(path, folder / "_manifest_SS01.jsonl")
+    (folder / "_manifest.jsonl.tmp").write_bytes(b"")
+    assert [record["key"] for record in build_manifest(str(folder))] == [
+        "notas.txt"
+    ]
+    path, records = write_manifest(str(folder), "jsonl")
+    assert [record["key"] for record in records] == ["notas.txt"]
+    assert sorted(os.listdir(folder)) == ["_manifest.jsonl", "notas.txt"]
+
+
+def _exif(Image):
+    exif = Image.Exif()
+    exif[0x010F] = "DJI"
+    exif[0x0110] = "FC3170"
+    exif[0x0112] = 6
+    exif.get_ifd(0x8769)[0x9003] = "2024:05:01 10:20:30"
+    gps = exif.get_ifd(0x8825)
+    gps.update({1: "S", 2: (40.0, 25.0, 1.5), 3: "W", 4: (3.0, 42.0, 0.0)})
+    gps.update({5: b"\x01", 6: 12.25})
+    return exif
+
+
+@pytest.fixture
+def images(tmp_path):
+    # Cabeceras generadas con Pillow; el TIFF es el bloque EXIF sin imagen,
+    # en los dos órdenes de bytes (Pillow no escribe el GPS en sus TIFF).
+    Image = pytest.importorskip("PIL.Image")
+    exif = _exif(Image)
+    image = Image.new("RGB", (64, 48), "blue")
+    paths = {"jpg": tmp_path / "foto.jpg", "png": tmp_path / "foto.png"}
+    image.save(paths["jpg"], exif=exif, xmp=XMP)
+    image.save(paths["png"])
+    for name, endian in [("tif_le", "<"), ("tif_be", ">")]:
+        exif.endian = endian
+        paths[name] = tmp_path / f"{name}.tif"
+        paths[name].write_bytes(exif.tobytes()[len(b"Exif\0\0") :])
+    return paths
+
+
+def test_header_parser_reads_exif_gps_and_xmp(images):
+    exif = {
+        "taken": "2024-05-01T10:20:30",
+        "lat": -40.4170833,
+        "lon": -3.7,
+        "alt": -12.25,
+        "make": "DJI",
+        "model": "FC3170",
+        "orientation": 6,
+    }
+    size = {"width": 64, "height": 48}
+    drone = {"rel_alt": 120.3, "gimbal_yaw": -45.5}
+    assert read_image_metadata(images["jpg"]) == {**exif, **size, **drone}
+    assert read_image_metadata(images["tif_le"]) == exif
+    assert read_image_metadata(images["tif_be"]) == exif
+    assert read_image_metadata(images["png"]) == size
+
+
+def test_truncated_headers_give_partial_metadata(images, tmp_path):
+    # Copias a medias (descarga cortada, tarjeta dañada): sin excepciones y sin
+    # valores a medio leer, solo lo que cabe en los bytes que hay.
+    truncated = tmp_path / "cortada"
+    for path in images.values():
+        data = path.read_bytes()
+        full = read_image_metadata(path)
+        for length in range(min(len(data), 4096)):
+            truncated.write_bytes(data[:length])
+            metadata = read_image_metadata(truncated)
+            assert metadata.items() <= full.items(), (path.name, length)
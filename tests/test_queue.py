@@ -0,0 +1,53 @@
+import pytest
+
+from awsQueue import UploadJob, UploadQueue, folder_totals
+
+
+def _queue(policy):
+    queue = UploadQueue(policy)
+    # Llegan en este orden; "urgente" tiene más prioridad que el resto.
+    for name, size, deadline, priority in [
+        ("mediana", 20, 300.0, 0),
+        ("grande", 30, None, 0),
+        ("urgente", 50, None, 1),
+        ("pequena", 10, 200.0, 0),
+        ("otra_mediana", 20, 100.0, 0),
+    ]:
+        queue.put(UploadJob(name, name, priority, deadline, size))
+    return queue
+
+
+def _order(queue):
+    return [job.folder for job in queue.ordered()]
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        ("fifo", ["mediana", "grande", "pequena", "otra_mediana"]),
+        ("sjf", ["pequena", "mediana", "otra_mediana", "grande"]),
+        ("lpt", ["grande", "mediana", "otra_mediana", "pequena"]),
+        ("deadline", ["otra_mediana", "pequena", "mediana", "grande"]),
+    ],
+)
+def test_priority_first_then_policy_then_arrival(policy, expected):
+    assert _order(_queue(policy)) == ["urgente"] + expected
+
+
+def test_policy_change_reorders_pending_jobs():
+    queue = _queue("fifo")
+    queue.set_policy("sjf")
+    assert _order(queue)[:2] == ["urgente", "pequena"]
+    queue.remove(queue.ordered()[0])
+    assert len(queue) == 4
+    with pytest.raises(ValueError):
+        queue.set_policy("aleatoria")
+    assert queue.policy == "sjf"
+
+
+def test_job_size_defaults_to_the_folder_total(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.jpg").write_bytes(b"x" * 3)
+    (tmp_path / "sub" / "b.jpg").write_bytes(b"x" * 4)
+    assert folder_totals(str(tmp_path)) == (2, 7)
+    assert UploadJob(str(tmp_path), "P/").size == 7
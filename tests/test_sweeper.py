@@ -0,0 +1,80 @@
+import os
+import threading
+
+from awsSweeper import start_sweeper, sweep
+from awsTransfer import Destination, MiB, UploadJournal
+
+PART_SIZE = 5 * MiB
+
+
+def _interrupted_upload(client, key, path=None, parts=1):
+    # Subida multipart con sus primeras `parts` partes enviadas.
+    upload_id = client.create_multipart_upload(Bucket="pruebas", Key=key)["UploadId"]
+    for number in range(1, parts + 1):
+        if path is None:
+            body = b"x" * PART_SIZE
+        else:
+            with open(path, "rb") as handle:
+                handle.seek((number - 1) * PART_SIZE)
+                body = handle.read(PART_SIZE)
+        client.upload_part(
+            Bucket="pruebas", Key=key, UploadId=upload_id, PartNumber=number, Body=body
+        )
+    return upload_id
+
+
+def _journal_entry(journal, upload_id, key, path):
+    journal.add(
+        upload_id,
+        bucket="pruebas",
+        key=key,
+        file=path,
+        size=os.path.getsize(path),
+        mtime=os.path.getmtime(path),
+        part_size=PART_SIZE,
+        started=0,
+    )
+
+
+def test_sweep_resumes_and_aborts(client, standin, make_file, tmp_path):
+    journal_path = str(tmp_path / "uploads.json")
+    journal = UploadJournal(journal_path)
+    resumable = make_file("vuelo/a.bin", 12 * MiB)
+    resumable_id = _interrupted_upload(client, "vuelo/a.bin", resumable, parts=2)
+    _journal_entry(journal, resumable_id, "vuelo/a.bin", resumable)
+    changed = make_file("vuelo/b.bin", 12 * MiB)
+    changed_id = _interrupted_upload(client, "vuelo/b.bin", changed)
+    _journal_entry(journal, changed_id, "vuelo/b.bin", changed)
+    os.utime(changed, (0, 0))
+    foreign_id = _interrupted_upload(client, "otro/c.bin")
+
+    # Otro proceso: las subidas del diario ya no están en marcha.
+    journal = UploadJournal(journal_path)
+    report = sweep(client, "pruebas", journal=journal)
+    assert (report.found, report.resumed, report.aborted, report.kept) == (3, 1, 1, 1)
+    assert report.failed == 0
+    assert report.reused_bytes == 2 * PART_SIZE
+    assert report.reclaimed_bytes == PART_SIZE
+    assert standin.objects[("pruebas", "vuelo/a.bin")].size == 12 * MiB
+    assert list(standin.uploads) == [foreign_id]
+    assert journal.entries() == {}
+
+    # Pasado el margen también se abortan las que este equipo no conoce.
+    report = sweep(client, "pruebas", stale_hours=0, journal=journal)
+    assert (report.found, report.aborted, report.kept) == (1, 1, 0)
+    assert not standin.uploads
+
+
+def test_sweeper_creates_clients_in_its_thread(client):
+    called = threading.Event()
+    threads = []
+
+    def make_client(region):
+        threads.append(threading.current_thread().name)
+        called.set()
+        return client
+
+    destination = Destination("pruebas", "", None)
+    assert start_sweeper([destination], make_client, interval_hours=1, delay=0)
+    assert called.wait(5)
+    assert threads == ["s3-sweeper"]
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import awsMetrics as metrics
+from awsTransfer import Downloader, MiB, TransferCanceled, Uploader
+
+PART_SIZE = 5 * MiB
+
+
+def _uploader(client, **kwargs):
+    return Uploader(
+        client,
+        "pruebas",
+        part_size=PART_SIZE,
+        threshold=PART_SIZE,
+        read_ahead=0,
+        journal=None,
+        **kwargs,
+    )
+
+
+def _retries(operation):
+    return sum(
+        sample["value"]
+        for sample in metrics.retries.snapshot()
+        if sample["labels"]["operation"] == operation
+    )
+
+
+def _failed_requests(events):
+    return [
+        fields for event, fields in events if event == "request" and not fields["ok"]
+    ]
+
+
+def test_cancel_mid_body_is_not_a_retry(client, standin, make_file, events):
+    path = make_file("grande.bin", 12 * MiB)
+    uploader = _uploader(client)
+    # Se cancela con la petición ya preparada: el cuerpo corta el envío y
+    # botocore lo devuelve envuelto en HTTPClientError.
+    client.meta.events.register(
+        "before-send.s3.UploadPart", lambda **kwargs: uploader.cancel()
+    )
+    retries = _retries("UploadPart")
+    started = time.monotonic()
+    try:
+        uploader.upload_files([(path, "carpeta/grande.bin", 12 * MiB)])
+    except TransferCanceled:
+        pass
+    else:
+        raise AssertionError("la subida debía cancelarse")
+    assert time.monotonic() - started < 1
+    assert _retries("UploadPart") == retries
+    assert not _failed_requests(events)
+    assert not standin.uploads
+
+
+def test_repeated_pause_mid_body_keeps_the_upload(client, standin, make_file, events):
+    path = make_file("grande.bin", 12 * MiB)
+    uploader = _uploader(client)
+    pauses = []
+
+    def pause_first_part(request, **kwargs):
+        # La parte 1 se pausa más veces que TRANSFER_RETRIES con el cuerpo a
+        # medio enviar; cada pausa se reanuda al poco desde otro hilo.
+        part_number = parse_qs(urlsplit(request.url).query)["partNumber"]
+        if part_number == ["1"] and len(pauses) < 5:
+            pauses.append(request.url)
+            uploader.pause()
+            threading.Timer(0.05, uploader.resume).start()
+
+    client.meta.events.register("before-send.s3.UploadPart", pause_first_part)
+    retries = _retries("UploadPart")
+    completed, failed = uploader.upload_files(
+        [(path, "carpeta/grande.bin", 12 * MiB)]
+    )
+    assert len(pauses) == 5
+    assert (completed, failed) == (1, [])
+    assert standin.objects[("pruebas", "carpeta/grande.bin")].size == 12 * MiB
+    assert not standin.uploads
+    assert _retries("UploadPart") == retries
+    assert not _failed_requests(events)
+
+
+def test_skipped_files_do_not_count_towards_speed(client, make_file):
+    path = make_file("foto.jpg", 1 * MiB)
+    _uploader(client).upload_files([(path, "carpeta/foto.jpg", 1 * MiB)])
+
+    uploader = _uploader(client)
+    uploader._load_existing("carpeta/")
+    assert uploader.upload_files([(path, "carpeta/foto.jpg", 1 * MiB)]) == (1, [])
+    progress = uploader.progress
+    assert progress.bytes_done == progress.bytes_total == 1 * MiB
+    assert progress.bytes_skipped == 1 * MiB
+    assert progress.speed() == 0
+
+
+def test_edited_file_of_same_size_is_uploaded_again(client, standin, make_file):
+    path = make_file("foto.jpg", 1 * MiB)
+    _uploader(client).upload_files([(path, "carpeta/foto.jpg", 1 * MiB)])
+    with open(path, "r+b") as handle:
+        handle.write(b"editado")
+    future = time.time() + 60
+    os.utime(path, (future, future))
+
+    standin.reset_stats()
+    uploader = _uploader(client)
+    uploader._load_existing("carpeta/")
+    assert uploader.upload_files([(path, "carpeta/foto.jpg", 1 * MiB)]) == (1, [])
+    assert standin.stats()["requests"]["PutObject"] == 1
+    assert uploader.progress.bytes_skipped == 0
+
+
+def test_keys_outside_the_destination_are_not_downloaded(client, tmp_path):
+    for key in ("Proyecto/ok.txt", "Proyecto/../../fuera.txt"):
+        client.put_object(Bucket="pruebas", Key=key, Body=b"x")
+    destination = tmp_path / "descargas"
+
+    downloader = Downloader(client, "pruebas")
+    completed, failed = downloader.download(["Proyecto/"], str(destination))
+    assert (completed, failed) == (1, ["Proyecto/../../fuera.txt"])
+    assert (destination / "Proyecto" / "ok.txt").exists()
+    assert not (tmp_path / "fuera.txt").exists()
+    # Una "/" inicial queda dentro de la carpeta; ".." por encima de ella no.
+    assert downloader.local_path("/etc/passwd", "", str(destination)) == str(
+        destination / "etc" / "passwd"
+    )
+    with pytest.raises(ValueError):
+        downloader.local_path("../passwd", "", str(destination))
@@ -0,0 +1,55 @@
+from awsVerify import merge_join, verify_upload
+
+
+def _entries(*keys):
+    return [(key, 1, key) for key in keys]
+
+
+def _objects(*keys):
+    return [{"Key": key, "Size": 1} for key in keys]
+
+
+def test_merge_join_pairs_missing_and_extra_keys():
+    manifest = _entries("p/a", "p/c", "p/d", "p/z")
+    # Los marcadores de carpeta ("p/b/") no son objetos.
+    objects = _objects("p/0", "p/b/", "p/c", "p/e", "p/f")
+    pairs = [
+        (entry and entry[0], obj and obj["Key"])
+        for entry, obj in merge_join(manifest, objects)
+    ]
+    assert pairs == [
+        (None, "p/0"),
+        ("p/a", None),
+        ("p/c", "p/c"),
+        ("p/d", None),
+        (None, "p/e"),
+        (None, "p/f"),
+        ("p/z", None),
+    ]
+    assert list(merge_join([], objects[:1])) == [(None, objects[0])]
+    assert list(merge_join(manifest[:1], [])) == [(manifest[0], None)]
+
+
+def test_verify_upload_reports_missing_extra_and_mismatched(client, tmp_path):
+    folder = tmp_path / "Vuelo"
+    folder.mkdir()
+    for name, data in [("a.jpg", b"a"), ("b.jpg", b"b"), ("c.jpg", b"c")]:
+        (folder / name).write_bytes(data)
+        client.put_object(Bucket="pruebas", Key=f"P/Vuelo/{name}", Body=data)
+    # Falta d.jpg, sobra e.jpg; b.jpg cambia de tamaño y c.jpg solo de contenido.
+    (folder / "d.jpg").write_bytes(b"d")
+    client.put_object(Bucket="pruebas", Key="P/Vuelo/e.jpg", Body=b"e")
+    (folder / "b.jpg").write_bytes(b"bb")
+    (folder / "c.jpg").write_bytes(b"C")
+
+    result = verify_upload(client, "pruebas", str(folder), "P/Vuelo/")
+    assert (result.checked, result.missing, result.extra) == (
+        4,
+        ["P/Vuelo/d.jpg"],
+        ["P/Vuelo/e.jpg"],
+    )
+    assert result.mismatched == ["P/Vuelo/b.jpg"]
+    assert len(result.listed) == 4
+
+    result = verify_upload(client, "pruebas", str(folder), "P/Vuelo/", checksums=True)
+    assert result.mismatched == ["P/Vuelo/b.jpg", "P/Vuelo/c.jpg"]